@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""Synthetic catalogs shaped like the releases Picard feeds to the metadata processors."""
+
+import random
+from typing import Callable, Dict, List, NamedTuple
+
+ASCII_WORDS = [
+    "love", "night", "blue", "river", "song", "dance", "live", "version", "remix", "edit",
+    "part", "one", "two", "heart", "road", "light", "dream", "fire", "rain", "city",
+]
+# words carrying characters of the default mapping
+MAPPED_WORDS = [
+    "AC/DC", "What?", "Mr. Big", "\"Live\"", "Op. 27: No. 2", "<intro>", "a|b", "C:\\Music",
+    "*NSYNC", "Vol. 3/4", "Why? Why?", "Sgt. Pepper's",
+]
+
+
+class Release(NamedTuple):
+    """Album-level tags and the track-level tags of each track."""
+    album: Dict[str, List[str]]
+    tracks: List[Dict[str, List[str]]]
+
+
+def _phrase(rng: random.Random, words: List[str], size: int) -> str:
+    return " ".join(rng.choice(words) for _ in range(size))
+
+
+def _release(rng: random.Random, track_count: int, mapped_ratio: float, multi_values: int = 1,
+             phrase_size: int = 3) -> Release:
+    def text(size=phrase_size):
+        words = MAPPED_WORDS if rng.random() < mapped_ratio else ASCII_WORDS
+        return _phrase(rng, words, size)
+
+    album = {
+        "album": [text()],
+        "albumartist": [text(2)],
+        "artist": [text(2)],
+        "label": [text(2)],
+        "releasetype": ["album"],
+        "date": ["2001-02-03"],
+        "musicbrainz_albumid": ["89ad4ac3-39f7-470e-963a-56509c546377"],
+    }
+    tracks = []
+    for number in range(1, track_count + 1):
+        tracks.append({
+            "title": [text()],
+            "artist": [text(2) for _ in range(multi_values)],
+            "performer:vocals": [text(2) for _ in range(multi_values)],
+            "tracknumber": [str(number)],
+        })
+    return Release(album, tracks)
+
+
+def small_albums(seed: int = 1) -> List[Release]:
+    """200 albums of 12 tracks with a typical share of mapped characters."""
+    rng = random.Random(seed)
+    return [_release(rng, 12, 0.2) for _ in range(200)]
+
+
+def box_set(seed: int = 2) -> List[Release]:
+    """A single 2,000-track release."""
+    rng = random.Random(seed)
+    return [_release(rng, 2000, 0.2)]
+
+
+def long_multi_values(seed: int = 3) -> List[Release]:
+    """Tracks with 40 long values per multi-value tag."""
+    rng = random.Random(seed)
+    return [_release(rng, 50, 0.2, multi_values=40, phrase_size=12) for _ in range(10)]
+
+
+def ascii_only(seed: int = 4) -> List[Release]:
+    """Plain ASCII text without any mapped character."""
+    rng = random.Random(seed)
+    return [_release(rng, 12, 0.0) for _ in range(200)]
+
+
+def mapped_heavy(seed: int = 5) -> List[Release]:
+    """Text made only of words carrying mapped characters."""
+    rng = random.Random(seed)
+    return [_release(rng, 12, 1.0) for _ in range(200)]
+
+
+CATALOGS: Dict[str, Callable[[], List[Release]]] = {
+    "small_albums": small_albums,
+    "box_set": box_set,
+    "long_multi_values": long_multi_values,
+    "ascii_only": ascii_only,
+    "mapped_heavy": mapped_heavy,
+}
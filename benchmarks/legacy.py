@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+The plugin's original per-character implementation, kept as the baseline to compare
+speed and output against. It reads the same ``config.setting`` as the plugin.
+"""
+
+from picard import config
+
+from replace_unwanted_characters.constants import (
+    CONFIG_NAME_CHAR_TABLE,
+    CONFIG_NAME_FILTER_TAGS,
+    CONFIG_NAME_PER_TAG_TABLES,
+)
+
+
+def get_config_settings():
+    filter_tags = config.setting[CONFIG_NAME_FILTER_TAGS]
+    default_table = config.setting[CONFIG_NAME_CHAR_TABLE]
+    per_tag_tables = config.setting[CONFIG_NAME_PER_TAG_TABLES]
+
+    return filter_tags, default_table, per_tag_tables
+
+
+def _replace_with_table(value, table):
+    def sanitize_char(c):
+        return table.get(c, c)
+
+    return ["".join(sanitize_char(ch) for ch in item) for item in value]
+
+
+def replace_unwanted_characters(tagger, metadata, *args):
+    filter_tags, default_table, per_tag_tables = get_config_settings()
+
+    for name, value in metadata.rawitems():
+        if name not in filter_tags:
+            continue
+
+        entry = per_tag_tables.get(name)
+        if entry is None:
+            table = default_table
+        else:
+            if isinstance(entry, dict):
+                active = entry.get("active", True)
+                keys_list = entry.get("keys", [])
+            else:
+                active = True
+                keys_list = entry
+
+            if not active:
+                continue
+
+            table = {k: v for k, v in default_table.items() if k in set(keys_list)}
+
+        metadata[name] = _replace_with_table(value, table)
+
+
+def script_replace_unwanted(parser, value):
+    default_table = config.setting[CONFIG_NAME_CHAR_TABLE]
+
+    if isinstance(value, list):
+        return _replace_with_table(value, default_table)
+    else:
+        return "".join(default_table.get(ch, ch) for ch in value)
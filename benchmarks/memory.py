@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+Memory use of a large tagging session, with and without the pool of sanitized values.
+
+Run from the repository root::
+
+    python -m benchmarks.memory
+    python -m benchmarks.memory --tracks 200000 --intern-size 65536
+
+The session is a synthetic library of discographies: a few thousand artists and
+labels recur across albums and tracks, while titles are mostly unique. Every value
+is a separate string object, as Picard creates them when parsing the MusicBrainz
+responses. The processed metadata of all tracks is kept, as in a session with the
+whole library loaded.
+
+Each configuration runs in a fresh process, which reports its resident set size
+before the library is generated and after all of it was processed; the difference
+is what the session costs. Sanitized values that reach the plugin's value cache
+are shared already; the pool also shares the originals and results recorded for
+the tags the plugin changed in each track.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import stubs
+from .catalogs import ASCII_WORDS, MAPPED_WORDS
+from .run import Album, load_plugin
+
+TRACKS_PER_ALBUM = 12
+RELEASE_TYPES = ["album", "single", "ep", "compilation", "live"]
+
+
+def _fresh(value: str) -> str:
+    """A new string object equal to ``value``, as parsing a response would create it."""
+    return value.encode("utf-8").decode("utf-8")
+
+
+def _name(rng: random.Random, words: int) -> str:
+    # most names carry a mapped character, so their sanitized values are new strings
+    return " ".join(rng.choice(MAPPED_WORDS if i == 0 or rng.random() < 0.3 else ASCII_WORDS)
+                    for i in range(words))
+
+
+def library(tracks: int, seed: int = 11) -> Iterator[Dict[str, Any]]:
+    """Yield albums of a library with ``tracks`` tracks, each a dict of album tags and track tag dicts."""
+    rng = random.Random(seed)
+    artists = [_name(rng, 2) for _ in range(max(1, tracks // 40))]
+    labels = [_name(rng, 2) for _ in range(max(1, tracks // 400))]
+    for first in range(0, tracks, TRACKS_PER_ALBUM):
+        artist = rng.choice(artists)
+        album = {
+            "album": [_fresh(_name(rng, 3))],
+            "albumartist": [_fresh(artist)],
+            "artist": [_fresh(artist)],
+            "label": [_fresh(rng.choice(labels))],
+            "releasetype": [_fresh(rng.choice(RELEASE_TYPES))],
+        }
+        album_tracks = []
+        for number in range(min(TRACKS_PER_ALBUM, tracks - first)):
+            guest = rng.random() < 0.1
+            album_tracks.append({
+                "title": [_fresh(_name(rng, 4))],
+                "artist": [_fresh(f"{artist} feat. {rng.choice(artists)}" if guest else artist)],
+                "tracknumber": [str(number + 1)],
+            })
+        yield {"album": album, "tracks": album_tracks}
+
+
+def resident_bytes() -> int:
+    """Current resident set size of this process, or the peak where the current one is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def session(tracks: int, intern_size: int, cache_size: int) -> Dict[str, Any]:
+    """Process a library in this process and return its memory figures."""
+    plugin, _ = load_plugin()
+    # imported after load_plugin() installed the Picard stand-ins
+    from replace_unwanted_characters.constants import (
+        CONFIG_NAME_CACHE_SIZE,
+        CONFIG_NAME_INTERN_SIZE,
+    )
+
+    stubs.setting.update({CONFIG_NAME_INTERN_SIZE: intern_size, CONFIG_NAME_CACHE_SIZE: cache_size})
+    album_processors = stubs.registered["album_metadata_processors"]
+    track_processors = stubs.registered["track_metadata_processors"]
+    plugin.get_compiled_config()
+    gc.collect()
+    before = resident_bytes()
+
+    loaded: List[stubs.Metadata] = []
+    for release in library(tracks):
+        album = Album()
+        album_metadata = stubs.Metadata(release["album"])
+        for processor in album_processors:
+            processor(album, album_metadata, None)
+        loaded.append(album_metadata)
+        for track_tags in release["tracks"]:
+            track_metadata = album_metadata.copy()
+            track_metadata.update(track_tags)
+            for processor in track_processors:
+                processor(album, track_metadata, None, None)
+            loaded.append(track_metadata)
+    gc.collect()
+    after = resident_bytes()
+
+    return {
+        "tracks": tracks,
+        "intern_size": intern_size,
+        "cache_size": cache_size,
+        "session_bytes": after - before,
+        "pool": plugin.intern_pool.info(),
+    }
+
+
+def _run_child(tracks: int, intern_size: int, cache_size: int) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory", "--child", "--tracks", str(tracks),
+         "--intern-size", str(intern_size), "--cache-size", str(cache_size)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=100000, help="tracks in the synthetic library")
+    parser.add_argument("--intern-size", type=int, default=65536, help="pool size of the run with the pool")
+    parser.add_argument("--cache-size", type=int, default=4096, help="value cache size of both runs")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(session(args.tracks, args.intern_size, args.cache_size)))
+        return 0
+
+    results = [_run_child(args.tracks, size, args.cache_size) for size in (0, args.intern_size)]
+    baseline = results[0]["session_bytes"]
+    for result in results:
+        pool = result["pool"]
+        change = (result["session_bytes"] - baseline) / baseline if baseline else 0.0
+        label = f"pool {result['intern_size']}" if result["intern_size"] else "no pool"
+        print(f"{label:<14} {result['tracks']:>8} tracks  RSS +{result['session_bytes'] / 2 ** 20:8.1f} MiB  "
+              f"{change:+7.1%}  {pool['hits']:>9,} results shared")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
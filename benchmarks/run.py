@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+"""
+Headless benchmarks of the metadata processor, the default table applied to tag
+values (the original ``_replace_with_table``) and ``script_replace_unwanted`` over
+synthetic catalogs.
+
+Run from the repository root::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --catalog box_set --repeat 5 --verify
+    python -m benchmarks.run --json bench_output.json
+
+Each benchmark reports the best wall time of ``--repeat`` runs, the throughput and
+the peak memory allocated during one extra run under ``tracemalloc``. The plugin's
+original implementation (``benchmarks/legacy.py``) is measured alongside as baseline.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from . import stubs
+from .catalogs import CATALOGS, Release
+
+
+class Album:
+    """Stand-in for ``picard.album.Album``; processors only use it as an identity."""
+
+
+def load_plugin(settings: Optional[dict] = None):
+    """Install the Picard stand-ins and import the plugin and the legacy baseline."""
+    stubs.install(settings)
+    import replace_unwanted_characters as plugin
+
+    from . import legacy
+    return plugin, legacy
+
+
+def reset_plugin(plugin):
+    """Drop all compiled tables and caches, as after saving changed settings."""
+    from replace_unwanted_characters.engine import processing_stats
+
+    plugin.config_cache.invalidate()
+    plugin.value_cache.reset_stats()
+    processing_stats.reset()
+
+
+def run_session(releases: List[Release], album_processors, track_processors) -> List[stubs.Metadata]:
+    """Feed every release through the processors the way Picard loads an album and its tracks."""
+    results = []
+    for release in releases:
+        album = Album()
+        album_metadata = stubs.Metadata(release.album)
+        for processor in album_processors:
+            processor(album, album_metadata, None)
+        for track_tags in release.tracks:
+            track_metadata = album_metadata.copy()
+            track_metadata.update(track_tags)
+            for processor in track_processors:
+                processor(album, track_metadata, None, None)
+            results.append(track_metadata)
+    return results
+
+
+def _all_values(releases: List[Release]) -> List[List[str]]:
+    values: List[List[str]] = []
+    for release in releases:
+        values.extend(release.album.values())
+        for track in release.tracks:
+            values.extend(track.values())
+    return values
+
+
+def _measure(function: Callable[[], object], repeat: int, before: Callable[[], None]) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        before()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    before()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def benchmark_catalog(plugin, legacy, releases: List[Release], repeat: int) -> List[Dict[str, Any]]:
+    track_count = sum(len(release.tracks) for release in releases)
+    values = _all_values(releases)
+    strings = [item for value in values for item in value]
+
+    def processor():
+        run_session(releases, stubs.registered["album_metadata_processors"],
+                    stubs.registered["track_metadata_processors"])
+
+    def legacy_processor():
+        run_session(releases, [legacy.replace_unwanted_characters], [legacy.replace_unwanted_characters])
+
+    def replace_with_table():
+        # what the plugin's _replace_with_table did before the processors took the compiled tables
+        table = plugin.get_compiled_config().default
+        for value in values:
+            table.sanitize_values(value)
+
+    def legacy_replace_with_table():
+        table = stubs.setting[plugin.CONFIG_NAME_CHAR_TABLE]
+        for value in values:
+            legacy._replace_with_table(value, table)
+
+    def script():
+        for item in strings:
+            plugin.script_replace_unwanted(None, item)
+
+    def legacy_script():
+        for item in strings:
+            legacy.script_replace_unwanted(None, item)
+
+    cases = [
+        ("replace_unwanted_characters", "tracks", track_count, processor, legacy_processor),
+        ("_replace_with_table", "values", len(values), replace_with_table, legacy_replace_with_table),
+        ("script_replace_unwanted", "strings", len(strings), script, legacy_script),
+    ]
+
+    rows = []
+    for name, unit, items, function, baseline in cases:
+        current = _measure(function, repeat, lambda: reset_plugin(plugin))
+        reference = _measure(baseline, repeat, lambda: None)
+        rows.append({
+            "benchmark": name,
+            "unit": unit,
+            "items": items,
+            "seconds": current["seconds"],
+            "per_second": items / current["seconds"] if current["seconds"] else float("inf"),
+            "peak_bytes": current["peak_bytes"],
+            "legacy_seconds": reference["seconds"],
+            "legacy_peak_bytes": reference["peak_bytes"],
+            "speedup": reference["seconds"] / current["seconds"] if current["seconds"] else float("inf"),
+        })
+    return rows
+
+
+def verify_catalog(plugin, legacy, releases: List[Release]) -> List[str]:
+    """Return a description of every output that differs from the legacy implementation."""
+    problems = []
+    reset_plugin(plugin)
+    current = run_session(releases, stubs.registered["album_metadata_processors"],
+                          stubs.registered["track_metadata_processors"])
+    expected = run_session(releases, [legacy.replace_unwanted_characters], [legacy.replace_unwanted_characters])
+    for index, (got, want) in enumerate(zip(current, expected)):
+        if dict(got.rawitems()) != dict(want.rawitems()):
+            problems.append(f"track {index}: {dict(got.rawitems())!r} != {dict(want.rawitems())!r}")
+
+    for value in _all_values(releases):
+        for item in value:
+            got = plugin.script_replace_unwanted(None, item)
+            want = legacy.script_replace_unwanted(None, item)
+            if got != want:
+                problems.append(f"$replace_unwanted({item!r}): {got!r} != {want!r}")
+    return problems
+
+
+# mappings of every shape a backend is chosen for: single characters, longer and
+# overlapping search strings, rules, and literal keys inside rule ranges
+BACKEND_MAPPINGS = [
+    {":": "∶", "/": "⁄", "?": "？", ".": "․"},
+    {":": "-", "::": "=", ":::": "≡", "ab": "X", "b": "Y", "abc": "Z"},
+    {"\\p{Cc}": "", "[U+0400-U+04FF]": "?", ":": "∶"},
+    {"\\P{L}": "_", "é": "e", "--": "–", "a b": "a_b"},
+]
+
+
+def verify_backends(seed: int = 7, values: int = 2000) -> List[str]:
+    """Return every value on which a backend's result or replacement count differs from the default one's."""
+    import random
+
+    from replace_unwanted_characters.backends import build_backends
+    from replace_unwanted_characters.engine import compile_rules
+    from replace_unwanted_characters.unicode_rules import is_rule
+
+    rng = random.Random(seed)
+    problems = []
+    for mapping in BACKEND_MAPPINGS:
+        rules = [(k, v) for k, v in mapping.items() if is_rule(k)]
+        literal = {k: v for k, v in mapping.items() if not is_rule(k)}
+        backends = build_backends(literal, compile_rules(rules) if rules else None)
+        alphabet = "".join(literal) + "ab :é\x01\u0416\u4e00-"
+        for _ in range(values):
+            value = "".join(rng.choice(alphabet) for _ in range(rng.randrange(1, 24)))
+            expected = backends[0].replace(value), backends[0].count(value)
+            for backend in backends[1:]:
+                got = backend.replace(value), backend.count(value)
+                if got != expected:
+                    problems.append(f"{backend.name} {value!r}: {got!r} != {backends[0].name} {expected!r}")
+    return problems
+
+
+def _process_albums(releases: List[Release]) -> List[tuple]:
+    """Process every release, returning each album's metadata with its tracks' metadata."""
+    albums = []
+    for release in releases:
+        album = Album()
+        album_metadata = stubs.Metadata(release.album)
+        for processor in stubs.registered["album_metadata_processors"]:
+            processor(album, album_metadata, None)
+        tracks = []
+        for track_tags in release.tracks:
+            track_metadata = album_metadata.copy()
+            track_metadata.update(track_tags)
+            for processor in stubs.registered["track_metadata_processors"]:
+                processor(album, track_metadata, None, None)
+            tracks.append(track_metadata)
+        albums.append((album_metadata, tracks))
+    return albums
+
+
+def verify_resanitize(plugin, releases: List[Release]) -> List[str]:
+    """Check that applying changed settings to processed metadata gives what processing with them gives."""
+    from replace_unwanted_characters.resanitize import ResanitizeJob
+
+    from .stress import configurations
+
+    def state(albums):
+        return [(dict(album.rawitems()), [dict(track.rawitems()) for track in tracks]) for album, tracks in albums]
+
+    problems = []
+    first, second = configurations()
+    for old, new in ((first, second), (second, first)):
+        plugin.config_cache.publish(*new)
+        expected = state(_process_albums(releases))
+        previous = plugin.config_cache.publish(*old)
+        albums = _process_albums(releases)
+        current = plugin.config_cache.publish(*new)
+        targets = [(track, album, None) for album, tracks in albums for track in tracks]
+        targets += [(album, None, None) for album, _ in albums]
+        ResanitizeJob([previous.tag_tables], current, targets, plugin.metadata_fingerprints).run()
+        for index, (got, want) in enumerate(zip(state(albums), expected)):
+            if got != want:
+                problems.append(f"release {index} after a settings change: {got!r} != {want!r}")
+    reset_plugin(plugin)
+    return problems
+
+
+def _print_rows(catalog: str, rows: List[Dict[str, Any]], out=sys.stdout):
+    for row in rows:
+        print(f"{catalog:<18} {row['benchmark']:<28} {row['items']:>8} {row['unit']:<7} "
+              f"{row['seconds'] * 1000:>9.2f} ms {row['per_second']:>12,.0f}/s "
+              f"peak {row['peak_bytes'] / 1024:>9.1f} KiB  "
+              f"legacy {row['legacy_seconds'] * 1000:>9.2f} ms  x{row['speedup']:.1f}", file=out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--catalog", action="append", choices=sorted(CATALOGS),
+                        help="catalog to run (repeatable, default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, best is reported")
+    parser.add_argument("--verify", action="store_true",
+                        help="check that the output matches the legacy implementation and all backends agree")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    plugin, legacy = load_plugin()
+    results = {}
+    failed = False
+    if args.verify:
+        problems = verify_backends()
+        if problems:
+            failed = True
+            print(f"{len(problems)} outputs differ between backends", file=sys.stderr)
+            for problem in problems[:10]:
+                print(f"  {problem}", file=sys.stderr)
+    for catalog in args.catalog or list(CATALOGS):
+        releases = CATALOGS[catalog]()
+        if args.verify:
+            problems = verify_catalog(plugin, legacy, releases) + verify_resanitize(plugin, releases)
+            if problems:
+                failed = True
+                print(f"{catalog}: {len(problems)} outputs differ from the legacy implementation", file=sys.stderr)
+                for problem in problems[:10]:
+                    print(f"  {problem}", file=sys.stderr)
+        rows = benchmark_catalog(plugin, legacy, releases, args.repeat)
+        _print_rows(catalog, rows)
+        results[catalog] = rows
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+Multi-threaded stress test of the metadata processors while settings are saved.
+
+Run from the repository root::
+
+    python -m benchmarks.stress
+    python -m benchmarks.stress --threads 1 2 4 8 --rounds 3
+    python -m benchmarks.stress --mode invalidate
+
+Worker threads feed album and track metadata through the processors, as Picard's
+thread pool does, while another thread keeps saving two different configurations
+in turn: each setting is written on its own, then the compiled configuration is
+replaced. Every output must be exactly what one of the two configurations produces
+on its own; an output matching neither was sanitized with tables mixed from both.
+
+``--mode publish`` saves like the options page (a complete snapshot is swapped in),
+``--mode invalidate`` like before snapshots, where the tables were rebuilt from
+whatever the settings held at the time. Processors do not take a lock to read the
+configuration, so throughput should hold steady as threads are added; CPython's GIL
+keeps it from growing.
+"""
+
+import argparse
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from . import stubs
+from .catalogs import CATALOGS, Release
+from .run import Album, load_plugin, reset_plugin
+
+Item = Tuple[str, Dict[str, List[str]]]
+Frozen = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+def configurations() -> List[Tuple[List[str], Dict[str, str], Dict[str, object]]]:
+    """Two configurations differing in every setting, so any mix of them shows in the output."""
+    # imported after load_plugin() installed the Picard stand-ins
+    from replace_unwanted_characters.constants import DEFAULT_CHAR_MAPPING, DEFAULT_TAGS
+
+    no_entries: Dict[str, object] = {}
+    first = (list(DEFAULT_TAGS), dict(DEFAULT_CHAR_MAPPING), no_entries)
+    second: Tuple[List[str], Dict[str, str], Dict[str, object]] = (
+        list(DEFAULT_TAGS) + ["performer:vocals"],
+        {":": "-", "/": "+", "*": "x", "?": "", '"': "'", "\\": "+", ".": "", "|": "!", "<": "(", ">": ")"},
+        {"title": {"keys": [":", "?"], "active": True, "default": False, "profile": ""}},
+    )
+    return [first, second]
+
+
+def work_items(releases: List[Release]) -> List[Item]:
+    items: List[Item] = []
+    for release in releases:
+        items.append(("album", release.album))
+        items.extend(("track", dict(release.album, **tags)) for tags in release.tracks)
+    return items
+
+
+def process(plugin, item: Item) -> Frozen:
+    kind, tags = item
+    metadata = stubs.Metadata(tags)
+    if kind == "album":
+        plugin.process_album_metadata(Album(), metadata, None)
+    else:
+        plugin.process_track_metadata(Album(), metadata, None, None)
+    return tuple(sorted((name, tuple(values)) for name, values in metadata.rawitems()))
+
+
+def save(plugin, settings, mode: str):
+    """Write the settings one after another, like the options page, then replace the compiled tables."""
+    filter_tags, char_table, per_tag_tables = settings
+    stubs.setting[plugin.CONFIG_NAME_FILTER_TAGS] = filter_tags
+    time.sleep(0)
+    stubs.setting[plugin.CONFIG_NAME_CHAR_TABLE] = char_table
+    time.sleep(0)
+    stubs.setting[plugin.CONFIG_NAME_PER_TAG_TABLES] = per_tag_tables
+    if mode == "publish":
+        plugin.config_cache.publish(filter_tags, char_table, per_tag_tables)
+    else:
+        plugin.config_cache.invalidate()
+
+
+def expected_outputs(plugin, items: List[Item], configs) -> List[set]:
+    """The output of every item under each configuration alone."""
+    expected: List[set] = [set() for _ in items]
+    for settings in configs:
+        save(plugin, settings, "publish")
+        for index, item in enumerate(items):
+            expected[index].add(process(plugin, item))
+    return expected
+
+
+def stress(plugin, items: List[Item], expected: List[set], configs, threads: int, rounds: int,
+           mode: str) -> Dict[str, float]:
+    mismatches = []
+    done = threading.Event()
+    saves = 0
+
+    def worker(offset: int):
+        # each thread starts at a different item so threads do not move in lockstep
+        count = len(items)
+        for step in range(rounds * count // threads):
+            index = (offset + step) % count
+            output = process(plugin, items[index])
+            if output not in expected[index]:
+                mismatches.append(index)
+
+    def saver():
+        nonlocal saves
+        while not done.is_set():
+            save(plugin, configs[saves % len(configs)], mode)
+            saves += 1
+            time.sleep(0.001)
+
+    workers = [threading.Thread(target=worker, args=(i * len(items) // threads,)) for i in range(threads)]
+    saving = threading.Thread(target=saver)
+    start = time.perf_counter()
+    saving.start()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - start
+    done.set()
+    saving.join()
+
+    processed = rounds * len(items) // threads * threads
+    return {
+        "threads": threads,
+        "items": processed,
+        "seconds": seconds,
+        "per_second": processed / seconds if seconds else float("inf"),
+        "saves": saves,
+        "mismatches": len(mismatches),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--catalog", default="mapped_heavy", choices=sorted(CATALOGS))
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="worker thread counts to run (default: 1 2 4 8)")
+    parser.add_argument("--rounds", type=int, default=2, help="passes over the catalog per run")
+    parser.add_argument("--mode", choices=("publish", "invalidate"), default="publish",
+                        help="how saving replaces the compiled tables")
+    args = parser.parse_args(argv)
+
+    plugin, _ = load_plugin()
+    reset_plugin(plugin)
+    configs = configurations()
+    items = work_items(CATALOGS[args.catalog]())
+    expected = expected_outputs(plugin, items, configs)
+
+    failed = False
+    baseline = None
+    for threads in args.threads:
+        row = stress(plugin, items, expected, configs, threads, args.rounds, args.mode)
+        baseline = baseline or row["per_second"]
+        failed = failed or row["mismatches"] > 0
+        print(f"{args.mode:<10} {row['threads']:>2} threads {row['items']:>8} items {row['seconds'] * 1000:>9.2f} ms "
+              f"{row['per_second']:>10,.0f}/s  x{row['per_second'] / baseline:.2f}  "
+              f"{row['saves']:>5} saves  {row['mismatches']} inconsistent")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lightweight stand-ins for the parts of Picard and PyQt5 the plugin imports.
+
+They let the plugin package be imported and its processors be driven without a GUI,
+a Picard installation or a display. Call :func:`install` before importing
+``replace_unwanted_characters``.
+"""
+
+import sys
+import types
+from collections.abc import Iterable, MutableMapping
+from typing import Any, Dict
+
+
+class Metadata(MutableMapping):
+    """Minimal multi-value tag container with the interface of ``picard.metadata.Metadata``."""
+
+    def __init__(self, *args, **kwargs):
+        self._store = {}
+        self.deleted_tags = set()
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    @staticmethod
+    def _as_list(values):
+        if isinstance(values, str) or not isinstance(values, Iterable):
+            values = [values]
+        return [str(value) for value in values if value or value == 0 or value == '']
+
+    def getall(self, name):
+        return self._store.get(name, [])
+
+    def __getitem__(self, name):
+        return "; ".join(self._store.get(name, []))
+
+    def __setitem__(self, name, values):
+        values = self._as_list(values)
+        if values:
+            self._store[name] = values
+            self.deleted_tags.discard(name)
+        elif name in self._store:
+            self.__delitem__(name)
+
+    def __delitem__(self, name):
+        del self._store[name]
+        self.deleted_tags.add(name)
+
+    def __iter__(self):
+        return iter(self._store)
+
+    def __len__(self):
+        return len(self._store)
+
+    def rawitems(self):
+        return self._store.items()
+
+    def copy(self, other=None):
+        if other is None:
+            return Metadata(self)
+        self._store = {name: list(values) for name, values in other.rawitems()}
+        self.deleted_tags = set(other.deleted_tags)
+        return self
+
+    def update(self, *args, **kwargs):
+        if len(args) == 1 and isinstance(args[0], Metadata):
+            for name, values in args[0].rawitems():
+                self[name] = values
+            return
+        for name, values in dict(*args, **kwargs).items():
+            self[name] = values
+
+
+class _Setting(dict):
+    """``config.setting`` stand-in; options register their defaults on creation like in Picard."""
+
+
+class Option:
+    def __init__(self, section, name, default):
+        self.section = section
+        self.name = name
+        self.default = default
+        if section == "setting":
+            setting.setdefault(name, default)
+
+
+class IntOption(Option):
+    pass
+
+
+class BoolOption(Option):
+    pass
+
+
+class TextOption(Option):
+    pass
+
+
+setting = _Setting()
+registered: Dict[str, Any] = {
+    "options_pages": [],
+    "track_metadata_processors": [],
+    "album_metadata_processors": [],
+    "album_post_removal_processors": [],
+    "script_functions": {},
+}
+
+
+class _QtStub:
+    """Accepts any construction, call and attribute access."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return _QtStub()
+
+    def __call__(self, *args, **kwargs):
+        return _QtStub()
+
+
+class _QtModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        stub = type(name, (_QtStub,), {})
+        setattr(self, name, stub)
+        return stub
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def install(settings=None):
+    """Register the stand-in modules in ``sys.modules`` and apply ``settings`` over the option defaults."""
+    if "picard" in sys.modules and not getattr(sys.modules["picard"], "__stub__", False):
+        raise RuntimeError("the real picard package is already imported")
+
+    qt = _QtModule("PyQt5")
+    sys.modules["PyQt5"] = qt
+    for sub in ("QtCore", "QtGui", "QtWidgets", "uic"):
+        submodule = _QtModule(f"PyQt5.{sub}")
+        sys.modules[submodule.__name__] = submodule
+        setattr(qt, sub, submodule)
+
+    log = _module("picard.log", debug=_noop, info=_noop, warning=_noop, error=_noop, exception=_noop)
+    config = _module("picard.config", setting=setting, Option=Option, IntOption=IntOption,
+                     BoolOption=BoolOption, TextOption=TextOption)
+    metadata = _module(
+        "picard.metadata", Metadata=Metadata,
+        register_track_metadata_processor=registered["track_metadata_processors"].append,
+        register_album_metadata_processor=registered["album_metadata_processors"].append)
+    album = _module("picard.album",
+                    register_album_post_removal_processor=registered["album_post_removal_processors"].append)
+    script = _module("picard.script",
+                     register_script_function=lambda function, name=None, **kwargs:
+                     registered["script_functions"].__setitem__(name or function.__name__, function))
+    options = _module("picard.ui.options", OptionsPage=type("OptionsPage", (), {}),
+                      register_options_page=registered["options_pages"].append)
+    ui = _module("picard.ui", options=options)
+    _module("picard", __stub__=True, config=config, log=log, metadata=metadata, album=album,
+            script=script, ui=ui)
+
+    if settings:
+        setting.update(settings)
+    return setting
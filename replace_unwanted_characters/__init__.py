@@ -1,12 +1,44 @@
 # -*- coding: utf-8 -*-
 
-from PyQt5 import QtWidgets, QtCore
-from picard import config, log
-from picard import metadata
-from picard.script import register_script_function
-from picard.ui.options import register_options_page
-
-from .constants import CONFIG_NAME_FILTER_TAGS, CONFIG_NAME_PER_TAG_TABLES, CONFIG_NAME_CHAR_TABLE
+import os
+
+try:
+    from picard import config, log, metadata
+    from picard.album import register_album_post_removal_processor
+    from picard.script import register_script_function
+    from picard.ui.options import register_options_page
+except ImportError:
+    # imported outside Picard (scripts, worker processes): only the Qt-free engine modules are usable
+    config = None
+else:
+    from .options import OPTIONS, PAGE_NAME, PAGE_PARENT, PAGE_TITLE
+
+from .constants import (
+    CONFIG_NAME_ARTIFACT,
+    CONFIG_NAME_CACHE_SIZE,
+    CONFIG_NAME_CHAR_TABLE,
+    CONFIG_NAME_FILTER_TAGS,
+    CONFIG_NAME_INSTRUMENTATION,
+    CONFIG_NAME_INTERN_SIZE,
+    CONFIG_NAME_KEY_INDEX,
+    CONFIG_NAME_PER_TAG_TABLES,
+    CONFIG_NAME_PROFILE_CALLS,
+    CONFIG_NAME_STATS_LOG_INTERVAL,
+    ENV_VAR_ARTIFACT,
+    ENV_VAR_PROFILE_CALLS,
+)
+from .engine import (
+    album_contexts,
+    config_cache,
+    intern_pool,
+    metadata_fingerprints,
+    sanitize_metadata,
+    sanitize_value,
+    table_lookup,
+    value_cache,
+)
+from .instrumentation import instrumentation
+from .key_masks import encode_entries, is_encoded
 
 PLUGIN_NAME = "Replace Unwanted Characters"
 PLUGIN_AUTHOR = "nrth3rnlb"
@@ -24,121 +56,168 @@ The *Replace Unwanted Characters* Plugin replaces unwanted characters in tags.
 - Replace specified characters in configurable tags (default: `album`, `artist`, `title`, `albumartist`, `releasetype`, `label`).
 - Configurable default character mapping table.
 - Per-tag mappings: enable either the default mapping or a custom selection for each tag.
-- Tagger script function: `$replace_unwanted()` for use in Picard scripts.
+- Filesystem profiles (FAT32/exFAT, NTFS/SMB, POSIX) per tag: forbidden characters, reserved names and name length limits.
+- Tagger script function: `$replace_unwanted()` for use in Picard scripts, optionally with a tag's per-tag mapping or a profile.
 
 The plugin is based on an idea and the implementation in the "Replace Forbidden Symbols" plugin by Alex Rustler
 <alex_rustler@rambler.ru>
 '''
 
-from .settings_ui import ReplaceUnwantedCharactersOptionsPage as _ReplaceUnwantedCharactersOptionsPage
 
-# Wrapper classes to ensure proper plugin registration
-class ReplaceUnwantedCharactersOptionsPage(_ReplaceUnwantedCharactersOptionsPage):
-    """Wrapper class for the ShelvesOptionsPage to ensure proper plugin registration."""
+if config is not None:
+    class ReplaceUnwantedCharactersOptionsPage:
+        """
+        Registered in place of the options page, which is only imported once Picard builds
+        the Options dialog. The options are declared in :mod:`.options` so their defaults
+        are registered when the plugin loads. Picard keys registrations by module, so this
+        class has to live in the package itself.
+        """
+
+        NAME = PAGE_NAME
+        TITLE = PAGE_TITLE
+        PARENT = PAGE_PARENT
+        SORT_ORDER = 1000
+        ACTIVE = True
+        HELP_URL = None
+        options = OPTIONS
+
+        def __new__(cls, parent=None):
+            from .settings_ui import ReplaceUnwantedCharactersOptionsPage as page_class
+            return page_class(parent)
 
 
 def get_config_settings():
-    """Load settings from config: returns (filter_tags, default_table, per_tag_tables)"""
+    """Load settings from config: returns (filter_tags, default_table, per_tag_tables, key_index)"""
 
     filter_tags = config.setting[CONFIG_NAME_FILTER_TAGS]
     default_table = config.setting[CONFIG_NAME_CHAR_TABLE]
     per_tag_tables = config.setting[CONFIG_NAME_PER_TAG_TABLES]
+    key_index = config.setting[CONFIG_NAME_KEY_INDEX]
 
-    return filter_tags, default_table, per_tag_tables
-
-def _replace_with_table(value, table):
-    """Apply a mapping table to a tag value list"""
+    return filter_tags, default_table, per_tag_tables, key_index
 
-    def sanitize_char(c):
-        return table.get(c, c)
+def migrate_per_tag_tables():
+    """Store per-tag entries saved as key lists by earlier versions as key masks"""
 
-    return ["".join(sanitize_char(ch) for ch in item) for item in value]
+    per_tag_tables = config.setting[CONFIG_NAME_PER_TAG_TABLES]
+    if is_encoded(per_tag_tables):
+        return
+    per_tag_tables, key_index = encode_entries(
+        per_tag_tables, config.setting[CONFIG_NAME_CHAR_TABLE], config.setting[CONFIG_NAME_KEY_INDEX])
+    config.setting[CONFIG_NAME_PER_TAG_TABLES] = per_tag_tables
+    config.setting[CONFIG_NAME_KEY_INDEX] = key_index
+    log.debug(f"{PLUGIN_NAME}: Converted {len(per_tag_tables)} per-tag tables to key masks")
+
+def artifact_range_tables(settings):
+    """Range tables of the configured mapping artifact, or None if there is none or it cannot be read"""
+
+    path = os.environ.get(ENV_VAR_ARTIFACT) or config.setting[CONFIG_NAME_ARTIFACT]
+    if not path:
+        return None
+    # only imported when an artifact is configured, which most setups never do
+    from .artifact import ArtifactError, open_artifact
+
+    try:
+        artifact = open_artifact(path)
+    except (OSError, ArtifactError) as e:
+        log.warning(f"{PLUGIN_NAME}: Not using mapping artifact, compiling from the settings: {e}")
+        return None
+    if not artifact.matches(settings):
+        log.info(f"{PLUGIN_NAME}: Mapping artifact {path} is stale, only tables with unchanged rules are loaded")
+    return artifact.range_tables
+
+def profile_calls():
+    """Number of calls to profile, from the environment variable or the hidden setting; 0 disables profiling"""
+
+    try:
+        calls = int(os.environ.get(ENV_VAR_PROFILE_CALLS) or 0)
+    except ValueError:
+        calls = 0
+    return max(0, calls) or config.setting[CONFIG_NAME_PROFILE_CALLS]
+
+def _load_compiled_settings():
+    """Settings loader for the compiled config cache, also applying the cache and statistics settings"""
+
+    value_cache.resize(config.setting[CONFIG_NAME_CACHE_SIZE])
+    intern_pool.resize(config.setting[CONFIG_NAME_INTERN_SIZE])
+    instrumentation.enabled = config.setting[CONFIG_NAME_INSTRUMENTATION]
+    instrumentation.log_interval = config.setting[CONFIG_NAME_STATS_LOG_INTERVAL]
+    settings = get_config_settings()
+    return settings + (artifact_range_tables(settings),)
+
+def log_backends(compiled):
+    """Log the backends chosen for the tables of a new compiled config"""
+
+    log.debug(f"{PLUGIN_NAME}: Compiled tables, backends: {compiled.backend_summary()}")
+
+def get_compiled_config():
+    """Return the compiled per-tag tables, building them from config only after a settings change"""
+
+    return config_cache.get(_load_compiled_settings)
+
+def replace_unwanted_characters(tagger, metadata, *args, context=None, compiled=None):
+    # one snapshot for the whole call, even if the settings are saved meanwhile
+    if compiled is None:
+        compiled = get_compiled_config()
+    sanitize_metadata(compiled.tag_tables, metadata, context, metadata_fingerprints, compiled.intern_pool)
+    if instrumentation.enabled:
+        instrumentation.maybe_log(log.info, f"{PLUGIN_NAME}: ")
+
+def process_album_metadata(album, metadata, *args):
+    # album pass: start a new context the tracks of this release will reuse
+    compiled = get_compiled_config()
+    context = album_contexts.start(album, compiled.version)
+    replace_unwanted_characters(album, metadata, *args, context=context, compiled=compiled)
+
+def process_track_metadata(album, metadata, *args):
+    compiled = get_compiled_config()
+    context = album_contexts.get(album, compiled.version)
+    replace_unwanted_characters(album, metadata, *args, context=context, compiled=compiled)
+
+def release_album_context(album):
+    album_contexts.release(album)
+
+def script_replace_unwanted(parser, value, name=""):
+    # Tagger function: use configured default mapping, the table the metadata processor uses for
+    # a tag, or the default mapping followed by a filesystem profile
+    name = name.strip()
+    if name:
+        compiled = get_compiled_config()
+        table = table_lookup(compiled.tag_tables)(name)
+        if table is None:
+            table = compiled.profile_table(name)
+        if table is None:
+            # tag is not affected or its per-tag mapping is inactive
+            return value
+        result = sanitize_value(table, value, f"$replace_unwanted({name})")
+    else:
+        result = sanitize_value(get_compiled_config().default, value)
+    if instrumentation.enabled:
+        instrumentation.maybe_log(log.info, f"{PLUGIN_NAME}: ")
+    return result
 
-def replace_unwanted_characters(tagger, metadata, *args):
-    filter_tags, default_table, per_tag_tables = get_config_settings()
 
-    for name, value in metadata.rawitems():
-        if name not in filter_tags:
-            continue
+if config is not None:
+    log.debug(PLUGIN_NAME + ": registration" )
 
-        entry = per_tag_tables.get(name)
-        # default: apply full default_table
-        if entry is None:
-            table = default_table
-        else:
-            # support both legacy list form and new dict form
-            if isinstance(entry, dict):
-                active = entry.get("active", True)
-                keys_list = entry.get("keys", [])
-            else:
-                # legacy list -> active by default
-                active = True
-                keys_list = entry
+    migrate_per_tag_tables()
+    config_cache.on_compiled = log_backends
 
-            if not active:
-                # skip applying any replacements for this tag
-                continue
+    # opt-in profiling, wrapping the entry points only when enabled
+    calls_to_profile = profile_calls()
+    if calls_to_profile > 0:
+        from .profiling import CallProfiler, profile_directory
 
-            # build a per-tag mapping from default_table filtered to selected keys
-            table = {k: v for k, v in default_table.items() if k in set(keys_list)}
+        profiler = CallProfiler(calls_to_profile, profile_directory(),
+                                lambda message: log.info(f"{PLUGIN_NAME}: {message}"))
+        replace_unwanted_characters = profiler.wrap(replace_unwanted_characters)
+        script_replace_unwanted = profiler.wrap(script_replace_unwanted)
+        log.info(f"{PLUGIN_NAME}: Profiling the next {calls_to_profile} calls")
 
-        metadata[name] = _replace_with_table(value, table)
+    register_options_page(ReplaceUnwantedCharactersOptionsPage)
 
-def script_replace_unwanted(parser, value):
-    # Tagger function: use configured default mapping
-    default_table = config.setting[CONFIG_NAME_CHAR_TABLE]
+    metadata.register_track_metadata_processor(process_track_metadata)
+    metadata.register_album_metadata_processor(process_album_metadata)
+    register_album_post_removal_processor(release_album_context)
 
-    if isinstance(value, list):
-        return _replace_with_table(value, default_table)
-    else:
-        # single string
-        return "".join(default_table.get(ch, ch) for ch in value)
-
-class MultiSelectDialog(QtWidgets.QDialog):
-    """A dialog for selecting multiple items from a list."""
-
-    def __init__(self, parent, title, items, selected_items):
-        super().__init__(parent)
-        self.setWindowTitle(title)
-        self.setMinimumWidth(300)
-
-        self.list_widget = QtWidgets.QListWidget()
-        for item_text in items:
-            item = QtWidgets.QListWidgetItem(item_text)
-
-            # noinspection PyUnresolvedReferences
-            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
-            is_checked = item_text in selected_items
-            # noinspection PyUnresolvedReferences
-            item.setCheckState(QtCore.Qt.Checked if is_checked else QtCore.Qt.Unchecked)
-            self.list_widget.addItem(item)
-
-        # noinspection PyUnresolvedReferences
-        self.buttons = QtWidgets.QDialogButtonBox(
-            QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel,
-            QtCore.Qt.Horizontal, self)
-        self.buttons.accepted.connect(self.accept)
-        self.buttons.rejected.connect(self.reject)
-
-        layout = QtWidgets.QVBoxLayout(self)
-        layout.addWidget(self.list_widget)
-        layout.addWidget(self.buttons)
-
-    def get_selected_items(self):
-        """Returns a set of the text of all checked items."""
-        selected = set()
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            # noinspection PyUnresolvedReferences
-            if item.checkState() == QtCore.Qt.Checked:
-                selected.add(item.text())
-        return selected
-
-log.debug(PLUGIN_NAME + ": registration" )
-
-register_options_page(ReplaceUnwantedCharactersOptionsPage)
-
-metadata.register_track_metadata_processor(replace_unwanted_characters)
-metadata.register_album_metadata_processor(replace_unwanted_characters)
-
-register_script_function(script_replace_unwanted, name="replace_unwanted")
+    register_script_function(script_replace_unwanted, name="replace_unwanted")
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compiled range tables exported to a file that worker processes map into memory.
+
+Compiling Unicode rules computes the code point ranges of every category used and
+resolves the overlaps between rules, which takes a noticeable moment in every process
+that starts up. A mapping artifact stores the resolved range tables of a compiled
+configuration, together with the settings it was compiled from. Workers load it with
+:mod:`mmap`: the range arrays are memoryviews into the mapped file rather than copies,
+so the operating system shares their pages between all processes mapping the file.
+
+Layout, little-endian:
+
+- header, 32 bytes: magic ``b"RUCTBL\\r\\n"``, format version (uint32), reserved
+  (uint32), payload length (uint64), CRC-32 of the payload (uint32), reserved (uint32)
+- payload: length of the JSON index (uint32), the UTF-8 JSON index, zero bytes up
+  to the next multiple of 8, then the starts, ends and rule numbers (uint32 arrays)
+  of every range table
+
+The JSON index holds the settings, their digest and, for each range table, its rules
+(search key and replacement pairs in priority order), its replacements and the offset
+and length of its arrays. Tables are looked up by their rules, so after the settings
+changed a stale artifact still provides the tables whose rules did not change and the
+others are compiled from the settings. A file of another format version or with a
+wrong checksum is rejected as a whole.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from functools import lru_cache
+from typing import Dict, Mapping, Sequence, Tuple
+
+from .unicode_rules import RangeTable
+
+MAGIC = b"RUCTBL\r\n"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sIIQII")
+_INDEX_LENGTH = struct.Struct("<I")
+# memoryviews of the file are used as they are only where they match array("I")
+_NATIVE = sys.byteorder == "little" and array("I").itemsize == 4
+
+# (filter_tags, default_table, per_tag_tables, key_index)
+Settings = Tuple[Sequence[str], Mapping[str, str], Mapping[str, object], Sequence[str]]
+
+
+class ArtifactError(ValueError):
+    """The file is no mapping artifact this version can read."""
+
+
+def settings_digest(settings: Settings) -> str:
+    """Digest of the settings an artifact is compiled from, to tell whether it is stale."""
+    filter_tags, default_table, per_tag_tables, key_index = settings
+    canonical = json.dumps([list(filter_tags), default_table, per_tag_tables, list(key_index)],
+                           sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _little_endian(values: Sequence[int]) -> bytes:
+    data = array("I", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _arrays_offset(index_length: int) -> int:
+    """Offset of the arrays in the payload, aligned to 8 bytes like the payload itself."""
+    return (_INDEX_LENGTH.size + index_length + 7) // 8 * 8
+
+
+def write_artifact(path: str, settings: Settings, range_tables: Mapping[tuple, RangeTable]) -> int:
+    """
+    Write the range tables of a configuration compiled from ``settings`` to ``path``.
+
+    The file is written next to ``path`` and then renamed over it, so processes that
+    mapped the previous artifact keep reading a complete file.
+    Returns:
+        The size of the artifact in bytes.
+    """
+    tables = []
+    arrays = bytearray()
+    for rules, ranges in range_tables.items():
+        starts, ends, values, replacements = ranges.arrays()
+        tables.append({
+            "rules": [list(rule) for rule in rules],
+            "replacements": replacements,
+            "offset": len(arrays),
+            "count": len(starts),
+        })
+        for data in (starts, ends, values):
+            arrays += _little_endian(data)
+
+    filter_tags, default_table, per_tag_tables, key_index = settings
+    index = json.dumps({
+        "digest": settings_digest(settings),
+        "settings": [list(filter_tags), default_table, per_tag_tables, list(key_index)],
+        "tables": tables,
+    }, ensure_ascii=False).encode("utf-8")
+    padding = b"\0" * (_arrays_offset(len(index)) - _INDEX_LENGTH.size - len(index))
+    payload = _INDEX_LENGTH.pack(len(index)) + index + padding + bytes(arrays)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(payload), zlib.crc32(payload), 0)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(header)
+            f.write(payload)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return len(header) + len(payload)
+
+
+def _uint32s(buffer: memoryview, offset: int, count: int):
+    data = buffer[offset:offset + 4 * count]
+    if _NATIVE:
+        return data.cast("I")
+    copy = array("I", bytes(data))
+    if sys.byteorder != "little":
+        copy.byteswap()
+    return copy
+
+
+class MappingArtifact:
+    """
+    A mapping artifact mapped into memory.
+
+    ``range_tables`` maps the rules of each table to a :class:`RangeTable` over the
+    mapped file; pass it as the preloaded range tables of a compiled configuration.
+    The mapping stays open as long as one of its tables is in use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ArtifactError(f"{path}: empty file") from None
+        buffer = memoryview(self._mmap)
+
+        if len(buffer) < _HEADER.size:
+            raise ArtifactError(f"{path}: truncated header")
+        magic, version, _, length, checksum, _ = _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ArtifactError(f"{path}: not a mapping artifact")
+        if version != FORMAT_VERSION:
+            raise ArtifactError(f"{path}: format version {version}, expected {FORMAT_VERSION}")
+        payload = buffer[_HEADER.size:]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            raise ArtifactError(f"{path}: checksum mismatch, the file is damaged or incomplete")
+
+        index_length, = _INDEX_LENGTH.unpack_from(payload)
+        start = _INDEX_LENGTH.size
+        index = json.loads(bytes(payload[start:start + index_length]).decode("utf-8"))
+        arrays = payload[_arrays_offset(index_length):]
+
+        self.digest: str = index["digest"]
+        filter_tags, default_table, per_tag_tables, key_index = index["settings"]
+        self.settings: Settings = (filter_tags, default_table, per_tag_tables, key_index)
+        self.range_tables: Dict[tuple, RangeTable] = {}
+        for table in index["tables"]:
+            offset, count = table["offset"], table["count"]
+            self.range_tables[tuple(tuple(rule) for rule in table["rules"])] = RangeTable.from_arrays(
+                _uint32s(arrays, offset, count),
+                _uint32s(arrays, offset + 4 * count, count),
+                _uint32s(arrays, offset + 8 * count, count),
+                table["replacements"])
+
+    def __len__(self):
+        return len(self.range_tables)
+
+    def matches(self, settings: Settings) -> bool:
+        """Whether the artifact was compiled from ``settings``."""
+        return self.digest == settings_digest(settings)
+
+
+@lru_cache(maxsize=4)
+def _load(path: str, modified: int, size: int) -> MappingArtifact:
+    return MappingArtifact(path)
+
+
+def open_artifact(path: str) -> MappingArtifact:
+    """
+    Load the artifact at ``path``, reusing the mapping until the file is replaced.
+    Raises:
+        OSError: The file cannot be read.
+        ArtifactError: The file is no valid artifact of this format version.
+    """
+    status = os.stat(path)
+    return _load(os.path.abspath(path), status.st_mtime_ns, status.st_size)
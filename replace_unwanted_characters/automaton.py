@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""Aho-Corasick automaton for replacing search strings of any length in a single pass."""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Mapping, Tuple
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher built once from a set of search strings.
+
+    Replacement uses leftmost-longest semantics: scanning from the left, the longest
+    search string starting at the earliest position wins, and matching continues
+    after it. Empty search strings are ignored.
+    """
+
+    __slots__ = ("_goto", "_fail", "_length", "_output")
+
+    def __init__(self, patterns: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        # length of the pattern ending in a state, 0 for non-terminal states
+        length: List[int] = [0]
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    length.append(0)
+                    goto[state][ch] = nxt
+                state = nxt
+            length[state] = len(pattern)
+
+        fail = [0] * len(goto)
+        # nearest terminal state reachable through failure links, 0 if none
+        output = [0] * len(goto)
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                output[nxt] = fail[nxt] if length[fail[nxt]] else output[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._length = length
+        self._output = output
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield ``(start, length)`` for every occurrence of every pattern, ordered by end position."""
+        goto, fail, length, output = self._goto, self._fail, self._length, self._output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            match = state if length[state] else output[state]
+            while match:
+                size = length[match]
+                yield i - size + 1, size
+                match = output[match]
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """Return the ``(start, end)`` spans of the leftmost-longest, non-overlapping matches in ``text``."""
+        longest: Dict[int, int] = {}
+        for start, size in self.iter_matches(text):
+            if longest.get(start, 0) < size:
+                longest[start] = size
+        if not longest:
+            return []
+
+        spans = []
+        pos = 0
+        for start in sorted(longest):
+            if start < pos:
+                continue
+            pos = start + longest[start]
+            spans.append((start, pos))
+        return spans
+
+    def replace(self, text: str, mapping: Mapping[str, str]) -> str:
+        """Replace leftmost-longest occurrences of the patterns in ``text`` using ``mapping``."""
+        spans = self.find_all(text)
+        if not spans:
+            return text
+
+        pieces = []
+        pos = 0
+        for start, end in spans:
+            pieces.append(text[pos:start])
+            pieces.append(mapping[text[start:end]])
+            pos = end
+        pieces.append(text[pos:])
+        return "".join(pieces)
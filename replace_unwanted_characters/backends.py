@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+
+"""
+Interchangeable ways of applying a compiled mapping, chosen per table by measurement.
+
+Which method is fastest depends on the shape of a mapping and on the values it is
+applied to: ``str.translate`` is hard to beat for single-character keys, a regular
+expression alternation does well with a few multi-character keys, the Aho-Corasick
+automaton with many of them, and for very short values a plain dict scan can win.
+Every backend implements the same leftmost-longest semantics, literal search strings
+taking precedence over rules, so they are interchangeable.
+
+:func:`select_backend` builds the backends applicable to a mapping, checks that they
+agree on a few generated values resembling tag values, times them on those values
+and returns the fastest, keeping the first backend unless another one is clearly
+faster so that timing noise does not flip the choice between runs. The choice is
+remembered per mapping, so compiling the same mapping again costs no further
+measurement.
+
+The samples carry a search string every 25 characters or so, like most tags. On text
+where nearly every word needs a replacement a regular expression does worse than
+``str.translate``, so a mapping calibrated to the regex is slower there.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from .automaton import AhoCorasick
+from .unicode_rules import RangeTable, TranslationMap
+
+# a regex alternation of more keys than this compiles slowly and never wins
+MAX_REGEX_KEYS = 512
+# calibration passes over the samples per backend; the fastest pass counts
+CALIBRATION_ROUNDS = 3
+# mappings whose backend choice is remembered
+MAX_REMEMBERED = 256
+# another backend replaces the first one only if it takes at most this share of its time
+SWITCH_RATIO = 0.8
+
+_SAMPLE_TEXT = "The Artist feat. Guest - Song Title (Live at the Venue) [Remastered 2011] "
+_SAMPLE_LENGTHS = (8, 16, 24, 40, 80)
+
+
+class Backend:
+    """Replaces the search strings of one mapping; ``count`` returns how many ``replace`` replaces."""
+
+    name = ""
+
+    def replace(self, value: str) -> str:
+        raise NotImplementedError
+
+    def count(self, value: str) -> int:
+        raise NotImplementedError
+
+
+class TranslateBackend(Backend):
+    """``str.translate``, for mappings whose search strings are all single characters."""
+
+    name = "translate"
+
+    def __init__(self, literal: Mapping[str, str], ranges: Optional[RangeTable]):
+        translation = str.maketrans(dict(literal)) if literal else {}
+        self._translation = TranslationMap(translation, ranges) if ranges else translation
+        self._literal = literal
+        self._ranges = ranges
+
+    def replace(self, value: str) -> str:
+        return value.translate(self._translation)
+
+    def count(self, value: str) -> int:
+        lookup = self._ranges.lookup if self._ranges else None
+        return sum(1 for c in value if c in self._literal or (lookup is not None and lookup(ord(c)) is not None))
+
+
+class RegexBackend(Backend):
+    """One regular expression alternating the search strings, longest first, then the rules' characters."""
+
+    name = "regex"
+
+    def __init__(self, literal: Mapping[str, str], ranges: Optional[RangeTable]):
+        # at a given position the alternation takes the first alternative that matches
+        alternatives = [re.escape(k) for k in sorted(literal, key=len, reverse=True)]
+        if ranges:
+            alternatives.append("[" + ranges.character_class() + "]")
+        self._pattern = re.compile("|".join(alternatives))
+        get = literal.get
+        lookup = ranges.lookup if ranges else None
+
+        def replacement(match) -> str:
+            text = match.group()
+            result = get(text)
+            if result is None and lookup is not None:
+                result = lookup(ord(text))
+            # the alternation only matches search strings and characters the rules replace
+            return text if result is None else result
+        self._replacement = replacement
+
+    def replace(self, value: str) -> str:
+        return self._pattern.sub(self._replacement, value)
+
+    def count(self, value: str) -> int:
+        return len(self._pattern.findall(value))
+
+
+class AutomatonBackend(Backend):
+    """The Aho-Corasick automaton, translating the text between matches through the rules."""
+
+    name = "automaton"
+
+    def __init__(self, literal: Mapping[str, str], ranges: Optional[RangeTable]):
+        self._literal = literal
+        self._matcher = AhoCorasick(literal)
+        self._ranges = ranges
+        self._translation = TranslationMap({}, ranges) if ranges else None
+
+    def replace(self, value: str) -> str:
+        if self._translation is None:
+            return self._matcher.replace(value, self._literal)
+        pieces = []
+        pos = 0
+        for start, end in self._matcher.find_all(value):
+            pieces.append(value[pos:start].translate(self._translation))
+            pieces.append(self._literal[value[start:end]])
+            pos = end
+        pieces.append(value[pos:].translate(self._translation))
+        return "".join(pieces)
+
+    def count(self, value: str) -> int:
+        spans = self._matcher.find_all(value)
+        if self._ranges is None:
+            return len(spans)
+        covered = {i for start, end in spans for i in range(start, end)}
+        lookup = self._ranges.lookup
+        return len(spans) + sum(1 for i, c in enumerate(value) if i not in covered and lookup(ord(c)) is not None)
+
+
+class _CharMap(dict):
+    """Character to replacement, or to the character itself, filled from the rules on first use."""
+
+    __slots__ = ("_lookup",)
+
+    def __init__(self, literal: Dict[str, str], ranges: Optional[RangeTable]):
+        super().__init__(literal)
+        self._lookup = ranges.lookup if ranges else None
+
+    def __missing__(self, char: str) -> str:
+        replacement = self._lookup(ord(char)) if self._lookup is not None else None
+        value = char if replacement is None else replacement
+        self[char] = value
+        return value
+
+
+class DictBackend(Backend):
+    """A plain scan with dict lookups, trying the longest search strings first at every position."""
+
+    name = "dict"
+
+    def __init__(self, literal: Mapping[str, str], ranges: Optional[RangeTable]):
+        self._single = {k: v for k, v in literal.items() if len(k) == 1}
+        self._chars = _CharMap(self._single, ranges)
+        self._lookup = ranges.lookup if ranges else None
+        self._long = {k: v for k, v in literal.items() if len(k) > 1}
+        self._lengths = sorted({len(k) for k in self._long}, reverse=True)
+        self._starts = frozenset(k[0] for k in self._long)
+
+    def _long_match(self, value: str, pos: int) -> Optional[Tuple[int, str]]:
+        """Length and replacement of the longest multi-character search string at ``pos``."""
+        if value[pos] in self._starts:
+            get = self._long.get
+            for length in self._lengths:
+                result = get(value[pos:pos + length])
+                if result is not None:
+                    return length, result
+        return None
+
+    def replace(self, value: str) -> str:
+        chars = self._chars
+        if not self._lengths:
+            return "".join([chars[c] for c in value])
+        pieces = []
+        pos = 0
+        while pos < len(value):
+            match = self._long_match(value, pos)
+            if match is None:
+                pieces.append(chars[value[pos]])
+                pos += 1
+            else:
+                pieces.append(match[1])
+                pos += match[0]
+        return "".join(pieces)
+
+    def count(self, value: str) -> int:
+        single, lookup = self._single, self._lookup
+        count = 0
+        pos = 0
+        while pos < len(value):
+            match = self._long_match(value, pos) if self._lengths else None
+            if match is None:
+                c = value[pos]
+                if c in single or (lookup is not None and lookup(ord(c)) is not None):
+                    count += 1
+                pos += 1
+            else:
+                count += 1
+                pos += match[0]
+        return count
+
+
+def build_backends(literal: Mapping[str, str], ranges: Optional[RangeTable]) -> List[Backend]:
+    """Every backend applicable to a mapping, the one used without calibration first."""
+    if not literal and not ranges:
+        return [TranslateBackend(literal, ranges)]
+    if all(len(k) == 1 for k in literal):
+        backends: List[Backend] = [TranslateBackend(literal, ranges)]
+    else:
+        backends = [AutomatonBackend(literal, ranges)]
+    if len(literal) <= MAX_REGEX_KEYS:
+        backends.append(RegexBackend(literal, ranges))
+    backends.append(DictBackend(literal, ranges))
+    return backends
+
+
+def calibration_samples(literal: Mapping[str, str], ranges: Optional[RangeTable]) -> List[str]:
+    """Values resembling tag values, mostly short, each with a search string or rule character or two."""
+    inserts = sorted(literal)[:8]
+    if ranges:
+        inserts += [chr(start) for start, _ in list(ranges.ranges())[:4]]
+    inserts = inserts or [""]
+    samples = []
+    n = 0
+    for length in _SAMPLE_LENGTHS:
+        text = (_SAMPLE_TEXT * (length // len(_SAMPLE_TEXT) + 1))[:length]
+        for _ in range(4):
+            pieces = []
+            # about one search string every 25 characters, at least one per value
+            for start in range(0, length, 25):
+                pieces.append(text[start:start + 25 - n % 7])
+                pieces.append(inserts[n % len(inserts)])
+                n += 1
+            samples.append("".join(pieces))
+    return samples
+
+
+def _timed(backend: Backend, samples: List[str]) -> float:
+    replace = backend.replace
+    best = float("inf")
+    for _ in range(CALIBRATION_ROUNDS):
+        start = time.perf_counter()
+        for sample in samples:
+            replace(sample)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+_remembered: "OrderedDict[tuple, str]" = OrderedDict()
+_remembered_lock = threading.Lock()
+
+
+def select_backend(literal: Mapping[str, str], ranges: Optional[RangeTable], rules: tuple = (),
+                   timer: Callable[[Backend, List[str]], float] = _timed) -> Backend:
+    """
+    Return the fastest backend for a mapping, measured on calibration samples.
+
+    ``rules`` are the ``(rule key, replacement)`` pairs ``ranges`` was compiled from,
+    identifying the mapping together with ``literal``. Backends whose results differ
+    from the first one's are never chosen, and the first one is kept unless the
+    fastest takes at most ``SWITCH_RATIO`` of its time.
+    """
+    backends = build_backends(literal, ranges)
+    if len(backends) == 1:
+        return backends[0]
+
+    key = (tuple(literal.items()), rules)
+    with _remembered_lock:
+        name = _remembered.get(key)
+        if name is not None:
+            _remembered.move_to_end(key)
+    if name is not None:
+        for backend in backends:
+            if backend.name == name:
+                return backend
+
+    samples = calibration_samples(literal, ranges)
+    expected = [backends[0].replace(sample) for sample in samples]
+    agreeing = [backend for backend in backends
+                if backend is backends[0] or [backend.replace(sample) for sample in samples] == expected]
+    timings = {backend.name: timer(backend, samples) for backend in agreeing}
+    fastest = min(agreeing, key=lambda backend: timings[backend.name])
+    chosen = fastest if timings[fastest.name] <= SWITCH_RATIO * timings[backends[0].name] else backends[0]
+
+    with _remembered_lock:
+        _remembered[key] = chosen.name
+        while len(_remembered) > MAX_REMEMBERED:
+            _remembered.popitem(last=False)
+    return chosen
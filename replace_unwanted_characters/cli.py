@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+
+"""
+Sanitize the tags of audio files on disk with the plugin's mapping config, without Picard.
+
+Run as ``replace-unwanted-characters`` (or ``python -m replace_unwanted_characters.cli``)::
+
+    replace-unwanted-characters ~/Music --dry-run -v
+    replace-unwanted-characters ~/Music --config mapping.json --workers 8 \\
+        --checkpoint progress.txt --resume --report report.json
+
+The config file is a JSON object using the plugin's setting names
+(``replace_unwanted_characters_filter_tags``, ``..._char_table`` and
+``..._per_tag_tables``); missing settings take the plugin's defaults. Tags are read
+and written through mutagen's easy interfaces, so tag names follow Picard's
+(``label`` is written as ``organization`` to ID3 and MP4 files, for example). The
+ID3 tags of WAV, AIFF and DSF files are read through the same interface as those of
+MP3 files.
+
+Files are processed in batches by a process pool; at most ``--queue-size`` batches
+are in flight, so memory stays flat however large the library is. With
+``--checkpoint`` every finished file is appended to the checkpoint file and
+``--resume`` skips the files listed there. A dry run only reads the checkpoint, so
+a later real run still processes every file.
+
+Compiled range tables of Unicode rules can be exported once with ``--export-artifact``
+and loaded by the workers with ``--artifact``, which maps the file into memory so all
+workers share one copy (see :mod:`.artifact`)::
+
+    replace-unwanted-characters --config mapping.json --export-artifact mapping.rutbl
+    replace-unwanted-characters ~/Music --artifact mapping.rutbl --workers 8
+
+Without ``--config`` the settings are read from the artifact as well.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TypedDict, cast
+
+import mutagen
+from mutagen.easyid3 import EasyID3
+from mutagen.id3 import ID3
+
+from .artifact import MappingArtifact, Settings, open_artifact, write_artifact
+from .constants import (
+    CONFIG_NAME_CHAR_TABLE,
+    CONFIG_NAME_FILTER_TAGS,
+    CONFIG_NAME_KEY_INDEX,
+    CONFIG_NAME_PER_TAG_TABLES,
+    DEFAULT_CHAR_MAPPING,
+    DEFAULT_TAGS,
+)
+from .engine import CompiledConfig, table_lookup
+
+AUDIO_EXTENSIONS = (".aac", ".aif", ".aiff", ".ape", ".asf", ".dsf", ".flac", ".m4a", ".m4b", ".mp3", ".mp4",
+                    ".mpc", ".oga", ".ogg", ".opus", ".spx", ".tta", ".wav", ".wma", ".wv")
+
+# mutagen easy tag keys whose Picard tag name differs
+EASY_TAG_ALIASES = {
+    "organization": "label",
+    "musicbrainz_albumtype": "releasetype",
+    "musicbrainz_albumstatus": "releasestatus",
+}
+
+
+
+class FileResult(TypedDict):
+    """Result record of one file: the changed tags with their new values, or the error."""
+
+    path: str
+    changes: Dict[str, List[str]]
+    error: Optional[str]
+
+
+# compiled config of a worker process, set up once by _init_worker
+_worker_config: Optional[CompiledConfig] = None
+
+
+def load_settings(path: Optional[str] = None) -> Dict[str, object]:
+    """Read the mapping settings from a JSON file, falling back to the plugin defaults."""
+    settings: Dict[str, object] = {
+        CONFIG_NAME_FILTER_TAGS: list(DEFAULT_TAGS),
+        CONFIG_NAME_CHAR_TABLE: dict(DEFAULT_CHAR_MAPPING),
+        CONFIG_NAME_PER_TAG_TABLES: {},
+        CONFIG_NAME_KEY_INDEX: [],
+    }
+    if path:
+        with open(path, encoding="utf-8") as f:
+            loaded = json.load(f)
+        if not isinstance(loaded, dict):
+            raise ValueError(f"{path}: expected a JSON object with the plugin settings")
+        settings.update((name, loaded[name]) for name in settings if name in loaded)
+    return settings
+
+
+def artifact_settings(artifact: MappingArtifact) -> Dict[str, object]:
+    """The settings a mapping artifact was exported from."""
+    names = (CONFIG_NAME_FILTER_TAGS, CONFIG_NAME_CHAR_TABLE, CONFIG_NAME_PER_TAG_TABLES, CONFIG_NAME_KEY_INDEX)
+    return dict(zip(names, artifact.settings))
+
+
+def settings_tuple(settings: Dict[str, object]) -> Settings:
+    # the values come from JSON as the plugin stores them; CompiledConfig handles their content
+    return cast(Settings, (settings[CONFIG_NAME_FILTER_TAGS], settings[CONFIG_NAME_CHAR_TABLE],
+                           settings[CONFIG_NAME_PER_TAG_TABLES], settings[CONFIG_NAME_KEY_INDEX]))
+
+
+def compile_settings(settings: Dict[str, object], artifact: Optional[MappingArtifact] = None) -> CompiledConfig:
+    return CompiledConfig(*settings_tuple(settings), artifact.range_tables if artifact is not None else None)
+
+
+def iter_audio_files(roots: Iterable[str], extensions: Iterable[str] = AUDIO_EXTENSIONS) -> Iterator[str]:
+    """Yield audio file paths below ``roots`` in a stable order."""
+    extensions = tuple(ext.lower() for ext in extensions)
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for directory, subdirectories, files in os.walk(root):
+            subdirectories.sort()
+            for name in sorted(files):
+                if name.lower().endswith(extensions):
+                    yield os.path.join(directory, name)
+
+
+class EasyID3Frames:
+    """
+    Picard-like tag names over the raw ID3 tags of a file, as :class:`EasyID3` reads them.
+
+    mutagen has no easy variant of the WAV, AIFF and DSF formats; their ID3 tags (keyed
+    by frame IDs such as ``TIT2``) are mapped through the key mappings registered on
+    :class:`EasyID3`, which get and set the frames of the tag object the file saves.
+    """
+
+    def __init__(self, id3: ID3):
+        self.id3 = id3
+
+    @staticmethod
+    def _mapping(registry, key: str):
+        key = key.lower()
+        if key in registry:
+            return registry[key]
+        # keys such as "performer:guitar" are registered as glob patterns
+        for pattern, function in registry.items():
+            if fnmatchcase(key, pattern):
+                return function
+        raise KeyError(key)
+
+    def keys(self) -> List[str]:
+        keys = []
+        for key, getter in EasyID3.Get.items():
+            if key in EasyID3.List:
+                keys.extend(EasyID3.List[key](self.id3, key))
+                continue
+            try:
+                getter(self.id3, key)
+            except KeyError:
+                continue
+            keys.append(key)
+        return keys
+
+    def __getitem__(self, key: str) -> List[str]:
+        return self._mapping(EasyID3.Get, key)(self.id3, key)
+
+    def __setitem__(self, key: str, values: List[str]):
+        self._mapping(EasyID3.Set, key)(self.id3, key, values)
+
+
+def easy_tags(audio):
+    """The tags of a file loaded with ``easy=True``, with Picard-like names."""
+    tags = audio.tags
+    if isinstance(tags, ID3):
+        return EasyID3Frames(tags)
+    return tags
+
+
+def sanitize_file(path: str, config: CompiledConfig, dry_run: bool = False) -> FileResult:
+    """Sanitize the tags of one file; returns a result record for the report."""
+    result: FileResult = {"path": path, "changes": {}, "error": None}
+    try:
+        audio = mutagen.File(path, easy=True)
+        if audio is None or audio.tags is None:
+            return result
+
+        tags = easy_tags(audio)
+        table_for = table_lookup(config.tag_tables)
+        changes = {}
+        for key in list(tags.keys()):
+            name = key.lower()
+            table = table_for(EASY_TAG_ALIASES.get(name, name))
+            if table is None:
+                continue
+            values = tags[key]
+            if isinstance(values, str):
+                values = [values]
+            sanitized = table.sanitize_changed([str(value) for value in values])
+            if sanitized is not None:
+                changes[key] = sanitized
+
+        if changes and not dry_run:
+            for key, values in changes.items():
+                tags[key] = values
+            audio.save()
+        result["changes"] = changes
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _init_worker(settings: Dict[str, object], artifact_path: Optional[str] = None):
+    global _worker_config
+    _worker_config = compile_settings(settings, open_artifact(artifact_path) if artifact_path else None)
+
+
+def _sanitize_batch(paths: List[str], dry_run: bool) -> List[FileResult]:
+    config = _worker_config
+    assert config is not None, "worker process not initialized"
+    return [sanitize_file(path, config, dry_run) for path in paths]
+
+
+def _batches(paths: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_checkpoint(path: str) -> Set[str]:
+    """Files recorded as done in a checkpoint file; a missing file records none."""
+    try:
+        # a damaged checkpoint only costs reprocessing the files its unreadable lines name
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+class Report:
+    """Counters collected while processing and the final throughput summary."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.files = 0
+        self.files_changed = 0
+        self.tags_changed = 0
+        self.skipped = 0
+        self.errors: List[Dict[str, str]] = []
+
+    def add(self, result: FileResult):
+        self.files += 1
+        if result["error"] is not None:
+            self.errors.append({"path": result["path"], "error": result["error"]})
+        elif result["changes"]:
+            self.files_changed += 1
+            self.tags_changed += len(result["changes"])
+
+    def as_dict(self) -> Dict[str, object]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "files": self.files,
+            "files_changed": self.files_changed,
+            "tags_changed": self.tags_changed,
+            "skipped_from_checkpoint": self.skipped,
+            "errors": len(self.errors),
+            "seconds": elapsed,
+            "files_per_second": self.files / elapsed if elapsed else 0.0,
+            "error_details": self.errors,
+        }
+
+    def format(self, dry_run: bool) -> str:
+        data = self.as_dict()
+        verb = "would change" if dry_run else "changed"
+        return (f"{data['files']} files in {data['seconds']:.1f} s ({data['files_per_second']:,.0f} files/s), "
+                f"{verb} {data['tags_changed']} tags in {data['files_changed']} files, "
+                f"{data['errors']} errors, {data['skipped_from_checkpoint']} skipped from checkpoint")
+
+
+def run(roots: Iterable[str], settings: Dict[str, object], workers: Optional[int] = None, batch_size: int = 64,
+        queue_size: Optional[int] = None, dry_run: bool = False, checkpoint: Optional[str] = None,
+        resume: bool = False, verbose: bool = False, artifact: Optional[str] = None, out=None) -> Report:
+    """
+    Process every audio file below ``roots`` and return the report; workers load range tables from ``artifact``.
+
+    Finished files are appended to ``checkpoint``, except in a dry run, which only reads it.
+    """
+    report = Report()
+    done = read_checkpoint(checkpoint) if checkpoint and resume else set()
+
+    def pending_paths():
+        for path in iter_audio_files(roots):
+            if path in done:
+                report.skipped += 1
+            else:
+                yield path
+
+    workers = workers or os.cpu_count() or 1
+    queue_size = queue_size or workers * 2
+    checkpoint_file = open(checkpoint, "a", encoding="utf-8") if checkpoint and not dry_run else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings, artifact)) as pool:
+            batches = _batches(pending_paths(), batch_size)
+            in_flight = set()
+            while True:
+                # keep at most queue_size batches submitted, so walking the tree never runs far ahead
+                for batch in batches:
+                    in_flight.add(pool.submit(_sanitize_batch, batch, dry_run))
+                    if len(in_flight) >= queue_size:
+                        break
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    for result in future.result():
+                        report.add(result)
+                        if verbose and (result["changes"] or result["error"]):
+                            print(_describe(result), file=out)
+                        if checkpoint_file is not None and not result["error"]:
+                            checkpoint_file.write(result["path"] + "\n")
+                if checkpoint_file is not None:
+                    checkpoint_file.flush()
+    finally:
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+    return report
+
+
+def _describe(result: FileResult) -> str:
+    if result["error"]:
+        return f"{result['path']}: {result['error']}"
+    changes = ", ".join(f"{key}={values!r}" for key, values in result["changes"].items())
+    return f"{result['path']}: {changes}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="directories or files to process")
+    parser.add_argument("--config", metavar="PATH", help="JSON file with the plugin settings")
+    parser.add_argument("--artifact", metavar="PATH", help="load compiled range tables (and settings, without --config) from a mapping artifact")
+    parser.add_argument("--export-artifact", metavar="PATH", help="write the compiled range tables to a mapping artifact")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without writing files")
+    parser.add_argument("--workers", type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--batch-size", type=int, default=64, help="files per task sent to a worker")
+    parser.add_argument("--queue-size", type=int, help="batches in flight at most (default: 2 per worker)")
+    parser.add_argument("--checkpoint", metavar="PATH", help="append finished files to this file (only read in a dry run)")
+    parser.add_argument("--resume", action="store_true", help="skip files listed in the checkpoint file")
+    parser.add_argument("--report", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every changed file")
+    args = parser.parse_args(argv)
+
+    if not args.paths and not args.export_artifact:
+        parser.error("no paths given")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    try:
+        settings = load_settings(args.config)
+        artifact = open_artifact(args.artifact) if args.artifact else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if artifact is not None:
+        if not args.config:
+            settings = artifact_settings(artifact)
+        elif not artifact.matches(settings_tuple(settings)):
+            print(f"{args.artifact}: exported from other settings, only tables with unchanged rules are loaded",
+                  file=sys.stderr)
+    if args.export_artifact:
+        compiled = compile_settings(settings, artifact)
+        size = write_artifact(args.export_artifact, settings_tuple(settings), compiled.range_tables)
+        print(f"{args.export_artifact}: {len(compiled.range_tables)} range tables, {size:,} bytes")
+        if not args.paths:
+            return 0
+
+    report = run(args.paths, settings, workers=args.workers, batch_size=args.batch_size,
+                 queue_size=args.queue_size, dry_run=args.dry_run, checkpoint=args.checkpoint,
+                 resume=args.resume, verbose=args.verbose, artifact=args.artifact)
+    print(report.format(args.dry_run))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report.as_dict(), f, indent=2)
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
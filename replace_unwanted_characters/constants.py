@@ -10,4 +10,20 @@ DEFAULT_CHAR_MAPPING = {
 }
 CONFIG_NAME_FILTER_TAGS = "replace_unwanted_characters_filter_tags"
 CONFIG_NAME_PER_TAG_TABLES = "replace_unwanted_characters_per_tag_tables"
+CONFIG_NAME_KEY_INDEX = "replace_unwanted_characters_key_index"
 CONFIG_NAME_CHAR_TABLE = "replace_unwanted_characters_char_table"
+CONFIG_NAME_CACHE_SIZE = "replace_unwanted_characters_cache_size"
+CONFIG_NAME_INTERN_SIZE = "replace_unwanted_characters_intern_size"
+CONFIG_NAME_INSTRUMENTATION = "replace_unwanted_characters_instrumentation"
+CONFIG_NAME_STATS_LOG_INTERVAL = "replace_unwanted_characters_stats_log_interval"
+CONFIG_NAME_PROFILE_CALLS = "replace_unwanted_characters_profile_calls"
+CONFIG_NAME_APPLY_TO_LOADED = "replace_unwanted_characters_apply_to_loaded"
+CONFIG_NAME_ARTIFACT = "replace_unwanted_characters_artifact"
+
+# path of a mapping artifact, taking precedence over CONFIG_NAME_ARTIFACT
+ENV_VAR_ARTIFACT = "REPLACE_UNWANTED_CHARACTERS_ARTIFACT"
+# number of calls to profile, taking precedence over CONFIG_NAME_PROFILE_CALLS
+ENV_VAR_PROFILE_CALLS = "REPLACE_UNWANTED_CHARACTERS_PROFILE"
+
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_INTERN_SIZE = 0
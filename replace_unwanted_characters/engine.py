@@ -0,0 +1,956 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compiled replacement engine used by the metadata processor and the tagger script function.
+
+This module and the modules it imports depend on neither Qt nor Picard, so the engine
+can be reused from scripts and worker processes.
+"""
+
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from .backends import select_backend
+from .instrumentation import instrumentation
+from .key_masks import KeyIndex
+from .profiles import FilesystemProfile, get_profile
+from .tag_patterns import TagTables, is_pattern
+from .unicode_rules import RangeTable, is_rule, parse_rule
+
+# sanitized strings, or fingerprint tuples of them
+H = TypeVar("H", bound=Hashable)
+
+
+class CompiledTable:
+    """
+    A search/replace mapping compiled once for repeated sanitizing.
+
+    Search keys with rule syntax (Unicode categories and code point ranges, see
+    :mod:`.unicode_rules`) compile into a range table consulted for characters that
+    no literal search string matches.
+
+    Replacing is done by one of the backends of :mod:`.backends` (``str.translate``, a
+    regex alternation, the Aho-Corasick automaton or a dict scan), whichever a short
+    calibration on values resembling tag values finds fastest for this mapping; its
+    name is in ``backend``. All of them match leftmost-longest in a single pass. With
+    an ``intern_pool``, equal results share one string object.
+
+    A precompiled scanner over the first characters of all search strings detects values
+    that cannot contain a match, so those are returned as they are without allocating.
+    """
+
+    __slots__ = ("mapping", "idempotent", "backend", "_replace", "_count", "_scanner", "_search", "_cache")
+
+    def __init__(self, mapping: Mapping[str, str], cache: Optional["SanitizeCache"] = None,
+                 range_tables: Optional["RangeTables"] = None, intern_pool: Optional["InternPool"] = None):
+        self._cache = cache
+        self.mapping: Dict[str, str] = {k: v for k, v in mapping.items() if k}
+
+        rules = []
+        literal: Dict[str, str] = {}
+        for k, v in self.mapping.items():
+            if is_rule(k):
+                rules.append((k, v))
+            else:
+                literal[k] = v
+        if not rules:
+            ranges = None
+        elif range_tables is not None:
+            ranges = range_tables.table(tuple(rules))
+        else:
+            ranges = compile_rules(rules)
+
+        backend = select_backend(literal, ranges, tuple(rules))
+        self.backend = backend.name
+        self._replace = backend.replace if intern_pool is None else intern_pool.wrap(backend.replace)
+        self._count = backend.count
+
+        triggers = "".join(re.escape(c) for c in sorted({k[0] for k in literal}))
+        if ranges:
+            triggers += ranges.character_class()
+        # sanitizing a sanitized value again is a no-op if no replacement can trigger a match;
+        # replacements next to untouched text may form new multi-character matches
+        self.idempotent = all(len(k) == 1 for k in literal) and not any(
+            c in literal or (ranges and ranges.lookup(ord(c)) is not None)
+            for replacement in self.mapping.values() for c in replacement)
+        self._scanner = re.compile("[" + triggers + "]") if triggers else None
+        self._search = self._scanner.search if self._scanner is not None else None
+
+    def __bool__(self):
+        return bool(self.mapping)
+
+    def needs_replacement(self, value: str) -> bool:
+        """Return False if ``value`` contains no character that can start a search string."""
+        return self._search is not None and self._search(value) is not None
+
+    def sanitize(self, value: str) -> str:
+        """Sanitize a single string."""
+        if self._search is None or self._search(value) is None:
+            return value
+        if self._cache is not None:
+            return self._cache.get(self, value)
+        return self._replace(value)
+
+    def replace(self, value: str) -> str:
+        """Replace all search strings in ``value``, bypassing the scanner and the value cache."""
+        return self._replace(value)
+
+    def count_replacements(self, value: str) -> int:
+        """Return how many search strings sanitizing ``value`` replaces."""
+        if self._scanner is None:
+            return 0
+        if self.backend == "translate":
+            # every trigger character of a translate table is a search key or matched by a rule
+            return len(self._scanner.findall(value))
+        return self._count(value)
+
+    def sanitize_values(self, values: Iterable[str]) -> List[str]:
+        """Sanitize every string of a tag value list."""
+        sanitize = self.sanitize
+        return [sanitize(item) for item in values]
+
+    def sanitize_changed(self, values: List[str]) -> Optional[List[str]]:
+        """Return the sanitized value list, or None if sanitizing would not change any value."""
+        search = self._search
+        if search is None:
+            return None
+        for item in values:
+            if search(item) is not None:
+                break
+        else:
+            return None
+        sanitized = self.sanitize_values(values)
+        return None if sanitized == values else sanitized
+
+
+class ProfiledTable:
+    """
+    A compiled table followed by a filesystem profile (see :mod:`.profiles`).
+
+    Has the sanitizing interface of :class:`CompiledTable`. Every value is passed to the
+    profile, since truncation, reserved names and trailing characters do not depend on
+    the table's search strings.
+    """
+
+    __slots__ = ("table", "profile", "idempotent")
+
+    def __init__(self, table: CompiledTable, profile: FilesystemProfile):
+        self.table = table
+        self.profile = profile
+        # the look-alikes the profile writes may be search strings of the table
+        self.idempotent = False
+
+    def __bool__(self):
+        return True
+
+    @property
+    def backend(self) -> str:
+        return f"{self.table.backend}+{self.profile.name}"
+
+    def needs_replacement(self, value: str) -> bool:
+        return True
+
+    def sanitize(self, value: str) -> str:
+        return self.profile.apply(self.table.sanitize(value))
+
+    replace = sanitize
+
+    def count_replacements(self, value: str) -> int:
+        return self.table.count_replacements(value) + self.profile.table.count_replacements(self.table.sanitize(value))
+
+    def sanitize_values(self, values: Iterable[str]) -> List[str]:
+        sanitize = self.sanitize
+        return [sanitize(item) for item in values]
+
+    def sanitize_changed(self, values: List[str]) -> Optional[List[str]]:
+        sanitized = self.sanitize_values(values)
+        return None if sanitized == values else sanitized
+
+
+# what ``CompiledConfig.tag_tables`` holds for an affected tag
+TagTable = Union[CompiledTable, ProfiledTable]
+
+
+def table_lookup(tag_tables: Mapping[str, Optional[TagTable]]) -> Callable[[str], Optional[TagTable]]:
+    """
+    Return the function giving the table of a tag name, or None, for ``tag_tables``.
+
+    That is :meth:`TagTables.table_for` for tag tables with pattern entries and ``get``
+    for a plain dict, which has exact names only.
+    """
+    if isinstance(tag_tables, TagTables):
+        return tag_tables.table_for
+    return tag_tables.get
+
+
+class SanitizeCache:
+    """
+    Size-bounded LRU cache of sanitized values keyed by (compiled table, value).
+
+    Only values that contain a trigger character reach the cache; clean values are
+    cheaper to scan than to look up. A ``max_size`` of 0 disables caching.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def get(self, table: CompiledTable, value: str) -> str:
+        """Return ``value`` sanitized with ``table``, computing and storing it on a miss."""
+        key = (table, value)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = table.replace(value)
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[key] = result
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def resize(self, max_size: int):
+        """Change the size limit, evicting the least recently used entries if needed."""
+        with self._lock:
+            self.max_size = max(0, int(max_size))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries, keeping the statistics."""
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class InternPool:
+    """
+    Size-bounded pool of sanitized values, so equal results share one object.
+
+    Sanitizing creates a new string for every value it changes, and the fingerprint of
+    every track a new tuple per tag, so the same artist or label across thousands of
+    tracks is stored thousands of times. Through the pool, a result equal to one
+    produced before is replaced by that earlier object and the new one is freed right
+    away. Strings and tuples cannot be weakly referenced, so the pool keeps up to
+    ``max_size`` values alive in a plain dict, dropping the oldest first; an ordered
+    dict moving every hit to the end would cost more memory per entry than a shared
+    value saves. A ``max_size`` of 0 disables it.
+    """
+
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self._values: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def intern(self, value: H) -> H:
+        """Return the pooled value equal to ``value``, adding ``value`` if there is none."""
+        with self._lock:
+            pooled = self._values.get(value)
+            if pooled is not None:
+                self.hits += 1
+                return pooled
+            self.misses += 1
+            if self.max_size > 0:
+                self._values[value] = value
+                if len(self._values) > self.max_size:
+                    del self._values[next(iter(self._values))]
+                    self.evictions += 1
+        return value
+
+    def wrap(self, replace: Callable[[str], str]) -> Callable[[str], str]:
+        """Return ``replace`` with its results interned."""
+        intern = self.intern
+
+        def interned(value: str) -> str:
+            return intern(replace(value))
+        return interned
+
+    def resize(self, max_size: int):
+        """Change the size limit, dropping the oldest values if needed."""
+        with self._lock:
+            self.max_size = max(0, int(max_size))
+            excess = len(self._values) - self.max_size
+            if excess > 0:
+                for value in list(islice(self._values, excess)):
+                    del self._values[value]
+                self.evictions += excess
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._values),
+            "max_size": self.max_size,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def compile_rules(rules: Iterable[tuple]) -> RangeTable:
+    """Compile ``(rule key, replacement)`` pairs, in priority order, into a range table."""
+    parsed = ((parse_rule(key), replacement) for key, replacement in rules)
+    # the keys are valid rules, so every one has its ranges
+    return RangeTable((ranges, replacement) for ranges, replacement in parsed if ranges is not None)
+
+
+class RangeTables(dict):
+    """
+    The range tables of a compiled configuration, by their rules.
+
+    Keys are tuples of ``(rule key, replacement)`` pairs in priority order, so tables
+    with the same rules share one range table. Tables found in ``preloaded``, e.g.
+    loaded from a mapping artifact (see :mod:`.artifact`), are used instead of
+    compiling the rules; ``loaded`` and ``compiled`` count both cases.
+    """
+
+    __slots__ = ("_preloaded", "loaded", "compiled")
+
+    def __init__(self, preloaded: Optional[Mapping[tuple, RangeTable]] = None):
+        super().__init__()
+        self._preloaded = preloaded or {}
+        self.loaded = 0
+        self.compiled = 0
+
+    def table(self, rules: tuple) -> RangeTable:
+        ranges = self.get(rules)
+        if ranges is None:
+            ranges = self._preloaded.get(rules)
+            if ranges is None:
+                ranges = compile_rules(rules)
+                self.compiled += 1
+            else:
+                self.loaded += 1
+            self[rules] = ranges
+        return ranges
+
+
+def compile_table(table) -> CompiledTable:
+    """Return ``table`` as a :class:`CompiledTable`, compiling plain mappings."""
+    if isinstance(table, CompiledTable):
+        return table
+    return CompiledTable(table)
+
+
+class CompiledConfig:
+    """
+    The plugin configuration compiled into one table per affected tag.
+
+    A compiled configuration is a snapshot: it is not changed after construction
+    (memoized profile tables aside, which depend only on the default table), so it can
+    be shared between threads without locking.
+
+    ``tag_tables`` maps each affected tag to its table, or to None if its per-tag entry
+    is inactive, so a single dict lookup decides whether and how a tag is sanitized.
+    Tags with a filesystem profile get a :class:`ProfiledTable`. With glob or regex
+    entries in the affected tags list, ``tag_tables`` is a :class:`TagTables` whose
+    ``table_for`` decides other names on their first lookup; an exact name takes
+    precedence over patterns, and earlier patterns over later ones. Use
+    :func:`table_lookup` to resolve names either way.
+
+    The range tables of Unicode rules are collected in ``range_tables``; those in
+    ``preloaded_ranges`` are reused rather than compiled. ``backends`` names the
+    backend chosen for the default table and for each affected-tags entry. Results of
+    every table go through ``intern_pool``, if given, which is kept as an attribute so
+    the processors can intern fingerprints through the same pool.
+    """
+
+    def __init__(self, filter_tags: Iterable[str], default_table: Mapping[str, str],
+                 per_tag_tables: Mapping[str, object], key_index: Sequence[str] = (),
+                 preloaded_ranges: Optional[Mapping[tuple, RangeTable]] = None, version: int = 0,
+                 value_cache: Optional[SanitizeCache] = None, intern_pool: Optional[InternPool] = None):
+        self.version = version
+        self.range_tables = RangeTables(preloaded_ranges)
+        self.intern_pool = intern_pool
+        self.default = CompiledTable(default_table, value_cache, self.range_tables, intern_pool)
+        self.backends: Dict[str, str] = {"(default)": self.default.backend}
+        self._profile_tables: Dict[str, ProfiledTable] = {}
+        tag_tables: Dict[str, Optional[TagTable]] = {}
+        pattern_tables: List[tuple] = []
+
+        # tags selecting the same keys (and profile) share one compiled table
+        by_selection: Dict[tuple, TagTable] = {}
+        index = KeyIndex(key_index)
+        for tag in filter_tags:
+            table = self._table_for(per_tag_tables.get(tag), default_table, index, by_selection, value_cache)
+            self.backends.setdefault(tag, "inactive" if table is None else table.backend)
+            if is_pattern(tag):
+                pattern_tables.append((tag, table))
+            else:
+                # inactive tags are stored as None, so a pattern cannot select them
+                tag_tables.setdefault(tag, table)
+
+        self.tag_tables: Mapping[str, Optional[TagTable]] = \
+            TagTables(tag_tables, pattern_tables) if pattern_tables else tag_tables
+
+    def _table_for(self, entry, default_table: Mapping[str, str], index: KeyIndex, by_selection: Dict[tuple, TagTable],
+                   value_cache: Optional[SanitizeCache]) -> Optional[TagTable]:
+        """Compiled table of a per-tag entry, None if the entry is inactive."""
+        if entry is None:
+            return self.default
+
+        profile = None
+        if isinstance(entry, dict):
+            if not entry.get("active", True):
+                return None
+            profile = get_profile(entry.get("profile") or "")
+        # masks, and the key lists of older versions encoded on the fly
+        mask = index.entry_mask(entry)
+
+        table = by_selection.get((mask, None))
+        if table is None:
+            table = CompiledTable(index.select(mask, default_table), value_cache, self.range_tables,
+                                  self.intern_pool)
+            by_selection[(mask, None)] = table
+        if profile is not None:
+            # the unprofiled entry of a selection is always a CompiledTable
+            assert isinstance(table, CompiledTable)
+            table = by_selection.setdefault((mask, profile.name), ProfiledTable(table, profile))
+        return table
+
+    def backend_summary(self) -> str:
+        return ", ".join(f"{name}: {backend}" for name, backend in self.backends.items())
+
+    def profile_table(self, name: str) -> Optional[ProfiledTable]:
+        """Return the default table followed by profile ``name``, or None for an unknown profile."""
+        table = self._profile_tables.get(name)
+        if table is None:
+            profile = get_profile(name)
+            if profile is None:
+                return None
+            table = self._profile_tables.setdefault(name, ProfiledTable(self.default, profile))
+        return table
+
+
+class AlbumContext:
+    """
+    Tag values already sanitized while processing one album.
+
+    Album-level tags are sanitized by the album processor and then inherited by every
+    track of the release. The context remembers each result, and for idempotent tables
+    also that the result itself is clean, so track processing reuses them instead of
+    scanning the same values again.
+    """
+
+    __slots__ = ("version", "_results")
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self._results: Dict[tuple, Optional[List[str]]] = {}
+
+    def sanitize_changed(self, table: TagTable, values: List[str]) -> Optional[List[str]]:
+        """Like :meth:`CompiledTable.sanitize_changed`, reusing results seen earlier for this album."""
+        key = (table, tuple(values))
+        try:
+            sanitized = self._results[key]
+        except KeyError:
+            pass
+        else:
+            # tracks must not share one list object
+            return None if sanitized is None else list(sanitized)
+        sanitized = table.sanitize_changed(values)
+        self._results[key] = sanitized
+        if sanitized is not None and table.idempotent:
+            self._results[(table, tuple(sanitized))] = None
+        return sanitized
+
+
+class AlbumContexts:
+    """
+    Album contexts keyed weakly by album, so a context never outlives its album.
+
+    Contexts are also released explicitly when an album is removed, and at most
+    ``max_albums`` are kept; the oldest are dropped once all their tracks have long
+    been processed.
+    """
+
+    def __init__(self, max_albums: int = 32):
+        self.max_albums = max_albums
+        self._contexts: "weakref.WeakKeyDictionary[object, AlbumContext]" = weakref.WeakKeyDictionary()
+        # albums are started on several worker threads; evicting iterates the dict
+        self._lock = threading.Lock()
+
+    def start(self, album, version: int = 0) -> Optional[AlbumContext]:
+        """Begin a fresh context for ``album``, replacing any earlier one."""
+        context = AlbumContext(version)
+        with self._lock:
+            try:
+                self._contexts.pop(album, None)
+                self._contexts[album] = context
+            except TypeError:
+                # album does not support weak references
+                return None
+            while len(self._contexts) > self.max_albums:
+                oldest = next(iter(self._contexts.keys()), None)
+                if oldest is None:
+                    break
+                self._contexts.pop(oldest, None)
+        return context
+
+    def get(self, album, version: int = 0) -> Optional[AlbumContext]:
+        """Return the context of ``album`` if it was built for the given config version."""
+        try:
+            context = self._contexts.get(album)
+        except TypeError:
+            return None
+        if context is None or context.version != version:
+            return None
+        return context
+
+    def release(self, album):
+        with self._lock:
+            try:
+                self._contexts.pop(album, None)
+            except TypeError:
+                pass
+
+    def __len__(self):
+        return len(self._contexts)
+
+
+class MetadataFingerprint:
+    """
+    The tags the plugin changed in one metadata object: for each, the value it wrote
+    (``outputs``) and the value the tag had before (``originals``).
+
+    Values are kept as tuples of strings, which the garbage collector does not track.
+    Tags the plugin left as they were are not recorded; their value is the original.
+    """
+
+    __slots__ = ("outputs", "originals", "__weakref__")
+
+    def __init__(self):
+        self.outputs: Dict[str, tuple] = {}
+        self.originals: Dict[str, tuple] = {}
+
+    def original(self, name: str) -> Optional[tuple]:
+        """Return the value ``name`` had before the plugin changed it, None if it did not."""
+        return self.originals.get(name)
+
+
+class MetadataFingerprints:
+    """
+    A :class:`MetadataFingerprint` per metadata object the plugin changed.
+
+    The live preview and applying changed settings to the loaded albums start from the
+    recorded originals. Fingerprints are keyed by object identity (Picard's ``Metadata``
+    is unhashable) and dropped through a weak reference callback when the object goes
+    away. Refreshing or reloading an album makes Picard build new metadata objects from
+    the MusicBrainz data, which the plugin processes like the first time.
+    """
+
+    def __init__(self):
+        self._records: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def for_metadata(self, metadata) -> Optional[MetadataFingerprint]:
+        """Return the fingerprint of ``metadata``, creating it if needed."""
+        key = id(metadata)
+        with self._lock:
+            entry = self._records.get(key)
+            if entry is not None and entry[0]() is metadata:
+                return entry[1]
+            try:
+                ref = weakref.ref(metadata, lambda _: self._drop(key))
+            except TypeError:
+                # objects that cannot be weakly referenced are not fingerprinted
+                return None
+            fingerprint = MetadataFingerprint()
+            self._records[key] = (ref, fingerprint)
+            return fingerprint
+
+    def get(self, metadata) -> Optional[MetadataFingerprint]:
+        """Return the fingerprint of ``metadata`` without creating it."""
+        entry = self._records.get(id(metadata))
+        if entry is not None and entry[0]() is metadata:
+            return entry[1]
+        return None
+
+    def _drop(self, key: int):
+        with self._lock:
+            self._records.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+class ProcessingStats:
+    """Counters of the metadata processor's write-back decisions."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.tags_checked = 0
+        self.tags_written = 0
+        self.writes_skipped = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "tags_checked": self.tags_checked,
+            "tags_written": self.tags_written,
+            "writes_skipped": self.writes_skipped,
+        }
+
+
+class CompiledConfigCache:
+    """
+    Holds the current :class:`CompiledConfig` snapshot until the settings change.
+
+    A snapshot is never modified after it is built; a settings change replaces it as a
+    whole with a single attribute assignment. Processors on Picard's worker threads read
+    the current snapshot without locking and keep using the one they got for a whole
+    call, so they never combine tables from different settings. The lock only
+    serializes building and replacing snapshots.
+
+    Sanitized values memoized in ``value_cache`` belong to the compiled tables and are
+    dropped together with them. Snapshots built while ``intern_pool`` is enabled intern
+    their results. ``on_compiled``, if set, is called with every new snapshot, e.g. to
+    log the backends chosen for its tables.
+    """
+
+    def __init__(self, value_cache: Optional[SanitizeCache] = None, intern_pool: Optional[InternPool] = None):
+        self.version = 0
+        self.value_cache = value_cache
+        self.intern_pool = intern_pool
+        self.on_compiled: Optional[Callable[[CompiledConfig], None]] = None
+        self._compiled: Optional[CompiledConfig] = None
+        self._lock = threading.Lock()
+
+    def get(self, load_settings: Callable[[], Sequence]) -> CompiledConfig:
+        """
+        Return the current snapshot, building it on first use.
+        Args:
+            load_settings: Callable returning ``(filter_tags, default_table, per_tag_tables, key_index)``,
+                optionally followed by preloaded range tables.
+        """
+        compiled = self._compiled
+        if compiled is None:
+            with self._lock:
+                # another thread may have built it while this one waited
+                compiled = self._compiled
+                if compiled is None:
+                    filter_tags, default_table, per_tag_tables, key_index, *preloaded = load_settings()
+                    compiled = CompiledConfig(filter_tags, default_table, per_tag_tables, key_index,
+                                              preloaded[0] if preloaded else None, version=self.version,
+                                              value_cache=self.value_cache, intern_pool=self._enabled_intern_pool())
+                    self._compiled = compiled
+                    if self.on_compiled is not None:
+                        self.on_compiled(compiled)
+        return compiled
+
+    def publish(self, filter_tags: Iterable[str], default_table: Mapping[str, str],
+                per_tag_tables: Mapping[str, object], key_index: Sequence[str] = (),
+                preloaded_ranges: Optional[Mapping[tuple, RangeTable]] = None) -> CompiledConfig:
+        """
+        Compile new settings and make them the current snapshot in one step.
+
+        Unlike :meth:`invalidate`, the settings are passed in rather than read back
+        from the config, so a snapshot never mixes settings saved one after another.
+        """
+        with self._lock:
+            compiled = CompiledConfig(filter_tags, default_table, per_tag_tables, key_index, preloaded_ranges,
+                                      version=self.version + 1, value_cache=self.value_cache,
+                                      intern_pool=self._enabled_intern_pool())
+            self.version = compiled.version
+            self._compiled = compiled
+            if self.value_cache is not None:
+                self.value_cache.clear()
+            if self.on_compiled is not None:
+                self.on_compiled(compiled)
+        return compiled
+
+    def _enabled_intern_pool(self) -> Optional[InternPool]:
+        pool = self.intern_pool
+        return pool if pool is not None and pool.max_size > 0 else None
+
+    @property
+    def current(self) -> Optional[CompiledConfig]:
+        """The current snapshot, None if it was not built since the last change."""
+        return self._compiled
+
+    def invalidate(self):
+        """Drop the current snapshot so it is rebuilt from the settings on next use."""
+        with self._lock:
+            self.version += 1
+            self._compiled = None
+            if self.value_cache is not None:
+                self.value_cache.clear()
+
+
+value_cache = SanitizeCache()
+intern_pool = InternPool()
+config_cache = CompiledConfigCache(value_cache, intern_pool)
+album_contexts = AlbumContexts()
+metadata_fingerprints = MetadataFingerprints()
+processing_stats = ProcessingStats()
+
+
+def record_statistics(name: str, table: TagTable, value, seconds: float):
+    """Record one sanitizing call; counting characters and replacements happens outside the timed part."""
+    if isinstance(value, str):
+        value = [value]
+    instrumentation.record(
+        name, seconds,
+        sum(len(item) for item in value),
+        sum(table.count_replacements(item) for item in value),
+        table.backend)
+
+
+def sanitize_metadata(tag_tables: Mapping[str, Optional[TagTable]], metadata,
+                      context: Optional[AlbumContext] = None,
+                      fingerprints: Optional[MetadataFingerprints] = None,
+                      intern_pool: Optional[InternPool] = None) -> Dict[str, List[str]]:
+    """
+    Sanitize the affected tags of a Picard-style metadata object in place.
+
+    ``metadata`` needs ``rawitems()`` yielding ``(name, values)`` and ``update(dict)``. Only
+    tags whose values change are written back, in a single update. With ``fingerprints``,
+    the original and the new value of every changed tag are recorded; they go through
+    ``intern_pool``, if given, so equal ones are shared between tracks.
+    Returns:
+        The changed tags with their new values.
+    """
+    # reuse values already sanitized for the same album when a context is given
+    sanitize_changed = context.sanitize_changed if context is not None else None
+    # only objects processed before have one; it is created on the first change
+    fingerprint = fingerprints.get(metadata) if fingerprints is not None else None
+    measure = instrumentation.enabled
+    table_for = table_lookup(tag_tables)
+    changes = {}
+    replaced = {}
+    checked = 0
+
+    for name, value in metadata.rawitems():
+        # tags that are not affected or whose per-tag entry is inactive have no table
+        table = table_for(name)
+        if table is None:
+            continue
+
+        checked += 1
+        if fingerprint is not None:
+            output = fingerprint.outputs.get(name)
+            if output is not None and output != tuple(value):
+                # set since the plugin wrote it: the value is the new original
+                del fingerprint.outputs[name]
+                fingerprint.originals.pop(name, None)
+
+        if measure:
+            start = time.perf_counter()
+        if sanitize_changed is None:
+            sanitized = table.sanitize_changed(value)
+        else:
+            sanitized = sanitize_changed(table, value)
+        if measure:
+            record_statistics(name, table, value, time.perf_counter() - start)
+        if sanitized is not None:
+            changes[name] = sanitized
+            replaced[name] = value
+
+    if changes and fingerprints is not None:
+        if fingerprint is None:
+            fingerprint = fingerprints.for_metadata(metadata)
+        if fingerprint is not None:
+            _record_changes(fingerprint, replaced, changes, intern_pool)
+    # write back only the tags that changed, in one update
+    if changes:
+        metadata.update(changes)
+    processing_stats.tags_checked += checked
+    processing_stats.tags_written += len(changes)
+    processing_stats.writes_skipped += checked - len(changes)
+    return changes
+
+
+def _record_changes(fingerprint: MetadataFingerprint, replaced: Dict[str, List[str]],
+                    changes: Dict[str, List[str]], intern_pool: Optional[InternPool]):
+    """Record the values of the changed tags before and after, keeping originals recorded earlier."""
+    freeze: Callable[[List[str]], tuple] = tuple
+    if intern_pool is not None:
+        def freeze(value: List[str]) -> tuple:
+            return intern_pool.intern(tuple(value))
+    originals = fingerprint.originals
+    for name, sanitized in changes.items():
+        if name not in originals:
+            originals[name] = freeze(replaced[name])
+        fingerprint.outputs[name] = freeze(sanitized)
+
+
+def _table_signature(table) -> Optional[tuple]:
+    """What a table does to values: its mapping, and the profile applied after it."""
+    if table is None:
+        return None
+    if isinstance(table, ProfiledTable):
+        return _table_signature(table.table), table.profile.name
+    return tuple(table.mapping.items())
+
+
+def changed_tag_names(previous: Iterable[Mapping[str, Optional[TagTable]]],
+                      current: Mapping[str, Optional[TagTable]]) -> Callable[[str], bool]:
+    """
+    Return a predicate telling whether a tag name is sanitized differently by ``current``
+    than by any of the ``previous`` tag tables.
+
+    Tables are compared by mapping and profile, so re-saving unchanged settings, or
+    changing only tags that share no table with a name, selects nothing. Decisions are
+    cached per name.
+    """
+    previous_tables = [table_lookup(tables) for tables in previous]
+    current_table = table_lookup(current)
+    signatures: Dict[int, Optional[tuple]] = {}
+    decisions: Dict[str, bool] = {}
+
+    def signature(table) -> Optional[tuple]:
+        key = id(table)
+        if key not in signatures:
+            signatures[key] = _table_signature(table)
+        return signatures[key]
+
+    def is_changed(name: str) -> bool:
+        decision = decisions.get(name)
+        if decision is None:
+            new = signature(current_table(name))
+            decision = decisions[name] = any(signature(table_for(name)) != new for table_for in previous_tables)
+        return decision
+
+    return is_changed
+
+
+def original_value(name: str, value, fingerprint: Optional[MetadataFingerprint],
+                   inherited: Optional[MetadataFingerprint] = None):
+    """
+    The value tag ``name`` had before the plugin changed it, given its current ``value``.
+
+    A value other than the one recorded as written was set afterwards and is its own
+    original. Track metadata starts as a copy of the sanitized album metadata, so a tag
+    the track's own ``fingerprint`` does not know that still holds the album's output
+    gets the original recorded in the album's fingerprint, ``inherited``.
+    """
+    frozen = tuple(value)
+    if fingerprint is not None and name in fingerprint.outputs:
+        if fingerprint.outputs[name] == frozen:
+            return fingerprint.originals[name]
+        return value
+    if inherited is not None and inherited.outputs.get(name) == frozen:
+        return inherited.originals[name]
+    return value
+
+
+def resanitize_metadata(tag_tables: Mapping[str, Optional[TagTable]], metadata, is_changed: Callable[[str], bool],
+                        fingerprints: MetadataFingerprints, parent=None) -> Dict[str, List[str]]:
+    """
+    Re-apply changed tag tables to already processed metadata in place.
+
+    Only tags selected by ``is_changed`` are touched. Each is sanitized again from the
+    value it had before the plugin first sanitized it, as recorded in its fingerprint,
+    so a removed mapping or tag restores the original. A value set after the last run
+    counts as the original.
+
+    Track metadata starts as a copy of the already sanitized album metadata; with the
+    album's metadata as ``parent``, tags still holding the album's output get the
+    album's original. The parent must be processed after its children.
+    Returns:
+        The changed tags with their new values.
+    """
+    # without a fingerprint the current values are all there is to start from
+    fingerprint = fingerprints.for_metadata(metadata) or MetadataFingerprint()
+    outputs = fingerprint.outputs
+    originals = fingerprint.originals
+    inherited = fingerprints.get(parent) if parent is not None else None
+    table_for = table_lookup(tag_tables)
+    changes = {}
+
+    for name, value in metadata.rawitems():
+        if not is_changed(name):
+            continue
+        source = list(original_value(name, value, fingerprint, inherited))
+        table = table_for(name)
+        sanitized = source if table is None else table.sanitize_values(source)
+        if sanitized != value:
+            changes[name] = sanitized
+        if table is None:
+            outputs.pop(name, None)
+            originals.pop(name, None)
+            continue
+        if sanitized == source:
+            outputs.pop(name, None)
+            originals.pop(name, None)
+        else:
+            outputs[name] = tuple(sanitized)
+            originals[name] = tuple(source)
+
+    if changes:
+        metadata.update(changes)
+    processing_stats.tags_written += len(changes)
+    return changes
+
+
+def sanitize_value(table: CompiledTable, value, stats_name: str = "$replace_unwanted"):
+    """Sanitize a single string or a value list, as done by the tagger script function."""
+    measure = instrumentation.enabled
+    if measure:
+        start = time.perf_counter()
+
+    result: Union[str, List[str]]
+    if isinstance(value, list):
+        result = table.sanitize_values(value)
+    else:
+        result = table.sanitize(value)
+
+    if measure:
+        record_statistics(stats_name, table, value, time.perf_counter() - start)
+    return result
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""Optional timing and replacement counters for the metadata processor and the script function."""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+class TagStats:
+    """Counters for one tag name; percentiles are taken over the most recent calls."""
+
+    __slots__ = ("calls", "total_time", "chars", "replacements", "samples", "backend")
+
+    def __init__(self, sample_size: int):
+        self.calls = 0
+        self.total_time = 0.0
+        self.chars = 0
+        self.replacements = 0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+        self.backend = ""
+
+    def percentile(self, fraction: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Instrumentation:
+    """
+    Per-tag call counts, timings, characters scanned and replacements made, and the
+    backend of the table that sanitized the tag last (see :mod:`.backends`).
+
+    Callers check ``enabled`` before measuring anything, so collecting costs a single
+    attribute lookup while it is switched off.
+    """
+
+    def __init__(self, sample_size: int = 1024):
+        self.enabled = False
+        self.log_interval = 0
+        self.sample_size = sample_size
+        self._tags: Dict[str, TagStats] = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_log = self._started
+
+    def record(self, tag: str, seconds: float, chars: int, replacements: int, backend: str = ""):
+        with self._lock:
+            stats = self._tags.get(tag)
+            if stats is None:
+                stats = self._tags[tag] = TagStats(self.sample_size)
+            stats.calls += 1
+            stats.total_time += seconds
+            stats.chars += chars
+            stats.replacements += replacements
+            stats.samples.append(seconds)
+            stats.backend = backend
+
+    def reset(self):
+        with self._lock:
+            self._tags.clear()
+            self._started = time.monotonic()
+            self._last_log = self._started
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return one row per tag, slowest tag first."""
+        with self._lock:
+            rows: List[Dict[str, Any]] = [{
+                "tag": tag,
+                "calls": stats.calls,
+                "total_ms": stats.total_time * 1000,
+                "mean_us": stats.total_time / stats.calls * 1e6 if stats.calls else 0.0,
+                "p50_us": stats.percentile(0.5) * 1e6,
+                "p90_us": stats.percentile(0.9) * 1e6,
+                "p99_us": stats.percentile(0.99) * 1e6,
+                "chars": stats.chars,
+                "replacements": stats.replacements,
+                "backend": stats.backend,
+            } for tag, stats in self._tags.items()]
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+
+    def format_report(self) -> str:
+        rows = self.snapshot()
+        if not rows:
+            return "No calls recorded."
+        lines = [f"{'Tag':<24} {'Calls':>8} {'Total ms':>10} {'Mean µs':>9} {'p50 µs':>8} "
+                 f"{'p90 µs':>8} {'p99 µs':>8} {'Chars':>10} {'Replaced':>9}  Backend"]
+        for row in rows:
+            lines.append(
+                f"{row['tag']:<24} {row['calls']:>8} {row['total_ms']:>10.2f} {row['mean_us']:>9.1f} "
+                f"{row['p50_us']:>8.1f} {row['p90_us']:>8.1f} {row['p99_us']:>8.1f} "
+                f"{row['chars']:>10} {row['replacements']:>9}  {row['backend']}")
+        return "\n".join(lines)
+
+    def maybe_log(self, log_function: Callable[[str], None], prefix: str = "",
+                  now: Optional[float] = None):
+        """Pass the report to ``log_function`` if ``log_interval`` seconds passed since the last one."""
+        if self.log_interval <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        if now - self._last_log < self.log_interval:
+            return
+        self._last_log = now
+        log_function(f"{prefix}statistics after {now - self._started:.0f} s:\n{self.format_report()}")
+
+
+instrumentation = Instrumentation()
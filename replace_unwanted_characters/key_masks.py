@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact encoding of the search strings selected for each tag.
+
+A per-tag entry stores its selection as a bit mask, written as a hexadecimal string,
+over a key index: the list of search strings saved next to the per-tag tables. Bit
+``i`` of a mask selects ``index[i]``, so a selection takes one bit per search string
+instead of a copy of each string, and testing whether it contains a key is a dict
+lookup and a bit test.
+
+Entries saved by earlier versions, a plain list of keys or a dict with a ``"keys"``
+list, are read as well and converted by :func:`encode_entries`.
+"""
+
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+
+def _mask_bytes(mask: Optional[str]) -> bytes:
+    value = int(mask or "0", 16)
+    return value.to_bytes((value.bit_length() + 7) // 8, "little")
+
+
+def _is_set(bits: bytes, bit: Optional[int]) -> bool:
+    return bit is not None and (bit >> 3) < len(bits) and bool(bits[bit >> 3] >> (bit & 7) & 1)
+
+
+class KeyIndex:
+    """Stable bit positions of search strings; a key keeps its bit as long as it stays in the index."""
+
+    __slots__ = ("keys", "_bits")
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self.keys: List[str] = []
+        self._bits: Dict[str, int] = {}
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key: str) -> int:
+        """Return the bit of ``key``, appending it to the index if needed."""
+        bit = self._bits.get(key)
+        if bit is None:
+            bit = self._bits[key] = len(self.keys)
+            self.keys.append(key)
+        return bit
+
+    def encode(self, keys: Iterable[str]) -> str:
+        """Return the mask selecting ``keys``; keys not in the index yet are appended."""
+        bits = [self.add(key) for key in keys]
+        if not bits:
+            return "0"
+        mask = bytearray(max(bits) // 8 + 1)
+        for bit in bits:
+            mask[bit >> 3] |= 1 << (bit & 7)
+        return format(int.from_bytes(mask, "little"), "x")
+
+    def decode(self, mask: Optional[str]) -> List[str]:
+        """Return the keys selected by ``mask``, in index order."""
+        bits = _mask_bytes(mask)
+        return [key for bit, key in enumerate(self.keys) if _is_set(bits, bit)]
+
+    def select(self, mask: Optional[str], mapping: Mapping[str, str]) -> Dict[str, str]:
+        """Return the entries of ``mapping`` whose key ``mask`` selects, keeping the mapping's order."""
+        bits = _mask_bytes(mask)
+        bit_of = self._bits.get
+        return {key: value for key, value in mapping.items() if _is_set(bits, bit_of(key))}
+
+    def entry_mask(self, entry) -> str:
+        """Return the mask of a per-tag entry in any of the stored formats."""
+        if isinstance(entry, dict):
+            mask = entry.get("mask")
+            if mask is not None:
+                return mask
+            return self.encode(entry.get("keys", []))
+        return self.encode(entry or [])
+
+
+def is_encoded(per_tag_tables: Mapping[str, object]) -> bool:
+    """Whether every per-tag entry is stored as a mask."""
+    return all(isinstance(entry, dict) and "mask" in entry for entry in per_tag_tables.values())
+
+
+def _entry_flags(entry) -> Dict[str, object]:
+    if isinstance(entry, dict):
+        return {
+            "active": entry.get("active", True),
+            "default": entry.get("default", True),
+            "profile": entry.get("profile") or "",
+        }
+    return {"active": True, "default": True, "profile": ""}
+
+
+def decode_entries(per_tag_tables: Mapping[str, object], key_index: Sequence[str]) -> Dict[str, dict]:
+    """Return per-tag entries of any format with their selection as a ``"keys"`` list."""
+    index = KeyIndex(key_index)
+    return {
+        tag: dict(_entry_flags(entry), keys=index.decode(index.entry_mask(entry)))
+        for tag, entry in per_tag_tables.items()
+    }
+
+
+def encode_entries(per_tag_tables: Mapping[str, object], keys_in_use: Iterable[str],
+                   key_index: Sequence[str] = ()) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    Convert per-tag entries of any format to masks over a new key index.
+
+    ``key_index`` is the index the entries were saved with. The new index keeps its
+    order for the keys still in ``keys_in_use``, so unchanged selections keep their
+    masks, appends the keys it lacks and drops the others.
+    Returns:
+        The encoded entries and the new key index.
+    """
+    keys_in_use = list(keys_in_use)
+    in_use = set(keys_in_use)
+    previous = KeyIndex(key_index)
+    index = KeyIndex([key for key in key_index if key in in_use] + keys_in_use)
+
+    entries = {}
+    for tag, entry in per_tag_tables.items():
+        keys = previous.decode(previous.entry_mask(entry))
+        entries[tag] = dict(_entry_flags(entry), mask=index.encode(key for key in keys if key in in_use))
+    return entries, index.keys
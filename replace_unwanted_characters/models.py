@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+
+"""Item models and delegates behind the replacement and per-tag tables of the options page."""
+
+from typing import Dict, Iterable, List, Mapping, Set
+
+from PyQt5 import QtCore, QtWidgets
+
+from .profiles import PROFILES
+
+# noinspection PyUnresolvedReferences
+_CHECKED = QtCore.Qt.Checked
+# noinspection PyUnresolvedReferences
+_UNCHECKED = QtCore.Qt.Unchecked
+
+
+def mapping_preview(keys: Iterable[str], limit: int = 20) -> str:
+    """Short text listing the selected mapping keys, truncated at a word boundary."""
+    selected_keys = sorted(keys)
+    if not selected_keys:
+        return "none selected"
+
+    preview_str = " ".join(selected_keys)
+    if len(preview_str) > limit:
+        # Truncate the string at the last space before the limit, if possible
+        truncated = preview_str[:limit]
+        if ' ' in truncated:
+            truncated = truncated.rsplit(' ', 1)[0]
+        preview_str = truncated + "…"
+    return preview_str
+
+
+class ReplacementTableModel(QtCore.QAbstractTableModel):
+    """Editable search/replace rows of the default mapping."""
+
+    COLUMN_SEARCH = 0
+    COLUMN_REPLACE = 1
+    HEADERS = ("Search", "Replace")
+
+    # emitted when a search string is added, edited or removed
+    keys_changed = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[List[str]] = []
+
+    # ---------- Qt model interface ----------
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return None
+        return self._rows[index.row()][index.column()]
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEditable
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid() or role != QtCore.Qt.EditRole:
+            return False
+        row = self._rows[index.row()]
+        if row[index.column()] == value:
+            return False
+        row[index.column()] = value
+        self.dataChanged.emit(index, index, [role])
+        if index.column() == self.COLUMN_SEARCH:
+            self.keys_changed.emit()
+        return True
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._rows.sort(key=lambda row: row[column], reverse=order == QtCore.Qt.DescendingOrder)
+        self.layoutChanged.emit()
+
+    # ---------- plugin interface ----------
+    def set_mapping(self, mapping: Mapping[str, str]):
+        self.beginResetModel()
+        self._rows = [[search, replace] for search, replace in mapping.items()]
+        self.endResetModel()
+        self.keys_changed.emit()
+
+    def add_row(self) -> QtCore.QModelIndex:
+        row = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._rows.append(["", ""])
+        self.endInsertRows()
+        return self.index(row, self.COLUMN_SEARCH)
+
+    def remove_rows(self, rows: Iterable[int]):
+        # remove rows from the bottom up to keep indices valid
+        for row in sorted(set(rows), reverse=True):
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            del self._rows[row]
+            self.endRemoveRows()
+        self.keys_changed.emit()
+
+    def keys(self) -> List[str]:
+        """Non-empty search strings in row order."""
+        return [search for search, _ in self._rows if search]
+
+    def mapping(self) -> Dict[str, str]:
+        return {search: replace for search, replace in self._rows if search}
+
+
+class _PerTagRow:
+    __slots__ = ("tag", "active", "default", "profile", "selection", "saved")
+
+    def __init__(self, tag: str, active: bool, default: bool, selection: Set[str], profile: str = ""):
+        self.tag = tag
+        self.active = active
+        self.default = default
+        # filesystem profile name, "" for none
+        self.profile = profile
+        # keys enabled for the tag
+        self.selection = selection
+        # selection to restore when Use Default is switched off again
+        self.saved = set(selection)
+
+
+class PerTagTableModel(QtCore.QAbstractTableModel):
+    """
+    One row per affected tag with its Is Active / Use Default state and key selection.
+
+    Rows are updated incrementally: changing the affected tags only inserts or removes
+    the rows concerned, and changing the available keys only refreshes rows whose
+    selection actually changed. Tag lookups go through a tag -> row index.
+    """
+
+    COLUMN_ACTIVE = 0
+    COLUMN_TAG = 1
+    COLUMN_DEFAULT = 2
+    COLUMN_PROFILE = 3
+    COLUMN_MAPPING = 4
+    HEADERS = ("Is Active", "Tag", "Use Default", "Profile", "Active Mapping")
+    TOOLTIPS = (
+        "Enable/disable the replacement rule.",
+        "The name of the tag to which the replacement will be applied.",
+        "Use all defined replacements.",
+        "Filesystem profile applied after the replacements.",
+        "The replacements to be applied for the tag.",
+    )
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[_PerTagRow] = []
+        self._row_by_tag: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._saved_entries: Mapping[str, object] = {}
+
+    # ---------- Qt model interface ----------
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal:
+            if role == QtCore.Qt.DisplayRole:
+                return self.HEADERS[section]
+            if role == QtCore.Qt.ToolTipRole:
+                return self.TOOLTIPS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == QtCore.Qt.CheckStateRole:
+            if column == self.COLUMN_ACTIVE:
+                return _CHECKED if row.active else _UNCHECKED
+            if column == self.COLUMN_DEFAULT:
+                return _CHECKED if row.default else _UNCHECKED
+        elif role == QtCore.Qt.DisplayRole:
+            if column == self.COLUMN_TAG:
+                return row.tag
+            if column == self.COLUMN_PROFILE:
+                return PROFILES.get(row.profile, "None")
+            if column == self.COLUMN_MAPPING:
+                return mapping_preview(row.selection)
+        elif role == QtCore.Qt.EditRole and column == self.COLUMN_PROFILE:
+            return row.profile
+        elif role == QtCore.Qt.ToolTipRole and column == self.COLUMN_MAPPING:
+            return " ".join(sorted(row.selection))
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        flags = QtCore.Qt.ItemIsSelectable
+        column = index.column()
+        if column in (self.COLUMN_ACTIVE, self.COLUMN_DEFAULT):
+            flags |= QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsUserCheckable
+        elif column == self.COLUMN_MAPPING:
+            # the mapping can only be edited while Use Default is off
+            if not self._rows[index.row()].default:
+                flags |= QtCore.Qt.ItemIsEnabled
+        elif column == self.COLUMN_PROFILE:
+            flags |= QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsEditable
+        else:
+            flags |= QtCore.Qt.ItemIsEnabled
+        return flags
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid():
+            return False
+        row = self._rows[index.row()]
+        if role == QtCore.Qt.EditRole and index.column() == self.COLUMN_PROFILE:
+            row.profile = value if value in PROFILES else ""
+            self.dataChanged.emit(index, index)
+            return True
+        if role != QtCore.Qt.CheckStateRole:
+            return False
+        checked = value == _CHECKED
+        if index.column() == self.COLUMN_ACTIVE:
+            row.active = checked
+            self.dataChanged.emit(index, index, [role])
+            return True
+        if index.column() == self.COLUMN_DEFAULT:
+            self._set_use_default(row, checked)
+            self.dataChanged.emit(index, self.index(index.row(), self.COLUMN_MAPPING))
+            return True
+        return False
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        keys = {
+            self.COLUMN_ACTIVE: lambda row: row.active,
+            self.COLUMN_TAG: lambda row: row.tag,
+            self.COLUMN_DEFAULT: lambda row: row.default,
+            self.COLUMN_PROFILE: lambda row: row.profile,
+            self.COLUMN_MAPPING: lambda row: mapping_preview(row.selection),
+        }
+        self.layoutAboutToBeChanged.emit()
+        self._rows.sort(key=keys[column], reverse=order == QtCore.Qt.DescendingOrder)
+        self._reindex()
+        self.layoutChanged.emit()
+
+    # ---------- plugin interface ----------
+    def load(self, tags: Iterable[str], keys: Iterable[str], saved_entries: Mapping[str, object]):
+        """Replace all rows, restoring each tag's state from the saved per-tag entries."""
+        self.beginResetModel()
+        self._keys = list(keys)
+        self._saved_entries = saved_entries
+        self._rows = [self._new_row(tag) for tag in dict.fromkeys(tags)]
+        self._reindex()
+        self.endResetModel()
+
+    def set_tags(self, tags: Iterable[str]):
+        """Keep the rows of tags still affected, remove the others and append new tags."""
+        tags = list(dict.fromkeys(tags))
+        wanted = set(tags)
+
+        for row in reversed(range(len(self._rows))):
+            if self._rows[row].tag not in wanted:
+                self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+        self._reindex()
+
+        new_tags = [tag for tag in tags if tag not in self._row_by_tag]
+        if new_tags:
+            first = len(self._rows)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(new_tags) - 1)
+            self._rows.extend(self._new_row(tag) for tag in new_tags)
+            self._reindex()
+            self.endInsertRows()
+
+    def set_available_keys(self, keys: Iterable[str]):
+        """Follow a change of the default mapping's search strings, refreshing only rows that change."""
+        self._keys = list(keys)
+        all_keys = set(self._keys)
+        for index, row in enumerate(self._rows):
+            if row.default:
+                selection = set(all_keys)
+            else:
+                # prune selection to current available keys
+                selection = row.selection & all_keys
+            row.saved &= all_keys
+            if selection != row.selection:
+                row.selection = selection
+                mapping_index = self.index(index, self.COLUMN_MAPPING)
+                self.dataChanged.emit(mapping_index, mapping_index)
+
+    def tag_at(self, row: int) -> str:
+        return self._rows[row].tag
+
+    def selection(self, tag: str) -> Set[str]:
+        row = self._row_by_tag.get(tag)
+        return set() if row is None else set(self._rows[row].selection)
+
+    def set_selection(self, tag: str, keys: Iterable[str]):
+        row = self._row_by_tag.get(tag)
+        if row is None:
+            return
+        state = self._rows[row]
+        state.selection = set(keys)
+        state.saved = set(state.selection)
+        mapping_index = self.index(row, self.COLUMN_MAPPING)
+        self.dataChanged.emit(mapping_index, mapping_index)
+
+    def is_use_default(self, tag: str) -> bool:
+        row = self._row_by_tag.get(tag)
+        return row is not None and self._rows[row].default
+
+    def entries(self) -> Dict[str, dict]:
+        """Per-tag entries with their selected keys; ``key_masks.encode_entries`` converts them for the config."""
+        return {
+            row.tag: {
+                "keys": sorted(row.selection),
+                "active": bool(row.active),
+                "default": bool(row.default),
+                "profile": row.profile,
+            }
+            for row in self._rows
+        }
+
+    # ---------- helpers ----------
+    def _reindex(self):
+        self._row_by_tag = {row.tag: index for index, row in enumerate(self._rows)}
+
+    def _new_row(self, tag: str) -> _PerTagRow:
+        all_keys = set(self._keys)
+        entry = self._saved_entries.get(tag)
+        if entry is None:
+            return _PerTagRow(tag, True, True, all_keys)
+
+        # support both legacy list and new dict
+        profile = ""
+        if isinstance(entry, dict):
+            keys = entry.get("keys", [])
+            active = entry.get("active", True)
+            default = entry.get("default", True)
+            profile = entry.get("profile") or ""
+        else:
+            keys = entry or []
+            active = True
+            default = True
+        # if using default, set selection to all keys, else prune saved keys to current available keys
+        selection = set(all_keys) if default else {k for k in keys if k in all_keys}
+        return _PerTagRow(tag, active, default, selection, profile if profile in PROFILES else "")
+
+    def _set_use_default(self, row: _PerTagRow, checked: bool):
+        row.default = checked
+        if checked:
+            # Save current selection, then select everything (visual)
+            row.saved = set(row.selection)
+            row.selection = set(self._keys)
+        else:
+            # Restore saved selection
+            row.selection = set(row.saved)
+
+
+class PreviewTableModel(QtCore.QAbstractTableModel):
+    """Read-only before/after rows of the live preview, appended in batches."""
+
+    HEADERS = ("Item", "Tag", "Before", "After")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[tuple] = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if index.isValid() and role in (QtCore.Qt.DisplayRole, QtCore.Qt.ToolTipRole):
+            return self._rows[index.row()][index.column()]
+        return None
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+    def append_rows(self, rows: Iterable[tuple]):
+        rows = list(rows)
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+
+class MappingButtonDelegate(QtWidgets.QStyledItemDelegate):
+    """Draws the Active Mapping cell as a push button and reports clicks on enabled cells."""
+
+    clicked = QtCore.pyqtSignal(QtCore.QModelIndex)
+
+    def paint(self, painter, option, index):
+        button = QtWidgets.QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data(QtCore.Qt.DisplayRole) or ""
+        button.state = QtWidgets.QStyle.State_Raised
+        if index.flags() & QtCore.Qt.ItemIsEnabled:
+            button.state |= QtWidgets.QStyle.State_Enabled
+        style = option.widget.style() if option.widget else QtWidgets.QApplication.style()
+        style.drawControl(QtWidgets.QStyle.CE_PushButton, button, painter, option.widget)
+
+    def sizeHint(self, option, index):
+        hint = super().sizeHint(option, index)
+        return QtCore.QSize(hint.width() + 16, option.fontMetrics.height() + 10)
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QtCore.QEvent.MouseButtonRelease
+                and event.button() == QtCore.Qt.LeftButton
+                and index.flags() & QtCore.Qt.ItemIsEnabled
+                and option.rect.contains(event.pos())):
+            self.clicked.emit(index)
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class ProfileDelegate(QtWidgets.QStyledItemDelegate):
+    """Combo box editor for the Profile column."""
+
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QComboBox(parent)
+        editor.addItem("None", "")
+        for name, title in PROFILES.items():
+            editor.addItem(title, name)
+        # commit as soon as a profile is picked
+        editor.activated.connect(lambda _: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        position = editor.findData(index.data(QtCore.Qt.EditRole) or "")
+        editor.setCurrentIndex(max(position, 0))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentData(), QtCore.Qt.EditRole)
+
+
+def coalescing_timer(parent, callback, interval_ms: int = 150) -> QtCore.QTimer:
+    """Single-shot timer that runs ``callback`` once after a burst of ``start()`` calls settles."""
+    timer = QtCore.QTimer(parent)
+    timer.setSingleShot(True)
+    timer.setInterval(interval_ms)
+    timer.timeout.connect(callback)
+    return timer
+
+
+def selected_rows(view: QtWidgets.QAbstractItemView) -> List[int]:
+    """Row numbers of the view's selection, without duplicates."""
+    return sorted({index.row() for index in view.selectionModel().selectedIndexes()})
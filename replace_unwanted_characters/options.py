@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""
+Option declarations of the plugin.
+
+Creating the options registers their defaults with Picard, so this module is imported
+when the plugin loads, while the options page itself is only imported on demand.
+"""
+
+from picard.config import BoolOption, IntOption, Option, TextOption
+
+from .constants import (
+    CONFIG_NAME_APPLY_TO_LOADED,
+    CONFIG_NAME_ARTIFACT,
+    CONFIG_NAME_CACHE_SIZE,
+    CONFIG_NAME_CHAR_TABLE,
+    CONFIG_NAME_FILTER_TAGS,
+    CONFIG_NAME_INSTRUMENTATION,
+    CONFIG_NAME_INTERN_SIZE,
+    CONFIG_NAME_KEY_INDEX,
+    CONFIG_NAME_PER_TAG_TABLES,
+    CONFIG_NAME_PROFILE_CALLS,
+    CONFIG_NAME_STATS_LOG_INTERVAL,
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_CHAR_MAPPING,
+    DEFAULT_INTERN_SIZE,
+    DEFAULT_TAGS,
+)
+
+PAGE_NAME = "replace_unwanted_characters"
+PAGE_TITLE = "Replace Unwanted Characters"
+PAGE_PARENT = "plugins"
+
+OPTIONS = [
+    Option("setting", CONFIG_NAME_FILTER_TAGS,
+           DEFAULT_TAGS),
+    Option("setting", CONFIG_NAME_CHAR_TABLE,
+           DEFAULT_CHAR_MAPPING),
+    Option("setting", CONFIG_NAME_PER_TAG_TABLES,
+           {}),
+    # search strings the per-tag masks refer to, see key_masks
+    Option("setting", CONFIG_NAME_KEY_INDEX,
+           []),
+    IntOption("setting", CONFIG_NAME_CACHE_SIZE,
+              DEFAULT_CACHE_SIZE),
+    IntOption("setting", CONFIG_NAME_INTERN_SIZE,
+              DEFAULT_INTERN_SIZE),
+    BoolOption("setting", CONFIG_NAME_INSTRUMENTATION,
+               False),
+    IntOption("setting", CONFIG_NAME_STATS_LOG_INTERVAL,
+              0),
+    BoolOption("setting", CONFIG_NAME_APPLY_TO_LOADED,
+               True),
+    # hidden: number of calls to profile after startup, see profiling
+    IntOption("setting", CONFIG_NAME_PROFILE_CALLS,
+              0),
+    # hidden: path of a mapping artifact with precompiled range tables, see artifact
+    TextOption("setting", CONFIG_NAME_ARTIFACT,
+               ""),
+]
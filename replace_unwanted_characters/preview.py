@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+Preview of what the current (unsaved) settings would do to the loaded albums.
+
+A snapshot of the metadata is taken once on the GUI thread; a :class:`PreviewJob` then
+compiles the settings and sanitizes the snapshot on a worker thread, reporting partial
+results in batches. Starting a new job for every edit and cancelling the previous one
+keeps the options dialog responsive however many tracks are loaded.
+"""
+
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from .engine import (
+    CompiledConfig,
+    MetadataFingerprints,
+    original_value,
+    table_lookup,
+)
+
+
+class PreviewItem(NamedTuple):
+    label: str
+    # "album" or "track"
+    kind: str
+    # tag name -> values as currently shown
+    tags: Dict[str, tuple]
+    # tag name -> values before the plugin changed them, for the tags it changed
+    originals: Dict[str, tuple]
+
+
+class PreviewChange(NamedTuple):
+    label: str
+    tag: str
+    before: str
+    after: str
+
+
+class PreviewUpdate(NamedTuple):
+    job: "PreviewJob"
+    items_done: int
+    items_total: int
+    albums_affected: int
+    tracks_affected: int
+    tags_changed: int
+    # changes found since the previous update, at most ``max_changes`` over the whole job
+    changes: List[PreviewChange]
+    finished: bool
+
+
+def snapshot(items: Iterable[Tuple[str, str, Any, Optional[Any]]],
+             fingerprints: Optional[MetadataFingerprints] = None) -> List[PreviewItem]:
+    """
+    Copy the tags of ``(label, kind, metadata, parent)`` items for a preview.
+
+    ``parent`` is the album metadata a track's metadata was copied from, None for
+    albums. Metadata the plugin already processed holds sanitized values; the values
+    they had before, as recorded in the fingerprints of the metadata or its parent,
+    are copied along, as saving sanitizes the loaded albums again from them.
+    """
+    result = []
+    for label, kind, metadata, parent in items:
+        fingerprint = fingerprints.get(metadata) if fingerprints is not None else None
+        inherited = fingerprints.get(parent) if fingerprints is not None and parent is not None else None
+        tags = {}
+        originals = {}
+        for name, values in metadata.rawitems():
+            current = tuple(values)
+            tags[name] = current
+            if fingerprint is not None or inherited is not None:
+                original = tuple(original_value(name, current, fingerprint, inherited))
+                if original != current:
+                    originals[name] = original
+        result.append(PreviewItem(label, kind, tags, originals))
+    return result
+
+
+class PreviewJob:
+    """
+    Sanitizes a snapshot with unsaved settings on a daemon thread.
+
+    ``on_update`` is called from the worker thread with a :class:`PreviewUpdate` after
+    every ``batch_size`` items and once at the end, unless the job was cancelled.
+    """
+
+    def __init__(self, items: List[PreviewItem],
+                 settings: Tuple[Iterable[str], Mapping[str, str], Mapping[str, object]],
+                 on_update: Callable[[PreviewUpdate], None], batch_size: int = 500, max_changes: int = 1000):
+        self.items = items
+        self.settings = settings
+        self.on_update = on_update
+        self.batch_size = batch_size
+        self.max_changes = max_changes
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="replace-unwanted-preview", daemon=True)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        table_for = table_lookup(CompiledConfig(*self.settings).tag_tables)
+        total = len(self.items)
+        albums = tracks = tags_changed = reported = 0
+        changes: List[PreviewChange] = []
+
+        for done, item in enumerate(self.items, 1):
+            item_changed = False
+            for name, values in item.tags.items():
+                # the new settings apply to the original; a change is what differs from the current value
+                original = item.originals.get(name, values)
+                table = table_for(name)
+                if table is None:
+                    after = original
+                else:
+                    sanitized = table.sanitize_changed(list(original))
+                    after = original if sanitized is None else tuple(sanitized)
+                if after == values:
+                    continue
+                item_changed = True
+                tags_changed += 1
+                if reported + len(changes) < self.max_changes:
+                    changes.append(PreviewChange(item.label, name, "; ".join(values), "; ".join(after)))
+            if item_changed:
+                if item.kind == "album":
+                    albums += 1
+                else:
+                    tracks += 1
+
+            if done % self.batch_size == 0 or done == total:
+                if self.cancelled:
+                    return
+                self.on_update(PreviewUpdate(self, done, total, albums, tracks, tags_changed, changes,
+                                             done == total))
+                reported += len(changes)
+                changes = []
+
+        if not total and not self.cancelled:
+            self.on_update(PreviewUpdate(self, 0, 0, 0, 0, 0, [], True))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Built-in filesystem profiles applied to a tag after its mapping.
+
+A profile makes a value usable as a file or directory name on a target filesystem:
+it replaces the characters the filesystem forbids, fixes reserved names and trailing
+characters and truncates the value to the filesystem's name length limit. Profiles
+are compiled on first use and shared afterwards.
+"""
+
+from functools import lru_cache
+from typing import Dict, FrozenSet, Mapping, Optional
+
+from .constants import DEFAULT_CHAR_MAPPING
+
+# characters Windows (and therefore NTFS, SMB shares and FAT/exFAT LFNs) forbids in names
+_WINDOWS_MAPPING = {k: v for k, v in DEFAULT_CHAR_MAPPING.items() if k != "."}
+_WINDOWS_MAPPING["[U+0000-U+001F]"] = ""
+_WINDOWS_RESERVED = frozenset(
+    ["CON", "PRN", "AUX", "NUL"] + [f"COM{i}" for i in range(1, 10)] + [f"LPT{i}" for i in range(1, 10)])
+
+_PROFILE_SPECS: Dict[str, dict] = {
+    "fat": {
+        "title": "FAT32 / exFAT",
+        "mapping": _WINDOWS_MAPPING,
+        "reserved": _WINDOWS_RESERVED,
+        "windows_names": True,
+        # long file names hold 255 UTF-16 code units
+        "max_bytes": 510,
+        "encoding": "utf-16-le",
+    },
+    "ntfs": {
+        "title": "NTFS / SMB",
+        "mapping": _WINDOWS_MAPPING,
+        "reserved": _WINDOWS_RESERVED,
+        "windows_names": True,
+        "max_bytes": 510,
+        "encoding": "utf-16-le",
+    },
+    "posix": {
+        "title": "POSIX",
+        "mapping": {"/": DEFAULT_CHAR_MAPPING["/"], "[U+0000]": ""},
+        "reserved": frozenset([".", ".."]),
+        "windows_names": False,
+        "max_bytes": 255,
+        "encoding": "utf-8",
+    },
+}
+
+# profile name -> title, in display order; "" selects no profile
+PROFILES: Dict[str, str] = {name: spec["title"] for name, spec in _PROFILE_SPECS.items()}
+
+# look-alike for a trailing dot, which Windows silently drops
+_TRAILING_DOT = DEFAULT_CHAR_MAPPING["."]
+
+
+def truncate_encoded(value: str, max_bytes: int, encoding: str = "utf-8") -> str:
+    """
+    Return the longest prefix of ``value`` that encodes to at most ``max_bytes`` bytes.
+
+    The value is encoded once and cut at the byte limit. Lone surrogates are kept, as
+    the same ``surrogatepass`` handler encodes and decodes them; only a code point cut
+    at the end is dropped.
+    """
+    # no encoding can take more than 4 bytes per code point
+    if len(value) * 4 <= max_bytes:
+        return value
+    if value.isascii() and encoding == "utf-8":
+        return value[:max_bytes]
+    encoded = value.encode(encoding, "surrogatepass")
+    if len(encoded) <= max_bytes:
+        return value
+    head = encoded[:max_bytes]
+    try:
+        prefix = head.decode(encoding, "surrogatepass")
+    except UnicodeDecodeError as e:
+        # the incomplete bytes of the last code point
+        prefix = head[:e.start].decode(encoding, "surrogatepass")
+    if not value.startswith(prefix):
+        # UTF-16 cut between the two halves of a surrogate pair decodes to the lone first half
+        prefix = prefix[:-1]
+    return prefix
+
+
+class FilesystemProfile:
+    """One compiled profile; :meth:`apply` is idempotent."""
+
+    __slots__ = ("name", "title", "table", "reserved", "windows_names", "max_bytes", "encoding")
+
+    def __init__(self, name: str, title: str, mapping: Mapping[str, str], reserved: FrozenSet[str],
+                 windows_names: bool, max_bytes: int, encoding: str):
+        # imported here so the engine can import this module at load time
+        from .engine import CompiledTable
+
+        self.name = name
+        self.title = title
+        self.table = CompiledTable(mapping)
+        self.reserved = reserved
+        self.windows_names = windows_names
+        self.max_bytes = max_bytes
+        self.encoding = encoding
+
+    def apply(self, value: str) -> str:
+        value = self.table.sanitize(value)
+
+        if self.windows_names:
+            # Windows treats "CON.txt" like the device "CON"
+            stem = value.split(".", 1)[0].rstrip(" ")
+            if stem.upper() in self.reserved:
+                value = stem + "_" + value[len(stem):]
+        elif value in self.reserved:
+            value += "_"
+
+        value = truncate_encoded(value, self.max_bytes, self.encoding)
+
+        if self.windows_names and value.endswith((" ", ".")):
+            # Windows drops trailing dots and spaces; keep the dot as its look-alike
+            value = value.rstrip(" ")
+            if value.endswith("."):
+                value = value[:-1] + _TRAILING_DOT
+        return value
+
+
+@lru_cache(maxsize=None)
+def get_profile(name: str) -> Optional[FilesystemProfile]:
+    """Return the compiled profile ``name``, or None for an unknown name."""
+    spec = _PROFILE_SPECS.get(name)
+    if spec is None:
+        return None
+    return FilesystemProfile(name, **spec)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in profiling of the plugin's entry points with :mod:`cProfile`.
+
+Profiling is enabled with the ``REPLACE_UNWANTED_CHARACTERS_PROFILE`` environment
+variable or the hidden ``replace_unwanted_characters_profile_calls`` setting, both
+giving the number of calls to profile. The plugin only imports this module and wraps
+the entry points when it is enabled, so it costs nothing otherwise. Once that many calls were profiled, the
+statistics are written to a ``.pstats`` file and a summary of the hottest functions
+is logged; later calls run unprofiled.
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+
+def profile_directory() -> str:
+    """Picard's user directory, next to its configuration, or the temporary directory outside Picard."""
+    try:
+        from picard.const import USER_DIR
+    except ImportError:
+        return tempfile.gettempdir()
+    return USER_DIR
+
+
+class CallProfiler:
+    """
+    Profiles the next ``calls`` calls of the functions wrapped with :meth:`wrap`.
+
+    Picard runs the processors on several worker threads, but a profiler can only
+    follow one thread at a time: a call arriving while another is being profiled
+    runs unprofiled rather than waiting.
+    """
+
+    def __init__(self, calls: int, directory: str, log: Callable[[str], None], top: int = 25):
+        self.calls = calls
+        self.remaining = calls
+        self.directory = directory
+        self.log = log
+        self.top = top
+        self.path: Optional[str] = None
+        self._profile = cProfile.Profile()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.remaining > 0
+
+    def wrap(self, function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if self.remaining <= 0 or not self._lock.acquire(blocking=False):
+                return function(*args, **kwargs)
+            try:
+                if self.remaining <= 0:
+                    return function(*args, **kwargs)
+                try:
+                    self._profile.enable()
+                except ValueError:
+                    # another profiler is active in this process
+                    return function(*args, **kwargs)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self._profile.disable()
+                    self.remaining -= 1
+                    if self.remaining == 0:
+                        self._finish()
+            finally:
+                self._lock.release()
+
+        # Picard checks the arguments of script functions with getfullargspec(), which ignores __wrapped__
+        wrapper.__signature__ = inspect.signature(function)  # type: ignore[attr-defined]
+        return wrapper
+
+    def _finish(self):
+        summary = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=summary)
+        path = os.path.join(self.directory, f"replace_unwanted_characters-{time.strftime('%Y%m%d-%H%M%S')}.pstats")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stats.dump_stats(path)
+            self.path = path
+            written = f"statistics written to {path}"
+        except OSError as e:
+            written = f"statistics could not be written to {path}: {e}"
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        self.log(f"Profiled {self.calls} calls, {written}\n{summary.getvalue()}")
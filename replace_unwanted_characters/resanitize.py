@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Applying changed settings to the albums and tracks already loaded.
+
+Without this, new mappings only take effect on metadata loaded (or refreshed from
+MusicBrainz) afterwards. A :class:`ResanitizeJob` compares the tag tables of the old
+and new configuration and sanitizes only the tags whose table changed, from the
+values recorded before the plugin first sanitized them. The job runs in short
+steps so the caller can spread it over the event loop; Picard's objects must only be
+modified on the GUI thread.
+"""
+
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from .engine import (
+    CompiledConfig,
+    CompiledTable,
+    MetadataFingerprints,
+    changed_tag_names,
+    resanitize_metadata,
+)
+
+# metadata to sanitize again, the album metadata it was copied from (or None),
+# and a callback receiving its changed tags (or None)
+Target = Tuple[object, Optional[object], Optional[Callable[[Dict[str, List[str]]], None]]]
+
+
+class ResanitizeJob:
+    """
+    Re-applies ``current`` to the metadata of ``targets``, a step at a time.
+
+    ``previous`` lists the tag tables the targets may have been processed with: the
+    configuration being replaced, plus those of a job this one supersedes before it
+    finished.
+    """
+
+    def __init__(self, previous: Iterable[Mapping[str, CompiledTable]], current: CompiledConfig,
+                 targets: Iterable[Target], fingerprints: MetadataFingerprints):
+        self.previous = list(previous)
+        self.current = current
+        self.fingerprints = fingerprints
+        self.is_changed = changed_tag_names(self.previous, current.tag_tables)
+        self._targets: Iterator[Target] = iter(targets)
+        self.processed = 0
+        self.changed = 0
+        self.tags_written = 0
+        self.seconds = 0.0
+        self.finished = False
+
+    def step(self, budget: float = 0.02) -> bool:
+        """Process targets for about ``budget`` seconds; return True once all are done."""
+        start = time.perf_counter()
+        deadline = start + budget
+        tag_tables = self.current.tag_tables
+        try:
+            for metadata, parent, on_change in self._targets:
+                changes = resanitize_metadata(tag_tables, metadata, self.is_changed, self.fingerprints, parent)
+                self.processed += 1
+                if changes:
+                    self.changed += 1
+                    self.tags_written += len(changes)
+                    if on_change is not None:
+                        on_change(changes)
+                if time.perf_counter() >= deadline:
+                    return False
+            self.finished = True
+            return True
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def run(self) -> "ResanitizeJob":
+        """Process all targets at once."""
+        while not self.step(float("inf")):
+            pass
+        return self
+
+    def summary(self) -> str:
+        return (f"{self.processed} albums and tracks checked, {self.changed} changed "
+                f"({self.tags_written} tags) in {self.seconds:.2f} s")
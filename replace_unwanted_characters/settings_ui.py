@@ -1,477 +1,472 @@
+import functools
 import os
-from typing import List, Optional
+from typing import List
 
-from PyQt5 import uic, QtWidgets, QtCore
+from PyQt5 import uic, QtWidgets, QtCore, QtGui
 from PyQt5.QtWidgets import QHeaderView
 from picard import log
-from picard.config import Option
 from picard.ui.options import OptionsPage
 
-from . import PLUGIN_NAME
-from .constants import DEFAULT_TAGS, DEFAULT_CHAR_MAPPING, CONFIG_NAME_FILTER_TAGS, CONFIG_NAME_CHAR_TABLE, \
-    CONFIG_NAME_PER_TAG_TABLES
-
-class ReplaceUnwantedCharactersOptionsPage(OptionsPage):
-    NAME = "replace_unwanted_characters"
-    TITLE = "Replace Unwanted Characters"
-    PARENT = "plugins"
-
-    options = [
-        Option("setting", CONFIG_NAME_FILTER_TAGS,
-               DEFAULT_TAGS),
-        Option("setting", CONFIG_NAME_CHAR_TABLE,
-               DEFAULT_CHAR_MAPPING),
-        Option("setting", CONFIG_NAME_PER_TAG_TABLES,
-               {}),
-    ]
+from . import PLUGIN_NAME, artifact_range_tables
+from .constants import CONFIG_NAME_FILTER_TAGS, CONFIG_NAME_CHAR_TABLE, CONFIG_NAME_PER_TAG_TABLES, \
+    CONFIG_NAME_CACHE_SIZE, CONFIG_NAME_INSTRUMENTATION, CONFIG_NAME_STATS_LOG_INTERVAL, CONFIG_NAME_KEY_INDEX, \
+    CONFIG_NAME_APPLY_TO_LOADED, CONFIG_NAME_INTERN_SIZE
+from .engine import config_cache, intern_pool, metadata_fingerprints, processing_stats, value_cache
+from .instrumentation import instrumentation
+from .key_masks import decode_entries, encode_entries
+from .models import MappingButtonDelegate, PerTagTableModel, PreviewTableModel, ProfileDelegate, \
+    ReplacementTableModel, coalescing_timer, selected_rows
+from .options import OPTIONS, PAGE_NAME, PAGE_PARENT, PAGE_TITLE
+from .preview import PreviewJob, snapshot
+from .resanitize import ResanitizeJob
+from .tag_patterns import combination_error, is_pattern, pattern_error
+
+try:
+    from .ui_replace_unwanted_characters_config import Ui_ReplaceUnwantedCharactersConfig as _UI_BASE
+    _GENERATED_UI = True
+except ImportError:
+    # generated module missing: fall back to parsing the .ui file at runtime
+    _UI_BASE = object  # type: ignore[misc,assignment]
+    _GENERATED_UI = False
+
+
+class _PreviewNotifier(QtCore.QObject):
+    """Carries preview updates from the worker thread to the GUI thread (queued connection)."""
+
+    updated = QtCore.pyqtSignal(object)
+
+
+def _track_changed(track, changes):
+    # files matched to the track carry a copy of its metadata
+    for file in list(track.files):
+        file.metadata.update(changes)
+        file.update()
+    track.update()
+
+
+def _loaded_targets(tagger):
+    """Metadata of the loaded albums and their tracks, with the callback refreshing each in the UI."""
+    for album in list(tagger.albums.values()):
+        # tracks first: they look up the originals of inherited tags in the album's fingerprint
+        for track in list(album.tracks):
+            yield track.metadata, album.metadata, functools.partial(_track_changed, track)
+        yield album.metadata, None, lambda changes, album=album: album.update(update_tracks=False)
+
+
+class _ResanitizeRunner(QtCore.QObject):
+    """
+    Runs a :class:`ResanitizeJob` in short steps from a zero-interval timer on the GUI thread,
+    where Picard's objects may be modified, letting the event loop run between steps.
+    Parented to the application, as the options page is gone by the time the job runs.
+    """
+
+    current = None
+
+    def __init__(self, job: ResanitizeJob, parent):
+        super().__init__(parent)
+        self.job = job
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.step)
+
+    @classmethod
+    def start(cls, tagger, previous, current):
+        """Apply ``current`` to the loaded albums, superseding a job still running for an older change."""
+        previous_tables = [previous.tag_tables]
+        running = cls.current
+        if running is not None:
+            # targets it did not reach yet were still processed with its previous tables
+            previous_tables = running.job.previous + previous_tables
+            running.stop()
+        runner = cls(ResanitizeJob(previous_tables, current, _loaded_targets(tagger), metadata_fingerprints),
+                     tagger)
+        cls.current = runner
+        runner.timer.start()
+
+    def step(self):
+        if self.job.step():
+            log.info(f"{PLUGIN_NAME}: Applied changed settings to loaded albums: {self.job.summary()}")
+            self.stop()
+
+    def stop(self):
+        self.timer.stop()
+        if _ResanitizeRunner.current is self:
+            _ResanitizeRunner.current = None
+        self.deleteLater()
+
+
+class ReplaceUnwantedCharactersOptionsPage(OptionsPage, _UI_BASE):
+    NAME = PAGE_NAME
+    TITLE = PAGE_TITLE
+    PARENT = PAGE_PARENT
+
+    options = OPTIONS
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        ui_file = os.path.join(os.path.dirname(__file__), 'replace_unwanted_characters_config.ui')
-        uic.loadUi(ui_file, self)
+        # the generated UI class is kept in sync with the .ui file by scripts/generate_ui.py
+        if _GENERATED_UI:
+            self.setupUi(self)
+        else:
+            uic.loadUi(os.path.join(os.path.dirname(__file__), 'replace_unwanted_characters_config.ui'), self)
+
+        # models behind the replacement and per-tag tables
+        self.replacement_model = ReplacementTableModel(self)
+        self.replacement_table.setModel(self.replacement_model)
+        self.per_tag_model = PerTagTableModel(self)
+        self.per_tag_table.setModel(self.per_tag_model)
+        self.mapping_delegate = MappingButtonDelegate(self.per_tag_table)
+        self.per_tag_table.setItemDelegateForColumn(PerTagTableModel.COLUMN_MAPPING, self.mapping_delegate)
+        self.mapping_delegate.clicked.connect(self.edit_tag_mapping)
+        self.profile_delegate = ProfileDelegate(self.per_tag_table)
+        self.per_tag_table.setItemDelegateForColumn(PerTagTableModel.COLUMN_PROFILE, self.profile_delegate)
+
+        # bursts of edits (typing, pasting, removing many rows) update the per-tag table once
+        self._per_tag_tags_timer = coalescing_timer(self, self.update_per_tag_tags)
+        self._per_tag_keys_timer = coalescing_timer(self, self.update_per_tag_keys)
+
+        # live preview: recomputed on a worker thread once edits settle
+        self.preview_model = PreviewTableModel(self)
+        self.preview_table.setModel(self.preview_model)
+        self.preview_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self._preview_items = None
+        self._preview_job = None
+        # per-tag selections being edited in the mapping dialog
+        self._preview_overrides = {}
+        self._preview_timer = coalescing_timer(self, self.start_preview, 300)
+        self._preview_notifier = _PreviewNotifier(self)
+        self._preview_notifier.updated.connect(self.on_preview_update)
+        self.preview_checkbox.toggled.connect(self.on_preview_toggled)
+        self.preview_reload_button.clicked.connect(self.reload_preview)
+        for model in (self.replacement_model, self.per_tag_model):
+            model.dataChanged.connect(self.schedule_preview)
+            model.rowsRemoved.connect(self.schedule_preview)
+            model.modelReset.connect(self.schedule_preview)
+        self.per_tag_model.rowsInserted.connect(self.schedule_preview)
 
         # header resize modes
-        if hasattr(self, "filter_tags_table"):
-            self.filter_tags_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-            self.filter_tags_table.itemChanged.connect(self.on_filter_tags_changed)
-            log.debug(f"{PLUGIN_NAME}: Connected filter_tags_table itemChanged signal")
-        if hasattr(self, "replacement_table"):
-            self.replacement_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-            self.replacement_table.cellChanged.connect(self.on_mapping_changed)
-            log.debug(f"{PLUGIN_NAME}: Connected replacement_table itemChanged signal")
-        if hasattr(self, "per_tag_table"):
-            header = self.per_tag_table.horizontalHeader()
-            cols = self.per_tag_table.columnCount()
-            for idx in range(cols):
-                if idx == cols - 1:
-                    header.setSectionResizeMode(idx, QHeaderView.Stretch)
-                else:
-                    header.setSectionResizeMode(idx, QHeaderView.ResizeToContents)
+        self.filter_tags_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.filter_tags_table.itemChanged.connect(self.on_filter_tags_changed)
+        log.debug(f"{PLUGIN_NAME}: Connected filter_tags_table itemChanged signal")
+        self.replacement_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.replacement_model.keys_changed.connect(self.on_mapping_changed)
+        log.debug(f"{PLUGIN_NAME}: Connected replacement model keys_changed signal")
+        header = self.per_tag_table.horizontalHeader()
+        cols = self.per_tag_model.columnCount()
+        for idx in range(cols):
+            if idx == cols - 1:
+                header.setSectionResizeMode(idx, QHeaderView.Stretch)
+            else:
+                header.setSectionResizeMode(idx, QHeaderView.ResizeToContents)
+        self.per_tag_table.verticalHeader().setDefaultSectionSize(self.per_tag_table.fontMetrics().height() + 10)
 
         # filter tag add/remove buttons
-        if hasattr(self, "filter_tags_table"):
-            if hasattr(self, "add_filter_tag_button"):
-                self.add_filter_tag_button.clicked.connect(self.add_tag_row)
-            if hasattr(self, "remove_filter_tag_button"):
-                self.remove_filter_tag_button.clicked.connect(self.remove_tags_row)
+        self.add_filter_tag_button.clicked.connect(self.add_tag_row)
+        self.remove_filter_tag_button.clicked.connect(self.remove_tags_row)
 
         # replacement table buttons
-        if hasattr(self, "add_row_button"):
-            self.add_row_button.clicked.connect(self.add_mapping_row)
-        if hasattr(self, "remove_row_button"):
-            self.remove_row_button.clicked.connect(self.remove_mapping_rows)
-
-        # in-memory per-tag selections:
-        # maps tag -> set(enabled_keys)
-        self._per_tag_selection = {}
-        # saved selection used when Use Default is toggled on (to restore later)
-        self._per_tag_saved = {}
-        # per-tag active state (Is Active checkbox)
-        self._per_tag_active = {}
-        # per-tag default state (Use Default checkbox)
-        self._per_tag_default = {}
+        self.add_row_button.clicked.connect(self.add_mapping_row)
+        self.remove_row_button.clicked.connect(self.remove_mapping_rows)
+
+        # statistics panel
+        self.stats_text.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.stats_refresh_button.clicked.connect(self.refresh_statistics)
+        self.stats_reset_button.clicked.connect(self.reset_statistics)
 
     # ---------- filter tags table helpers ----------
     def add_tag_row(self):
-        if not hasattr(self, "filter_tags_table"):
-            return
         row = self.filter_tags_table.rowCount()
         self.filter_tags_table.insertRow(row)
         self.filter_tags_table.setItem(row, 0, QtWidgets.QTableWidgetItem(""))
 
     def remove_tags_row(self):
-        if not hasattr(self, "filter_tags_table"):
-            return
-
         # collect selected rows from filter_tags_table (may contain duplicates)
         rows = set(index.row() for index in self.filter_tags_table.selectedIndexes())
         if not rows:
             return
 
-        # remove rows from the bottom up to keep indices valid and clear per-tag state
+        # remove rows from the bottom up to keep indices valid
         for row in sorted(rows, reverse=True):
-            item = self.filter_tags_table.item(row, 0)
-            if item:
-                tag = item.text()
-                self._per_tag_selection.pop(tag, None)
-                self._per_tag_saved.pop(tag, None)
-                self._per_tag_active.pop(tag, None)
-                self._per_tag_default.pop(tag, None)
             self.filter_tags_table.removeRow(row)
 
-        # rebuild per-tag table to reflect removed tags
-        self.rebuild_per_tag_table()
-
-    def _refresh_per_tag_data(self):
-        rows = set(index.row() for index in self.filter_tags_table.selectedIndexes())
-        for row in sorted(rows, reverse=True):
-            # remove selection state for tag if present
-            item = self.filter_tags_table.item(row, 0)
-            if item:
-                tag = item.text()
-                self._per_tag_selection.pop(tag, None)
-                self._per_tag_saved.pop(tag, None)
-                self._per_tag_active.pop(tag, None)
-                self._per_tag_default.pop(tag, None)
-            self.filter_tags_table.removeRow(row)
+        self._per_tag_tags_timer.start()
 
     def on_filter_tags_changed(self):
-        # user edited a row - rebuild the per-tag table preserving selections where possible
-        self.rebuild_per_tag_table()
+        # user edited a row - update the per-tag rows once the edits settle
+        self._per_tag_tags_timer.start()
+
+    def update_per_tag_tags(self):
+        """Add and remove per-tag rows to match the filter tags, keeping the state of the others."""
+        self._per_tag_tags_timer.stop()
+        self.per_tag_model.set_tags(self._get_configured_filter_tags())
 
     # ---------- default replacement table helpers ----------
     def add_mapping_row(self):
-        if not hasattr(self, "replacement_table"):
-            return
-        row = self.replacement_table.rowCount()
-        self.replacement_table.insertRow(row)
-        self.replacement_table.setItem(row, 0, QtWidgets.QTableWidgetItem(""))
-        self.replacement_table.setItem(row, 1, QtWidgets.QTableWidgetItem(""))
+        index = self.replacement_model.add_row()
+        self.replacement_table.scrollTo(index)
+        self.replacement_table.edit(index)
 
     def remove_mapping_rows(self):
-        if not hasattr(self, "replacement_table"):
-            return
-
-        # collect selected rows from replacement_table (may contain duplicates)
-        rows = set(index.row() for index in self.replacement_table.selectedIndexes())
+        rows = selected_rows(self.replacement_table)
         if not rows:
             return
-
-        # remove rows from the bottom up to keep indices valid
-        for row in sorted(rows, reverse=True):
-            self.replacement_table.removeRow(row)
-
-        # update in-memory per-tag selections to remove keys that no longer exist
-        remaining_keys = set(self._current_default_keys())
-        for tag in list(self._per_tag_selection.keys()):
-            self._per_tag_selection[tag] = self._per_tag_selection[tag] & remaining_keys
-            self._per_tag_saved[tag] = self._per_tag_saved.get(tag, set()) & remaining_keys
-
-        # rebuild per-tag table to reflect changes
-        self.rebuild_per_tag_table()
+        self.replacement_model.remove_rows(rows)
 
     def on_mapping_changed(self):
-        # user edited a row - rebuild the per-tag table preserving selections where possible
-        self.rebuild_per_tag_table()
+        # user edited a search string - update the per-tag selections once the edits settle
+        self._per_tag_keys_timer.start()
 
-    def _current_default_keys(self):
-        keys = []
-        if hasattr(self, "replacement_table"):
-            for row in range(self.replacement_table.rowCount()):
-                item = self.replacement_table.item(row, 0)
-                if item:
-                    k = item.text()
-                    if k:
-                        keys.append(k)
-        return keys
-
-    # ---------- per-tag table creation and updates ----------
-    def rebuild_per_tag_table(self):
-        if not hasattr(self, "per_tag_table"):
-            return
-
-        tags = self._get_configured_filter_tags()
-
-        self.per_tag_table.setRowCount(0)
-        # convert available keys to a set for containment checks
-        all_keys = set(self._current_default_keys())
-
-        per_tag_saved = self.config.setting[CONFIG_NAME_PER_TAG_TABLES]
-
-        for tag in tags:
-            row = self.per_tag_table.rowCount()
-            self.per_tag_table.insertRow(row)
-            self.per_tag_table.setRowHeight(row, self.per_tag_table.fontMetrics().height() + 10)
-            explicit = tag in per_tag_saved
-            log.debug(f"{PLUGIN_NAME}: Building per-tag table row for tag '{tag}': explicit={explicit}")
+    def update_per_tag_keys(self):
+        """Follow the current search strings in the per-tag selections."""
+        self._per_tag_keys_timer.stop()
+        self.per_tag_model.set_available_keys(self._current_default_keys())
 
-            # UI widget stuff
-            # Is Active checkbox
-            active_chk = QtWidgets.QCheckBox()
-            active_chk_container = QtWidgets.QWidget()
-            active_chk_layout = QtWidgets.QHBoxLayout(active_chk_container)
-            active_chk_layout.addWidget(active_chk)
-            # noinspection PyUnresolvedReferences
-            active_chk_layout.setAlignment(QtCore.Qt.AlignCenter)
-            active_chk_layout.setContentsMargins(0, 0, 0, 0)
-            self.per_tag_table.setCellWidget(row, 0, active_chk_container)
-
-            # Tag name item
-            tag_item = QtWidgets.QTableWidgetItem(tag)
-            # noinspection PyUnresolvedReferences
-            tag_item.setFlags(tag_item.flags() & ~QtCore.Qt.ItemIsEditable)
-            self.per_tag_table.setItem(row, 1, tag_item)
-
-            # Use default checkbox
-            default_chk = QtWidgets.QCheckBox()
-            default_chk_container = QtWidgets.QWidget()
-            default_chk_layout = QtWidgets.QHBoxLayout(default_chk_container)
-            default_chk_layout.addWidget(default_chk)
-            # noinspection PyUnresolvedReferences
-            default_chk_layout.setAlignment(QtCore.Qt.AlignCenter)
-            default_chk_layout.setContentsMargins(0, 0, 0, 0)
-            self.per_tag_table.setCellWidget(row, 2, default_chk_container)
-
-            # Store selection and active state (support both legacy list and new dict)
-            log.debug(f"{PLUGIN_NAME}: Restoring saved selection for tag'{tag}', explicit={explicit}")
-            if explicit:
-                entry = per_tag_saved.get(tag)
-                keys_list = entry.get("keys", [])
-                active = entry.get("active", True)
-                default = entry.get("default", True)
-                # if using default, set selection to all keys
-                if default:
-                    keys_list = all_keys
-                else:
-                    # prune saved keys to current available keys
-                    keys_list = [k for k in keys_list if k in all_keys]
-                self._per_tag_selection[tag] = set(keys_list)
-                self._per_tag_saved[tag] = set(keys_list)
-                self._per_tag_active[tag] = active
-                self._per_tag_default[tag] = default
-            else:
-                self._per_tag_selection[tag] = set(all_keys)
-                self._per_tag_saved[tag] = self._per_tag_selection[tag].copy()
-                self._per_tag_active[tag] = True
-                self._per_tag_default[tag] = True
-
-            active_chk.setChecked(self._per_tag_active[tag])
-            default_chk.setChecked(self._per_tag_default[tag])
-
-            # Mapping button
-            btn = QtWidgets.QPushButton()
-            self.per_tag_table.setCellWidget(row, 3, btn)
-            self._update_mapping_button_text(btn, tag)
-            btn.setEnabled(not default_chk.isChecked())
-
-            # Connect signals
-            default_chk.toggled.connect(self._make_use_default_handler(tag, btn))
-            btn.clicked.connect(self._make_mapping_button_handler(tag, btn))
-            # update in-memory active flag when toggled
-            active_chk.toggled.connect(lambda checked, t=tag: self._per_tag_active.__setitem__(t, checked))
+    def _current_default_keys(self):
+        return self.replacement_model.keys()
+
+    # ---------- per-tag table ----------
+    def edit_tag_mapping(self, index):
+        """Let the user pick the keys applied to the tag in the clicked row."""
+        # the dialog must offer the keys as they are now, not as of the last debounced update
+        self.update_per_tag_keys()
+        tag = self.per_tag_model.tag_at(index.row())
+
+        def preview_selection(selection):
+            self._preview_overrides[tag] = selection
+            self.schedule_preview()
+
+        dialog = MultiSelectDialog(self, f"Edit Mapping for '{tag}'", self._current_default_keys(),
+                                   self.per_tag_model.selection(tag), on_change=preview_selection)
+        accepted = dialog.exec_() == QtWidgets.QDialog.Accepted
+        self._preview_overrides.pop(tag, None)
+        if accepted:
+            self.per_tag_model.set_selection(tag, dialog.get_selected_items())
+        else:
+            self.schedule_preview()
 
     def _is_use_default_for_tag(self, tag):
         """Return True if the 'Use Default' checkbox for tag is checked."""
-        if not hasattr(self, "per_tag_table"):
-            return False
-        for row in range(self.per_tag_table.rowCount()):
-            item = self.per_tag_table.item(row, 1)  # tag is in column 1
-            if item and item.text() == tag:
-                widget = self.per_tag_table.cellWidget(row, 2)  # Use Default checkbox is in column 2
-                if widget:
-                    layout = widget.layout()
-                    if layout and layout.count() > 0:
-                        chk = layout.itemAt(0).widget()
-                        if isinstance(chk, QtWidgets.QCheckBox):
-                            return chk.isChecked()
-        return False
-
-    def _update_mapping_button_text(self, button, tag):
-        """
-        Update the text of the mapping button to reflect the current selection of mapped characters for a given tag.
-        Shows an indicator when 'Use Default' is active.
-        """
-        log.debug(f"{PLUGIN_NAME}: Updating mapping button text for tag '{tag}'")
-
-        selected_keys = sorted(list(self._per_tag_selection.get(tag, set())))
-        log.debug(f"{PLUGIN_NAME}: Selected keys for tag '{tag}': {selected_keys}")
-        num_selected = len(selected_keys)
-
-        if num_selected == 0:
-            button.setText("none selected")
+        return self.per_tag_model.is_use_default(tag)
+
+    # ---------- live preview ----------
+    def on_preview_toggled(self, checked):
+        if checked:
+            self.start_preview()
+        else:
+            self._cancel_preview()
+            self.preview_model.clear()
+            self.preview_summary_label.setText("")
+
+    def schedule_preview(self, *args):
+        if self.preview_checkbox.isChecked():
+            self._preview_timer.start()
+
+    def reload_preview(self):
+        """Take a new snapshot of the loaded albums and recompute the preview."""
+        self._preview_items = None
+        if self.preview_checkbox.isChecked():
+            self.start_preview()
+
+    def start_preview(self):
+        """Cancel a running preview and start one for the settings as currently edited."""
+        self._preview_timer.stop()
+        self._cancel_preview()
+        if not self.preview_checkbox.isChecked():
             return
-
-        # Create a preview string of selected characters
-        preview_str = " ".join(selected_keys)
-
-        # Truncate the preview string if it's too long
-        preview_limit = 20  # Max length of the character preview
-        if len(preview_str) > preview_limit:
-            # Truncate the string at the last space before the limit, if possible
-            truncated = preview_str[:preview_limit]
-            if ' ' in truncated:
-                truncated = truncated.rsplit(' ', 1)[0]
-            preview_str = truncated + "…"
-
-        log.debug(f"{PLUGIN_NAME}: Mapping button text for tag '{tag}': {preview_str}")
-        button.setText(f"{preview_str}")
-
-    def _make_mapping_button_handler(self, tag, button):
-        """
-        Factory method that creates a handler function for the mapping button of a specific tag.
-        """
-
-        def on_button_clicked():
-            all_keys = self._current_default_keys()
-            current_selection = self._per_tag_selection.get(tag, set())
-
-            dialog = MultiSelectDialog(self, f"Edit Mapping for '{tag}'", all_keys, current_selection)
-            if dialog.exec_() == QtWidgets.QDialog.Accepted:
-                new_selection = dialog.get_selected_items()
-                self._per_tag_selection[tag] = new_selection
-                self._per_tag_saved[tag] = new_selection.copy()
-                self._update_mapping_button_text(button, tag)
-
-        return on_button_clicked
-
-    def on_default_table_changed(self, *args):
-        self.rebuild_per_tag_table()
-
-    def _make_use_default_handler(self, tag, button):
-        """
-        Creates a handler function for the 'use default' checkbox for a given tag.
-
-        When the checkbox is toggled, this handler updates the per-tag selection state:
-        - If checked, saves the current selection, selects all available keys, and disables the mapping button.
-        - If unchecked, restores the saved selection and enables the mapping button.
-        The handler also updates the button text to reflect the current selection.
-        """
-
-        def on_toggled(checked):
-            all_keys = self._current_default_keys()
-            if checked:
-                # Save current selection
-                self._per_tag_saved[tag] = self._per_tag_selection.get(tag, set()).copy()
-                # Set to all selected (visual)
-                self._per_tag_selection[tag] = set(all_keys)
-                button.setEnabled(False)
-            else:
-                # Restore saved selection (or empty set if none)
-                self._per_tag_selection[tag] = self._per_tag_saved.get(tag, set()).copy()
-                button.setEnabled(True)
-
-            self._update_mapping_button_text(button, tag)
-
-        return on_toggled
+        if self._preview_items is None:
+            self._preview_items = snapshot(self._loaded_metadata(), metadata_fingerprints)
+
+        self.update_per_tag_tags()
+        self.update_per_tag_keys()
+        per_tag_tables = self.per_tag_model.entries()
+        for tag, selection in self._preview_overrides.items():
+            if tag in per_tag_tables:
+                per_tag_tables[tag] = dict(per_tag_tables[tag], keys=sorted(selection))
+        settings = (self._get_configured_filter_tags(), self.replacement_model.mapping(), per_tag_tables)
+
+        self.preview_model.clear()
+        self.preview_summary_label.setText("Computing preview…")
+        self._preview_job = PreviewJob(self._preview_items, settings, self._preview_notifier.updated.emit)
+        self._preview_job.start()
+
+    def on_preview_update(self, update):
+        if update.job is not self._preview_job or update.job.cancelled:
+            return
+        self.preview_model.append_rows(update.changes)
+        if not update.items_total:
+            self.preview_summary_label.setText("No albums loaded.")
+            return
+        summary = (f"{update.albums_affected} albums and {update.tracks_affected} tracks affected, "
+                   f"{update.tags_changed} tag values would change")
+        if not update.finished:
+            summary += f" ({update.items_done} of {update.items_total} checked…)"
+        if self.preview_model.rowCount() < update.tags_changed:
+            summary += f"; the first {self.preview_model.rowCount()} changes are listed"
+        self.preview_summary_label.setText(summary)
+
+    def _cancel_preview(self):
+        if self._preview_job is not None:
+            self._preview_job.cancel()
+            self._preview_job = None
+
+    def _loaded_metadata(self):
+        """Yield ``(label, kind, metadata, parent)`` for the loaded albums and their tracks."""
+        for album in list(self.tagger.albums.values()):
+            album_label = album.metadata["album"] or album.id
+            yield album_label, "album", album.metadata, None
+            for track in album.tracks:
+                yield f"{album_label} / {track.metadata['title']}", "track", track.metadata, album.metadata
+
+    def hideEvent(self, event):
+        self._cancel_preview()
+        super().hideEvent(event)
 
     # ---------- load / save ----------
     def load(self):
         # Load filter tags
         filter_tags = self.config.setting[CONFIG_NAME_FILTER_TAGS]
 
-        # Populate filter_tags_table if present in UI
-        if hasattr(self, "filter_tags_table"):
-            self.filter_tags_table.setRowCount(0)
-            for tag in filter_tags:
-                row = self.filter_tags_table.rowCount()
-                self.filter_tags_table.insertRow(row)
-                self.filter_tags_table.setItem(row, 0, QtWidgets.QTableWidgetItem(tag))
-
-        char_table = self.config.setting[CONFIG_NAME_CHAR_TABLE]
-
-        if hasattr(self, "replacement_table"):
-            self.replacement_table.setRowCount(0)
-            for search, replace in char_table.items():
-                row = self.replacement_table.rowCount()
-                self.replacement_table.insertRow(row)
-                self.replacement_table.setItem(row, 0, QtWidgets.QTableWidgetItem(search))
-                self.replacement_table.setItem(row, 1, QtWidgets.QTableWidgetItem(replace))
-
-        # Load per-tag tables (optional)
-        per_tag = self.config.setting[CONFIG_NAME_PER_TAG_TABLES]
-
-        # Initialize in-memory selection dicts from config (per_tag maps tag -> list of enabled keys or dict)
-        self._per_tag_selection = {}
-        self._per_tag_saved = {}
-        self._per_tag_active = {}
-        for tag, val in per_tag.items():
-            if isinstance(val, dict):
-                keys = val.get("keys", [])
-                active = val.get("active", True)
-                default = val.get("default", True)
-            else:
-                keys = val or []
-                active = True
-                default = True
-            self._per_tag_selection[tag] = set(keys)
-            self._per_tag_saved[tag] = set(keys)
-            self._per_tag_active[tag] = active
-            self._per_tag_default[tag] = default
-
-        # Build per_tag_table rows
-        self.rebuild_per_tag_table()
+        # Populate filter_tags_table without scheduling a per-tag update for every row
+        self.filter_tags_table.blockSignals(True)
+        self.filter_tags_table.setRowCount(0)
+        for tag in filter_tags:
+            row = self.filter_tags_table.rowCount()
+            self.filter_tags_table.insertRow(row)
+            self.filter_tags_table.setItem(row, 0, QtWidgets.QTableWidgetItem(tag))
+        self.filter_tags_table.blockSignals(False)
+
+        self.replacement_model.set_mapping(self.config.setting[CONFIG_NAME_CHAR_TABLE])
+
+        # Build per-tag rows from config (per_tag maps tag -> entry with a key mask, or a key list before)
+        saved_entries = decode_entries(self.config.setting[CONFIG_NAME_PER_TAG_TABLES],
+                                       self.config.setting[CONFIG_NAME_KEY_INDEX])
+        self.per_tag_model.load(self._get_configured_filter_tags(), self._current_default_keys(), saved_entries)
+        self._per_tag_tags_timer.stop()
+        self._per_tag_keys_timer.stop()
+
+        self.cache_size_spinbox.setValue(self.config.setting[CONFIG_NAME_CACHE_SIZE])
+        self.intern_size_spinbox.setValue(self.config.setting[CONFIG_NAME_INTERN_SIZE])
+        self.instrumentation_checkbox.setChecked(self.config.setting[CONFIG_NAME_INSTRUMENTATION])
+        self.stats_log_interval_spinbox.setValue(self.config.setting[CONFIG_NAME_STATS_LOG_INTERVAL])
+        self.apply_loaded_checkbox.setChecked(self.config.setting[CONFIG_NAME_APPLY_TO_LOADED])
+        self.refresh_statistics()
+
+    # ---------- statistics ----------
+    def refresh_statistics(self):
+        info = value_cache.info()
+        self.cache_stats_label.setText(
+            f"{info['size']} of {info['max_size']} entries used, "
+            f"{info['hits']} hits, {info['misses']} misses ({info['hit_rate']:.1%} hit rate), "
+            f"{info['evictions']} evictions")
+        info = intern_pool.info()
+        self.intern_stats_label.setText(
+            f"{info['size']} of {info['max_size']} values pooled, "
+            f"{info['hits']} results shared ({info['hit_rate']:.1%}), {info['evictions']} evictions")
+
+        writes = processing_stats.as_dict()
+        summary = (f"Tags checked: {writes['tags_checked']}, written: {writes['tags_written']}, "
+                   f"writes skipped: {writes['writes_skipped']}")
+        if instrumentation.enabled or instrumentation.snapshot():
+            report = instrumentation.format_report()
+        else:
+            report = "Timing statistics are disabled."
+        self.stats_text.setPlainText(f"{summary}\n\n{report}")
+
+    def reset_statistics(self):
+        instrumentation.reset()
+        processing_stats.reset()
+        value_cache.reset_stats()
+        intern_pool.reset_stats()
+        self.refresh_statistics()
 
     def save(self):
-        self._save_filter_tags()
-        self._save_replacement_table()
-        self._save_per_tag_tables()
-
-    def _save_filter_tags(self):
+        # apply pending debounced edits before reading the models
+        self.update_per_tag_tags()
+        self.update_per_tag_keys()
+
+        filter_tags = self._edited_filter_tags()
+        char_table = self.replacement_model.mapping()
+        per_tag_tables, key_index = self._edited_per_tag_tables(char_table)
+        settings = {
+            CONFIG_NAME_FILTER_TAGS: filter_tags,
+            CONFIG_NAME_CHAR_TABLE: char_table,
+            CONFIG_NAME_PER_TAG_TABLES: per_tag_tables,
+            CONFIG_NAME_KEY_INDEX: key_index,
+            CONFIG_NAME_CACHE_SIZE: self.cache_size_spinbox.value(),
+            CONFIG_NAME_INTERN_SIZE: self.intern_size_spinbox.value(),
+            CONFIG_NAME_INSTRUMENTATION: self.instrumentation_checkbox.isChecked(),
+            CONFIG_NAME_STATS_LOG_INTERVAL: self.stats_log_interval_spinbox.value(),
+            CONFIG_NAME_APPLY_TO_LOADED: self.apply_loaded_checkbox.isChecked(),
+        }
+
+        # cache sizes and statistics do not change what is sanitized; they apply as they are
+        value_cache.resize(settings[CONFIG_NAME_CACHE_SIZE])
+        intern_pool.resize(settings[CONFIG_NAME_INTERN_SIZE])
+        instrumentation.enabled = settings[CONFIG_NAME_INSTRUMENTATION]
+        instrumentation.log_interval = settings[CONFIG_NAME_STATS_LOG_INTERVAL]
+
+        # compiled tables are only rebuilt when the mapping settings actually changed; processors
+        # keep using the previous snapshot until the new one is swapped in complete. It is published
+        # before the settings are written: a processor building a snapshot from the config
+        # while they are written one by one would combine old and new settings
+        if self._mapping_settings(settings) != self._mapping_settings(self.config.setting):
+            log.debug(f"{PLUGIN_NAME}: Mapping settings changed, publishing new compiled tables")
+            previous_config = config_cache.current
+            current_config = config_cache.publish(
+                filter_tags, char_table, per_tag_tables, key_index,
+                artifact_range_tables((filter_tags, char_table, per_tag_tables, key_index)))
+            if self.apply_loaded_checkbox.isChecked() and previous_config is not None:
+                _ResanitizeRunner.start(self.tagger, previous_config, current_config)
+
+        for name, value in settings.items():
+            self.config.setting[name] = value
+
+    @staticmethod
+    def _mapping_settings(setting):
+        """The settings the compiled tables depend on, from ``setting`` (the config or a dict)."""
+        return (
+            list(setting[CONFIG_NAME_FILTER_TAGS]),
+            dict(setting[CONFIG_NAME_CHAR_TABLE]),
+            dict(setting[CONFIG_NAME_PER_TAG_TABLES]),
+            list(setting[CONFIG_NAME_KEY_INDEX]),
+        )
+
+    def _edited_filter_tags(self):
         filter_tags = self._get_configured_filter_tags()
-        self.config.setting[CONFIG_NAME_FILTER_TAGS] = filter_tags
+        for tag in filter_tags:
+            if not is_pattern(tag):
+                continue
+            error = pattern_error(tag)
+            if error:
+                log.warning(f"{PLUGIN_NAME}: Affected tags pattern '{tag}' is invalid and matches no tag: {error}")
+                continue
+            error = combination_error(tag)
+            if error:
+                log.warning(f"{PLUGIN_NAME}: Affected tags pattern '{tag}' cannot be combined with the other "
+                            f"patterns ({error}), so all patterns are tried one after another")
+        return filter_tags
 
     def _get_configured_filter_tags(self) -> List[str]:
         filter_tags = []
-        if hasattr(self, "filter_tags_table"):
-            for row in range(self.filter_tags_table.rowCount()):
-                item = self.filter_tags_table.item(row, 0)
-                if item and item.text().strip():
-                    filter_tags.append(item.text().strip())
+        for row in range(self.filter_tags_table.rowCount()):
+            item = self.filter_tags_table.item(row, 0)
+            if item and item.text().strip():
+                filter_tags.append(item.text().strip())
         return filter_tags
 
-    def _save_replacement_table(self):
-        char_table = {}
-        if hasattr(self, "replacement_table"):
-            for row in range(self.replacement_table.rowCount()):
-                search_item = self.replacement_table.item(row, 0)
-                replace_item = self.replacement_table.item(row, 1)
-                if search_item and replace_item:
-                    search = search_item.text()
-                    replace = replace_item.text()
-                    if search:
-                        char_table[search] = replace
-        self.config.setting[CONFIG_NAME_CHAR_TABLE] = char_table
-
-    def _save_per_tag_tables(self):
-        per_tag_tables = {}
-        if hasattr(self, "per_tag_table"):
-            for row in range(self.per_tag_table.rowCount()):
-                active_chk = self._get_checkbox_from_cell(row, 0)
-                tag_item = self.per_tag_table.item(row, 1)
-                use_default_chk = self._get_checkbox_from_cell(row, 2)
-
-                if not tag_item:
-                    continue
-
-                tag = tag_item.text()
-                use_default = isinstance(use_default_chk, QtWidgets.QCheckBox) and use_default_chk.isChecked()
-                is_active = isinstance(active_chk, QtWidgets.QCheckBox) and active_chk.isChecked()
-
-                selected_keys = self._per_tag_selection.get(tag, set())
-                per_tag_tables[tag] = {
-                    "keys": list(selected_keys),
-                    "active": bool(is_active),
-                    "default": bool(use_default)
-                }
-
-                log.debug(
-                    f"{PLUGIN_NAME}: Saving per-tag table for tag '{tag}': use_default={use_default}, "
-                    f"active={is_active}, keys={selected_keys}")
-
-        self.config.setting[CONFIG_NAME_PER_TAG_TABLES] = per_tag_tables
-
-    def _get_checkbox_from_cell(self, row: int, column: int) -> Optional[QtWidgets.QCheckBox]:
-        """
-        Helper to get the QCheckBox from a per_tag_table cell.
-        Args:
-            row: The row index.
-            column: The column index.
-        Returns:
-            The checkbox widget if found, else None.
-        """
-        container = self.per_tag_table.cellWidget(row, column)
-        if container and isinstance(container, QtWidgets.QWidget):
-            layout = container.layout()
-            if layout and layout.count() > 0:
-                widget = layout.itemAt(0).widget()
-                if isinstance(widget, QtWidgets.QCheckBox):
-                    return widget
-        return None
+    def _edited_per_tag_tables(self, char_table):
+        entries = self.per_tag_model.entries()
+        for tag, entry in entries.items():
+            log.debug(
+                f"{PLUGIN_NAME}: Saving per-tag table for tag '{tag}': use_default={entry['default']}, "
+                f"active={entry['active']}, profile={entry['profile']!r}, keys={entry['keys']}")
+        return encode_entries(entries, char_table, self.config.setting[CONFIG_NAME_KEY_INDEX])
+
 
 class MultiSelectDialog(QtWidgets.QDialog):
     """A dialog for selecting multiple items from a list."""
 
-    def __init__(self, parent, title, items, selected_items):
+    def __init__(self, parent, title, items, selected_items, on_change=None):
         super().__init__(parent)
         self.setWindowTitle(title)
         self.setMinimumWidth(300)
@@ -485,6 +480,9 @@ class MultiSelectDialog(QtWidgets.QDialog):
             # noinspection PyUnresolvedReferences
             item.setCheckState(QtCore.Qt.Checked if is_checked else QtCore.Qt.Unchecked)
             self.list_widget.addItem(item)
+        if on_change is not None:
+            # report the selection while it is being edited, e.g. for the live preview
+            self.list_widget.itemChanged.connect(lambda _: on_change(self.get_selected_items()))
 
         # noinspection PyUnresolvedReferences
         self.buttons = QtWidgets.QDialogButtonBox(
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+Affected-tags entries matching a family of tag names.
+
+Besides exact tag names, the affected tags list accepts:
+
+- glob patterns containing ``*``, ``?`` or ``[...]``, e.g. ``performer:*`` or ``musicbrainz_*``
+- regular expressions prefixed with ``re:``, e.g. ``re:comment(:.*)?``, matched against the whole name
+
+All patterns compile into one regular expression. Which pattern, if any, a tag name
+matches is decided once per name and then cached with the name's table, so after the
+first track a tag name costs a dict lookup however many patterns there are.
+"""
+
+import re
+from fnmatch import translate
+from typing import Callable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+REGEX_PREFIX = "re:"
+_GLOB_CHARS = frozenset("*?[")
+
+# names decided by patterns are cached up to this many, protecting against unbounded tag names
+MAX_CACHED_NAMES = 4096
+
+
+def is_pattern(entry: str) -> bool:
+    """Whether an affected-tags entry is a glob or regular expression rather than a tag name."""
+    return entry.startswith(REGEX_PREFIX) or not _GLOB_CHARS.isdisjoint(entry)
+
+
+def pattern_regex(entry: str) -> str:
+    """Regular expression source of a pattern entry."""
+    if entry.startswith(REGEX_PREFIX):
+        return entry[len(REGEX_PREFIX):]
+    # fnmatch.translate anchors the end; names are matched with fullmatch anyway
+    return translate(entry)
+
+
+def pattern_error(entry: str) -> Optional[str]:
+    """Return why a pattern entry does not compile, or None if it is valid."""
+    try:
+        re.compile(pattern_regex(entry))
+    except re.error as e:
+        return str(e)
+    return None
+
+
+def _named_group(position: int, source: str) -> str:
+    return f"(?P<_p{position}>{source})"
+
+
+def combination_error(entry: str) -> Optional[str]:
+    """
+    Return why a valid pattern entry cannot be part of the combined expression, or None.
+
+    A regular expression with global inline flags, such as ``(?i)comment.*``, compiles
+    on its own but not inside a group; ``(?i:comment.*)`` applies the flag to a group.
+    """
+    try:
+        re.compile(_named_group(0, pattern_regex(entry)))
+    except re.error as e:
+        return str(e)
+    return None
+
+
+def compile_patterns(entries: Sequence[str]) -> Callable[[str], Optional[int]]:
+    """
+    Return a function giving the position in ``entries`` of the first pattern matching a tag name, or None.
+
+    Invalid patterns never match. Patterns are combined into a single alternation with
+    one named group each; if any pattern uses groups of its own (whose numbering the
+    combination would shift) or cannot be combined (see :func:`combination_error`),
+    they are tried one after another instead.
+    """
+    compiled: List[Tuple[int, "re.Pattern"]] = []
+    for position, entry in enumerate(entries):
+        if pattern_error(entry) is None:
+            compiled.append((position, re.compile(pattern_regex(entry))))
+
+    if not compiled:
+        return lambda name: None
+
+    def first_match(name: str) -> Optional[int]:
+        for position, regex in compiled:
+            if regex.fullmatch(name):
+                return position
+        return None
+
+    if any(regex.groups for _, regex in compiled):
+        return first_match
+    try:
+        combined = re.compile("|".join(_named_group(position, regex.pattern) for position, regex in compiled))
+    except re.error:
+        return first_match
+
+    def combined_match(name: str) -> Optional[int]:
+        match = combined.fullmatch(name)
+        return None if match is None or match.lastgroup is None else int(match.lastgroup[2:])
+    return combined_match
+
+
+class _PatternDecisions(dict):
+    """Tag name to table, deciding names that are not stored with the patterns on first lookup."""
+
+    __slots__ = ("_match", "_pattern_tables")
+
+    def __init__(self, exact: Mapping[str, object], patterns: Sequence[Tuple[str, object]]):
+        super().__init__(exact)
+        self._match = compile_patterns([entry for entry, _ in patterns])
+        self._pattern_tables = [table for _, table in patterns]
+
+    def __missing__(self, name: str):
+        position = self._match(name)
+        table = None if position is None else self._pattern_tables[position]
+        if len(self) < MAX_CACHED_NAMES:
+            self[name] = table
+        return table
+
+
+class TagTables(dict):
+    """
+    Exact tag name to compiled table, with :meth:`table_for` also resolving names matching a pattern entry.
+
+    As a dict it holds the exact names only, with None for an inactive tag, so ``get``
+    and ``in`` tell an inactive tag from one that is not listed. :meth:`table_for`
+    decides other names with the compiled patterns the first time they are looked up
+    and stores the result, a table or None for an unaffected name, so looking a name
+    up again is a single dict lookup.
+    """
+
+    __slots__ = ("_decisions",)
+
+    def __init__(self, exact: Mapping[str, object], patterns: Iterable[Tuple[str, object]]):
+        super().__init__(exact)
+        self._decisions = _PatternDecisions(exact, list(patterns))
+
+    def table_for(self, name: str):
+        """The table sanitizing tag ``name``, or None if it is unaffected or its entry is inactive."""
+        # subscription calls __missing__ on a miss, get does not
+        return self._decisions[name]
+
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'replace_unwanted_characters_config.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.9
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_ReplaceUnwantedCharactersConfig(object):
+    def setupUi(self, ReplaceUnwantedCharactersConfig):
+        ReplaceUnwantedCharactersConfig.setObjectName("ReplaceUnwantedCharactersConfig")
+        ReplaceUnwantedCharactersConfig.resize(796, 674)
+        self.verticalLayout = QtWidgets.QVBoxLayout(ReplaceUnwantedCharactersConfig)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.scrollArea = QtWidgets.QScrollArea(ReplaceUnwantedCharactersConfig)
+        self.scrollArea.setWidgetResizable(True)
+        self.scrollArea.setObjectName("scrollArea")
+        self.scrollAreaWidgetContents = QtWidgets.QWidget()
+        self.scrollAreaWidgetContents.setGeometry(QtCore.QRect(0, 0, 776, 654))
+        self.scrollAreaWidgetContents.setObjectName("scrollAreaWidgetContents")
+        self.verticalLayout_4 = QtWidgets.QVBoxLayout(self.scrollAreaWidgetContents)
+        self.verticalLayout_4.setObjectName("verticalLayout_4")
+        self.widget_3 = QtWidgets.QWidget(self.scrollAreaWidgetContents)
+        self.widget_3.setObjectName("widget_3")
+        self.horizontalLayout_3 = QtWidgets.QHBoxLayout(self.widget_3)
+        self.horizontalLayout_3.setObjectName("horizontalLayout_3")
+        self.group_filter_tags = QtWidgets.QGroupBox(self.widget_3)
+        self.group_filter_tags.setObjectName("group_filter_tags")
+        self.layout_filter_tags = QtWidgets.QVBoxLayout(self.group_filter_tags)
+        self.layout_filter_tags.setObjectName("layout_filter_tags")
+        self.widget = QtWidgets.QWidget(self.group_filter_tags)
+        self.widget.setObjectName("widget")
+        self.horizontalLayout = QtWidgets.QHBoxLayout(self.widget)
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.filter_tags_table = QtWidgets.QTableWidget(self.widget)
+        self.filter_tags_table.setAlternatingRowColors(True)
+        self.filter_tags_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.filter_tags_table.setRowCount(0)
+        self.filter_tags_table.setColumnCount(1)
+        self.filter_tags_table.setObjectName("filter_tags_table")
+        item = QtWidgets.QTableWidgetItem()
+        self.filter_tags_table.setHorizontalHeaderItem(0, item)
+        self.horizontalLayout.addWidget(self.filter_tags_table)
+        self.verticalLayout_2 = QtWidgets.QVBoxLayout()
+        self.verticalLayout_2.setObjectName("verticalLayout_2")
+        spacerItem = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        self.verticalLayout_2.addItem(spacerItem)
+        self.remove_filter_tag_button = QtWidgets.QPushButton(self.widget)
+        self.remove_filter_tag_button.setObjectName("remove_filter_tag_button")
+        self.verticalLayout_2.addWidget(self.remove_filter_tag_button)
+        self.add_filter_tag_button = QtWidgets.QPushButton(self.widget)
+        self.add_filter_tag_button.setObjectName("add_filter_tag_button")
+        self.verticalLayout_2.addWidget(self.add_filter_tag_button)
+        self.horizontalLayout.addLayout(self.verticalLayout_2)
+        self.layout_filter_tags.addWidget(self.widget)
+        self.horizontalLayout_3.addWidget(self.group_filter_tags)
+        self.group_default_mapping = QtWidgets.QGroupBox(self.widget_3)
+        self.group_default_mapping.setObjectName("group_default_mapping")
+        self.layout_default_mapping = QtWidgets.QVBoxLayout(self.group_default_mapping)
+        self.layout_default_mapping.setObjectName("layout_default_mapping")
+        self.widget_2 = QtWidgets.QWidget(self.group_default_mapping)
+        self.widget_2.setObjectName("widget_2")
+        self.horizontalLayout_2 = QtWidgets.QHBoxLayout(self.widget_2)
+        self.horizontalLayout_2.setObjectName("horizontalLayout_2")
+        self.replacement_table = QtWidgets.QTableView(self.widget_2)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.replacement_table.sizePolicy().hasHeightForWidth())
+        self.replacement_table.setSizePolicy(sizePolicy)
+        self.replacement_table.setAlternatingRowColors(True)
+        self.replacement_table.setSortingEnabled(True)
+        self.replacement_table.setObjectName("replacement_table")
+        self.horizontalLayout_2.addWidget(self.replacement_table)
+        self.verticalLayout_3 = QtWidgets.QVBoxLayout()
+        self.verticalLayout_3.setObjectName("verticalLayout_3")
+        spacerItem1 = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        self.verticalLayout_3.addItem(spacerItem1)
+        self.remove_row_button = QtWidgets.QPushButton(self.widget_2)
+        self.remove_row_button.setObjectName("remove_row_button")
+        self.verticalLayout_3.addWidget(self.remove_row_button)
+        self.add_row_button = QtWidgets.QPushButton(self.widget_2)
+        self.add_row_button.setObjectName("add_row_button")
+        self.verticalLayout_3.addWidget(self.add_row_button)
+        self.horizontalLayout_2.addLayout(self.verticalLayout_3)
+        self.layout_default_mapping.addWidget(self.widget_2)
+        self.horizontalLayout_3.addWidget(self.group_default_mapping)
+        self.verticalLayout_4.addWidget(self.widget_3)
+        self.group_per_tag = QtWidgets.QGroupBox(self.scrollAreaWidgetContents)
+        self.group_per_tag.setObjectName("group_per_tag")
+        self.layout_per_tag = QtWidgets.QVBoxLayout(self.group_per_tag)
+        self.layout_per_tag.setObjectName("layout_per_tag")
+        self.per_tag_table = QtWidgets.QTableView(self.group_per_tag)
+        self.per_tag_table.setAlternatingRowColors(True)
+        self.per_tag_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.per_tag_table.setSortingEnabled(True)
+        self.per_tag_table.setObjectName("per_tag_table")
+        self.layout_per_tag.addWidget(self.per_tag_table)
+        self.verticalLayout_4.addWidget(self.group_per_tag)
+        self.group_preview = QtWidgets.QGroupBox(self.scrollAreaWidgetContents)
+        self.group_preview.setObjectName("group_preview")
+        self.layout_preview = QtWidgets.QVBoxLayout(self.group_preview)
+        self.layout_preview.setObjectName("layout_preview")
+        self.layout_preview_options = QtWidgets.QHBoxLayout()
+        self.layout_preview_options.setObjectName("layout_preview_options")
+        self.preview_checkbox = QtWidgets.QCheckBox(self.group_preview)
+        self.preview_checkbox.setObjectName("preview_checkbox")
+        self.layout_preview_options.addWidget(self.preview_checkbox)
+        spacerItem2 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.layout_preview_options.addItem(spacerItem2)
+        self.preview_reload_button = QtWidgets.QPushButton(self.group_preview)
+        self.preview_reload_button.setObjectName("preview_reload_button")
+        self.layout_preview_options.addWidget(self.preview_reload_button)
+        self.layout_preview.addLayout(self.layout_preview_options)
+        self.apply_loaded_checkbox = QtWidgets.QCheckBox(self.group_preview)
+        self.apply_loaded_checkbox.setObjectName("apply_loaded_checkbox")
+        self.layout_preview.addWidget(self.apply_loaded_checkbox)
+        self.preview_summary_label = QtWidgets.QLabel(self.group_preview)
+        self.preview_summary_label.setText("")
+        self.preview_summary_label.setWordWrap(True)
+        self.preview_summary_label.setObjectName("preview_summary_label")
+        self.layout_preview.addWidget(self.preview_summary_label)
+        self.preview_table = QtWidgets.QTableView(self.group_preview)
+        self.preview_table.setMinimumSize(QtCore.QSize(0, 150))
+        self.preview_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.preview_table.setAlternatingRowColors(True)
+        self.preview_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.preview_table.setObjectName("preview_table")
+        self.layout_preview.addWidget(self.preview_table)
+        self.verticalLayout_4.addWidget(self.group_preview)
+        self.group_performance = QtWidgets.QGroupBox(self.scrollAreaWidgetContents)
+        self.group_performance.setObjectName("group_performance")
+        self.layout_performance = QtWidgets.QFormLayout(self.group_performance)
+        self.layout_performance.setObjectName("layout_performance")
+        self.cache_size_label = QtWidgets.QLabel(self.group_performance)
+        self.cache_size_label.setObjectName("cache_size_label")
+        self.layout_performance.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.cache_size_label)
+        self.cache_size_spinbox = QtWidgets.QSpinBox(self.group_performance)
+        self.cache_size_spinbox.setMaximum(1000000)
+        self.cache_size_spinbox.setSingleStep(1024)
+        self.cache_size_spinbox.setObjectName("cache_size_spinbox")
+        self.layout_performance.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.cache_size_spinbox)
+        self.cache_stats_label = QtWidgets.QLabel(self.group_performance)
+        self.cache_stats_label.setText("")
+        self.cache_stats_label.setObjectName("cache_stats_label")
+        self.layout_performance.setWidget(1, QtWidgets.QFormLayout.FieldRole, self.cache_stats_label)
+        self.intern_size_label = QtWidgets.QLabel(self.group_performance)
+        self.intern_size_label.setObjectName("intern_size_label")
+        self.layout_performance.setWidget(2, QtWidgets.QFormLayout.LabelRole, self.intern_size_label)
+        self.intern_size_spinbox = QtWidgets.QSpinBox(self.group_performance)
+        self.intern_size_spinbox.setMaximum(1000000)
+        self.intern_size_spinbox.setSingleStep(4096)
+        self.intern_size_spinbox.setObjectName("intern_size_spinbox")
+        self.layout_performance.setWidget(2, QtWidgets.QFormLayout.FieldRole, self.intern_size_spinbox)
+        self.intern_stats_label = QtWidgets.QLabel(self.group_performance)
+        self.intern_stats_label.setText("")
+        self.intern_stats_label.setObjectName("intern_stats_label")
+        self.layout_performance.setWidget(3, QtWidgets.QFormLayout.FieldRole, self.intern_stats_label)
+        self.verticalLayout_4.addWidget(self.group_performance)
+        self.group_statistics = QtWidgets.QGroupBox(self.scrollAreaWidgetContents)
+        self.group_statistics.setObjectName("group_statistics")
+        self.layout_statistics = QtWidgets.QVBoxLayout(self.group_statistics)
+        self.layout_statistics.setObjectName("layout_statistics")
+        self.layout_statistics_options = QtWidgets.QHBoxLayout()
+        self.layout_statistics_options.setObjectName("layout_statistics_options")
+        self.instrumentation_checkbox = QtWidgets.QCheckBox(self.group_statistics)
+        self.instrumentation_checkbox.setObjectName("instrumentation_checkbox")
+        self.layout_statistics_options.addWidget(self.instrumentation_checkbox)
+        self.stats_log_interval_label = QtWidgets.QLabel(self.group_statistics)
+        self.stats_log_interval_label.setObjectName("stats_log_interval_label")
+        self.layout_statistics_options.addWidget(self.stats_log_interval_label)
+        self.stats_log_interval_spinbox = QtWidgets.QSpinBox(self.group_statistics)
+        self.stats_log_interval_spinbox.setMaximum(86400)
+        self.stats_log_interval_spinbox.setSingleStep(60)
+        self.stats_log_interval_spinbox.setObjectName("stats_log_interval_spinbox")
+        self.layout_statistics_options.addWidget(self.stats_log_interval_spinbox)
+        spacerItem3 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.layout_statistics_options.addItem(spacerItem3)
+        self.layout_statistics.addLayout(self.layout_statistics_options)
+        self.stats_text = QtWidgets.QPlainTextEdit(self.group_statistics)
+        self.stats_text.setMinimumSize(QtCore.QSize(0, 120))
+        self.stats_text.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        self.stats_text.setReadOnly(True)
+        self.stats_text.setObjectName("stats_text")
+        self.layout_statistics.addWidget(self.stats_text)
+        self.layout_statistics_buttons = QtWidgets.QHBoxLayout()
+        self.layout_statistics_buttons.setObjectName("layout_statistics_buttons")
+        spacerItem4 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.layout_statistics_buttons.addItem(spacerItem4)
+        self.stats_refresh_button = QtWidgets.QPushButton(self.group_statistics)
+        self.stats_refresh_button.setObjectName("stats_refresh_button")
+        self.layout_statistics_buttons.addWidget(self.stats_refresh_button)
+        self.stats_reset_button = QtWidgets.QPushButton(self.group_statistics)
+        self.stats_reset_button.setObjectName("stats_reset_button")
+        self.layout_statistics_buttons.addWidget(self.stats_reset_button)
+        self.layout_statistics.addLayout(self.layout_statistics_buttons)
+        self.verticalLayout_4.addWidget(self.group_statistics)
+        self.scrollArea.setWidget(self.scrollAreaWidgetContents)
+        self.verticalLayout.addWidget(self.scrollArea)
+        self.cache_size_label.setBuddy(self.cache_size_spinbox)
+        self.intern_size_label.setBuddy(self.intern_size_spinbox)
+        self.stats_log_interval_label.setBuddy(self.stats_log_interval_spinbox)
+
+        self.retranslateUi(ReplaceUnwantedCharactersConfig)
+        QtCore.QMetaObject.connectSlotsByName(ReplaceUnwantedCharactersConfig)
+
+    def retranslateUi(self, ReplaceUnwantedCharactersConfig):
+        _translate = QtCore.QCoreApplication.translate
+        ReplaceUnwantedCharactersConfig.setWindowTitle(_translate("ReplaceUnwantedCharactersConfig", "Replace Unwanted Characters Settings"))
+        self.group_filter_tags.setTitle(_translate("ReplaceUnwantedCharactersConfig", "Affected Tags"))
+        self.filter_tags_table.setSortingEnabled(True)
+        item = self.filter_tags_table.horizontalHeaderItem(0)
+        item.setText(_translate("ReplaceUnwantedCharactersConfig", "Tag"))
+        self.remove_filter_tag_button.setText(_translate("ReplaceUnwantedCharactersConfig", "Remove Selected"))
+        self.add_filter_tag_button.setText(_translate("ReplaceUnwantedCharactersConfig", "Add Tag"))
+        self.group_default_mapping.setTitle(_translate("ReplaceUnwantedCharactersConfig", "Default Replacements"))
+        self.remove_row_button.setText(_translate("ReplaceUnwantedCharactersConfig", "Remove Selected"))
+        self.add_row_button.setText(_translate("ReplaceUnwantedCharactersConfig", "Add Mapping"))
+        self.group_per_tag.setTitle(_translate("ReplaceUnwantedCharactersConfig", "Per-Tag Mappings"))
+        self.group_preview.setTitle(_translate("ReplaceUnwantedCharactersConfig", "Preview"))
+        self.preview_checkbox.setToolTip(_translate("ReplaceUnwantedCharactersConfig", "Show what the settings on this page would change in the loaded albums, updated while editing."))
+        self.preview_checkbox.setText(_translate("ReplaceUnwantedCharactersConfig", "Live preview of loaded albums"))
+        self.preview_reload_button.setToolTip(_translate("ReplaceUnwantedCharactersConfig", "Take a new snapshot of the loaded albums."))
+        self.preview_reload_button.setText(_translate("ReplaceUnwantedCharactersConfig", "Reload Albums"))
+        self.apply_loaded_checkbox.setToolTip(_translate("ReplaceUnwantedCharactersConfig", "After saving, apply changed mappings to the albums and tracks already loaded, without reloading them."))
+        self.apply_loaded_checkbox.setText(_translate("ReplaceUnwantedCharactersConfig", "Apply saved changes to loaded albums"))
+        self.group_performance.setTitle(_translate("ReplaceUnwantedCharactersConfig", "Performance"))
+        self.cache_size_label.setText(_translate("ReplaceUnwantedCharactersConfig", "Value cache size:"))
+        self.cache_size_spinbox.setToolTip(_translate("ReplaceUnwantedCharactersConfig", "Number of sanitized values kept in memory for reuse. 0 disables the cache."))
+        self.cache_size_spinbox.setSuffix(_translate("ReplaceUnwantedCharactersConfig", " entries"))
+        self.intern_size_label.setText(_translate("ReplaceUnwantedCharactersConfig", "Shared results pool:"))
+        self.intern_size_spinbox.setToolTip(_translate("ReplaceUnwantedCharactersConfig", "Number of sanitized values kept so equal values of different tracks share memory. 0 disables the pool."))
+        self.intern_size_spinbox.setSuffix(_translate("ReplaceUnwantedCharactersConfig", " values"))
+        self.group_statistics.setTitle(_translate("ReplaceUnwantedCharactersConfig", "Statistics"))
+        self.instrumentation_checkbox.setToolTip(_translate("ReplaceUnwantedCharactersConfig", "Record call counts, timings, scanned characters and replacements per tag. Costs a little time while enabled."))
+        self.instrumentation_checkbox.setText(_translate("ReplaceUnwantedCharactersConfig", "Collect timing statistics"))
+        self.stats_log_interval_label.setText(_translate("ReplaceUnwantedCharactersConfig", "Write to log every"))
+        self.stats_log_interval_spinbox.setToolTip(_translate("ReplaceUnwantedCharactersConfig", "Interval for writing the statistics to the Picard log."))
+        self.stats_log_interval_spinbox.setSpecialValueText(_translate("ReplaceUnwantedCharactersConfig", "never"))
+        self.stats_log_interval_spinbox.setSuffix(_translate("ReplaceUnwantedCharactersConfig", " s"))
+        self.stats_refresh_button.setText(_translate("ReplaceUnwantedCharactersConfig", "Refresh"))
+        self.stats_reset_button.setText(_translate("ReplaceUnwantedCharactersConfig", "Reset"))
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""
+Search keys matching whole character classes instead of a single string.
+
+A search key in one of these forms is a rule; every character it matches is replaced
+by the rule's replacement:
+
+- ``\\p{Cc}``: Unicode general category, ``\\p{C}`` for all categories of a major class
+- ``\\P{L}``: every character *not* in the category
+- ``[U+0080-U+FFFF]``: code point range, several separated by commas, e.g. ``[U+00-U+1F,U+7F]``
+- ``[^U+0020-U+007E]``: every character outside the ranges
+
+Keys that merely look similar (an unknown category, a malformed range) stay literal
+search strings. Rules compile into a sorted range table searched with ``bisect``, so
+a rule covering thousands of characters costs the same as one covering a few.
+"""
+
+import re
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from heapq import heappop, heappush
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+Ranges = List[Tuple[int, int]]
+
+_CATEGORY_RULE = re.compile(r"\\([pP])\{([A-Z][a-z]?)\}")
+_RANGE_RULE = re.compile(
+    r"\[(\^?)(U\+[0-9A-Fa-f]{1,6}(?:-U\+[0-9A-Fa-f]{1,6})?(?:,U\+[0-9A-Fa-f]{1,6}(?:-U\+[0-9A-Fa-f]{1,6})?)*)\]")
+
+MAX_CODE_POINT = sys.maxunicode
+
+# general categories and their major classes, the names a category rule accepts
+GENERAL_CATEGORIES = frozenset((
+    "Lu", "Ll", "Lt", "Lm", "Lo", "Mn", "Mc", "Me", "Nd", "Nl", "No",
+    "Pc", "Pd", "Ps", "Pe", "Pi", "Pf", "Po", "Sm", "Sc", "Sk", "So",
+    "Zs", "Zl", "Zp", "Cc", "Cf", "Cs", "Co", "Cn",
+    "L", "M", "N", "P", "S", "Z", "C",
+))
+
+
+@lru_cache(maxsize=None)
+def _category_ranges() -> Dict[str, Tuple[Tuple[int, int], ...]]:
+    """Code point ranges of every general category, computed in one pass on first use."""
+    ranges: Dict[str, List[Tuple[int, int]]] = {}
+    category = unicodedata.category
+    current = category(chr(0))
+    start = 0
+    for cp in range(1, MAX_CODE_POINT + 1):
+        cat = category(chr(cp))
+        if cat != current:
+            ranges.setdefault(current, []).append((start, cp - 1))
+            current, start = cat, cp
+    ranges.setdefault(current, []).append((start, MAX_CODE_POINT))
+    return {cat: tuple(spans) for cat, spans in ranges.items()}
+
+
+def _merge(ranges: Iterable[Tuple[int, int]]) -> Ranges:
+    merged: Ranges = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _complement(ranges: Ranges) -> Ranges:
+    result: Ranges = []
+    pos = 0
+    for start, end in ranges:
+        if start > pos:
+            result.append((pos, start - 1))
+        pos = end + 1
+    if pos <= MAX_CODE_POINT:
+        result.append((pos, MAX_CODE_POINT))
+    return result
+
+
+@lru_cache(maxsize=256)
+def parse_rule(key: str) -> Optional[Tuple[Tuple[int, int], ...]]:
+    """Return the sorted, merged code point ranges matched by rule ``key``, or None if it is no valid rule."""
+    match = _CATEGORY_RULE.fullmatch(key)
+    if match:
+        negate, name = match.group(1) == "P", match.group(2)
+        categories = _category_ranges()
+        selected = [cat for cat in categories if cat == name or (len(name) == 1 and cat[0] == name)]
+        if not selected:
+            return None
+        ranges = _merge(span for cat in selected for span in categories[cat])
+    else:
+        match = _RANGE_RULE.fullmatch(key)
+        if not match:
+            return None
+        negate = bool(match.group(1))
+        spans = []
+        for part in match.group(2).split(","):
+            bounds = [int(bound[2:], 16) for bound in part.split("-")]
+            start, end = bounds[0], bounds[-1]
+            if start > end or end > MAX_CODE_POINT:
+                return None
+            spans.append((start, end))
+        ranges = _merge(spans)
+    if negate:
+        ranges = _complement(ranges)
+    return tuple(ranges)
+
+
+def is_rule(key: str) -> bool:
+    """Whether ``key`` is a valid rule, without computing the ranges of category rules."""
+    match = _CATEGORY_RULE.fullmatch(key)
+    if match:
+        # a category and its complement are never empty
+        return match.group(2) in GENERAL_CATEGORIES
+    return bool(parse_rule(key))
+
+
+class RangeTable:
+    """
+    Non-overlapping code point ranges, each mapped to a replacement string.
+
+    Rules are given in priority order; where rules overlap, the earlier one wins.
+    Starts and ends are kept in ``array('I')`` so even a few thousand ranges take a few
+    kilobytes, and a lookup is one ``bisect`` over the starts.
+    """
+
+    __slots__ = ("starts", "ends", "_values", "_replacements")
+
+    def __init__(self, rules: Iterable[Tuple[Iterable[Tuple[int, int]], str]]):
+        replacements: List[str] = []
+        spans: List[Tuple[int, int, int]] = []
+        for priority, (ranges, replacement) in enumerate(rules):
+            replacements.append(replacement)
+            spans.extend((start, end, priority) for start, end in ranges)
+
+        segments = _resolve(spans)
+
+        self.starts = array("I", (start for start, _, _ in segments))
+        self.ends = array("I", (end for _, end, _ in segments))
+        self._values = array("I", (priority for _, _, priority in segments))
+        self._replacements = replacements
+
+    @classmethod
+    def from_arrays(cls, starts, ends, values, replacements: Iterable[str]) -> "RangeTable":
+        """
+        Table over resolved arrays as returned by :meth:`arrays`, used as they are.
+
+        Any sequence of unsigned ints supporting ``bisect`` will do, e.g. memoryviews
+        of a memory-mapped file, so loading a table copies nothing.
+        """
+        table = cls.__new__(cls)
+        table.starts, table.ends, table._values = starts, ends, values
+        table._replacements = list(replacements)
+        return table
+
+    def arrays(self) -> Tuple[Sequence[int], Sequence[int], Sequence[int], List[str]]:
+        """The resolved starts, ends, rule numbers and replacements of the table."""
+        return self.starts, self.ends, self._values, self._replacements
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, codepoint: int) -> Optional[str]:
+        """Return the replacement for ``codepoint``, or None if no rule matches it."""
+        i = bisect_right(self.starts, codepoint) - 1
+        if i >= 0 and codepoint <= self.ends[i]:
+            return self._replacements[self._values[i]]
+        return None
+
+    def ranges(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.starts, self.ends)
+
+    def character_class(self) -> str:
+        """Regular expression character class body matching every code point in the table."""
+        return "".join(f"\\U{start:08x}" if start == end else f"\\U{start:08x}-\\U{end:08x}"
+                       for start, end in _merge(self.ranges()))
+
+
+def _resolve(spans: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """Turn ``(start, end, priority)`` spans into disjoint segments, the lowest priority winning overlaps."""
+    spans.sort()
+    boundaries = sorted({start for start, _, _ in spans} | {end + 1 for _, end, _ in spans})
+    segments: List[Tuple[int, int, int]] = []
+    active: List[Tuple[int, int]] = []
+    index = 0
+    for start, next_start in zip(boundaries, boundaries[1:]):
+        while index < len(spans) and spans[index][0] == start:
+            heappush(active, (spans[index][2], spans[index][1]))
+            index += 1
+        while active and active[0][1] < start:
+            heappop(active)
+        if not active:
+            continue
+        priority = active[0][0]
+        if segments and segments[-1][2] == priority and segments[-1][1] == start - 1:
+            segments[-1] = (segments[-1][0], next_start - 1, priority)
+        else:
+            segments.append((start, next_start - 1, priority))
+    return segments
+
+
+class TranslationMap(dict):
+    """
+    ``str.translate`` table that falls back to a :class:`RangeTable` for characters it has not seen.
+
+    Results are memoized, so after warming up every character costs one dict lookup,
+    as with a plain translate table; only distinct characters seen are stored.
+    """
+
+    __slots__ = ("_ranges",)
+
+    def __init__(self, literal: Mapping[int, object], ranges: RangeTable):
+        super().__init__(literal)
+        self._ranges = ranges
+
+    def __missing__(self, codepoint: int):
+        replacement = self._ranges.lookup(codepoint)
+        # mapping a character to itself keeps it; str.translate deletes characters mapped to None
+        value = codepoint if replacement is None else replacement
+        self[codepoint] = value
+        return value
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Regenerate the Python UI modules from the Qt Designer ``.ui`` files.
+
+The ``.ui`` files are the source of truth; the generated ``ui_*.py`` modules are what the
+options page loads at runtime. Run after editing a ``.ui`` file::
+
+    python scripts/generate_ui.py
+
+``--check`` only reports generated modules that are out of date and exits non-zero,
+which is suitable for CI.
+"""
+
+import argparse
+import io
+import os
+import sys
+
+from PyQt5 import uic
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "replace_unwanted_characters")
+
+
+def _generated_path(ui_file: str) -> str:
+    name = os.path.splitext(os.path.basename(ui_file))[0]
+    return os.path.join(os.path.dirname(ui_file), f"ui_{name}.py")
+
+
+def _without_generator_header(source: str) -> str:
+    # the generator writes its own version and the path of the .ui file into the header
+    return "\n".join(line for line in source.splitlines()
+                     if not line.startswith(("# Created by:", "# Form implementation generated from")))
+
+
+def compile_ui(ui_file: str) -> str:
+    out = io.StringIO()
+    uic.compileUi(ui_file, out)
+    # name the .ui file as the committed modules do, independent of where the script runs
+    return out.getvalue().replace(f"ui file '{ui_file}'", f"ui file '{os.path.basename(ui_file)}'", 1)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="only check that the generated modules are up to date")
+    args = parser.parse_args(argv)
+
+    ui_files = sorted(os.path.join(PACKAGE_DIR, f) for f in os.listdir(PACKAGE_DIR) if f.endswith(".ui"))
+    stale = []
+    for ui_file in ui_files:
+        target = _generated_path(ui_file)
+        generated = compile_ui(ui_file)
+        current = ""
+        if os.path.exists(target):
+            with open(target, encoding="utf-8") as f:
+                current = f.read()
+        if _without_generator_header(current) == _without_generator_header(generated):
+            continue
+        if args.check:
+            stale.append(target)
+            continue
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(generated)
+        print(f"generated {os.path.relpath(target)}")
+
+    for target in stale:
+        print(f"out of date: {os.path.relpath(target)}", file=sys.stderr)
+    return 1 if stale else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
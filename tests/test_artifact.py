@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""Mapping artifacts: writing, loading, rejecting damaged files and reusing the tables of stale ones."""
+
+import logging
+import struct
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+import replace_unwanted_characters as plugin
+from replace_unwanted_characters.artifact import (
+    FORMAT_VERSION,
+    MAGIC,
+    ArtifactError,
+    Settings,
+    open_artifact,
+    write_artifact,
+)
+from replace_unwanted_characters.constants import CONFIG_NAME_ARTIFACT, ENV_VAR_ARTIFACT
+from replace_unwanted_characters.engine import CompiledConfig
+
+SETTINGS: Settings = (
+    ["album", "title", "artist"],
+    {":": "∶", "\\p{Cf}": "", "[U+0000-U+001F]": "", "\\P{L}": "_"},
+    {"title": {"keys": [":", "\\p{Cf}"], "active": True, "default": False, "profile": ""}},
+    [],
+)
+VALUES = ["Live: Paris", "a​b\x07c", "Ünïcödé 2011!", ""]
+
+
+def export(path, settings=SETTINGS):
+    compiled = CompiledConfig(*settings)
+    write_artifact(str(path), settings, compiled.range_tables)
+    return compiled
+
+
+def sanitized(compiled):
+    return {tag: table.sanitize_values(VALUES) for tag, table in compiled.tag_tables.items()}
+
+
+def rewrite(path, target, change):
+    """Copy the artifact at ``path`` to ``target`` with ``change`` applied to its bytes."""
+    data = bytearray(path.read_bytes())
+    target.write_bytes(bytes(change(data)))
+    return str(target)
+
+
+def test_loaded_tables_match_the_compiled_ones(tmp_path):
+    path = tmp_path / "mapping.rutbl"
+    compiled = export(path)
+    artifact = open_artifact(str(path))
+    assert artifact.matches(SETTINGS)
+    assert artifact.settings == SETTINGS
+    assert artifact.range_tables.keys() == compiled.range_tables.keys()
+    for rules, ranges in compiled.range_tables.items():
+        loaded = artifact.range_tables[rules]
+        assert [list(data) for data in loaded.arrays()] == [list(data) for data in ranges.arrays()]
+
+    preloaded = CompiledConfig(*SETTINGS, artifact.range_tables)
+    assert preloaded.range_tables.loaded == len(compiled.range_tables)
+    assert preloaded.range_tables.compiled == 0
+    assert sanitized(preloaded) == sanitized(compiled)
+
+
+def test_stale_artifact_provides_the_unchanged_tables(tmp_path):
+    path = tmp_path / "mapping.rutbl"
+    export(path)
+    changed = (SETTINGS[0], dict(SETTINGS[1], **{"\\P{L}": "-"}), SETTINGS[2], SETTINGS[3])
+    artifact = open_artifact(str(path))
+    assert not artifact.matches(changed)
+
+    compiled = CompiledConfig(*changed, artifact.range_tables)
+    # the title table keeps its rules, the default table's changed
+    assert (compiled.range_tables.loaded, compiled.range_tables.compiled) == (1, 1)
+    assert sanitized(compiled) == sanitized(CompiledConfig(*changed))
+
+
+def test_reopening_reuses_the_mapping_until_replaced(tmp_path):
+    path = tmp_path / "mapping.rutbl"
+    export(path)
+    artifact = open_artifact(str(path))
+    assert open_artifact(str(path)) is artifact
+
+    export(path, (["album"], {"\\p{Cf}": "", "x": "y"}, {}, []))
+    replaced = open_artifact(str(path))
+    assert replaced is not artifact
+    assert len(replaced) == 1
+    # the previous mapping stays readable
+    assert artifact.matches(SETTINGS)
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda data: data[:-3], "checksum"),
+    (lambda data: data[:20], "truncated header"),
+    (lambda data: b"", "empty"),
+    (lambda data: data[:-1] + bytes([data[-1] ^ 0xff]), "checksum"),
+    (lambda data: data + b"\0", "checksum"),
+    (lambda data: b"NOTATBL\n" + data[8:], "not a mapping artifact"),
+])
+def test_damaged_files_are_rejected(tmp_path, change, message):
+    path = tmp_path / "mapping.rutbl"
+    export(path)
+    damaged = rewrite(path, tmp_path / "damaged.rutbl", change)
+    with pytest.raises(ArtifactError, match=message):
+        open_artifact(damaged)
+
+
+def test_other_format_version_is_rejected(tmp_path):
+    path = tmp_path / "mapping.rutbl"
+    export(path)
+
+    def newer(data):
+        payload = bytes(data[32:])
+        return struct.pack("<8sIIQII", MAGIC, FORMAT_VERSION + 1, 0, len(payload), zlib.crc32(payload), 0) + payload
+
+    with pytest.raises(ArtifactError, match="format version"):
+        open_artifact(rewrite(path, tmp_path / "newer.rutbl", newer))
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(OSError):
+        open_artifact(str(tmp_path / "missing.rutbl"))
+
+
+@pytest.fixture
+def setting(monkeypatch):
+    """The plugin's config and log as the loader sees them inside Picard."""
+    values = {CONFIG_NAME_ARTIFACT: ""}
+    monkeypatch.setattr(plugin, "config", SimpleNamespace(setting=values))
+    monkeypatch.setattr(plugin, "log", logging.getLogger(__name__), raising=False)
+    monkeypatch.delenv(ENV_VAR_ARTIFACT, raising=False)
+    return values
+
+
+def test_plugin_loads_the_configured_artifact(tmp_path, setting, monkeypatch):
+    assert plugin.artifact_range_tables(SETTINGS) is None
+
+    path = tmp_path / "mapping.rutbl"
+    compiled = export(path)
+    setting[CONFIG_NAME_ARTIFACT] = str(path)
+    assert plugin.artifact_range_tables(SETTINGS).keys() == compiled.range_tables.keys()
+
+    # the environment variable takes precedence
+    monkeypatch.setenv(ENV_VAR_ARTIFACT, str(tmp_path / "missing.rutbl"))
+    assert plugin.artifact_range_tables(SETTINGS) is None
+
+
+def test_plugin_compiles_without_a_damaged_artifact(tmp_path, setting, caplog):
+    path = tmp_path / "mapping.rutbl"
+    export(path)
+    setting[CONFIG_NAME_ARTIFACT] = rewrite(path, tmp_path / "damaged.rutbl", lambda data: data[:-3])
+    with caplog.at_level(logging.WARNING):
+        assert plugin.artifact_range_tables(SETTINGS) is None
+    assert "checksum" in caplog.text
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""Every replacement backend gives the same output for the same mapping, and how one is selected."""
+
+import random
+from collections import OrderedDict
+
+import pytest
+
+from replace_unwanted_characters import backends
+from replace_unwanted_characters.backends import (
+    build_backends,
+    calibration_samples,
+    select_backend,
+)
+from replace_unwanted_characters.constants import DEFAULT_CHAR_MAPPING
+from replace_unwanted_characters.engine import compile_rules
+from replace_unwanted_characters.unicode_rules import is_rule
+
+MAPPINGS = {
+    "single characters": DEFAULT_CHAR_MAPPING,
+    "deletions": {"?": "", "*": "", ":": "_"},
+    "multi-character keys": {"...": "…", "--": "–", ":": "∶", "ab": ""},
+    "overlapping keys": {"ab": "1", "abc": "2", "bc": "3", "b": "4", "cab": "5"},
+    "keys within keys": {"a": "x", "aa": "y", "aaa": "z"},
+    "replacements containing keys": {":": "::", "::": ":", "a": "ab"},
+    "category rules": {"\\p{Cf}": "", "\\p{Cc}": "?", "\\P{L}": "_"},
+    "range rules": {"[U+0080-U+FFFF]": "#", "[^U+0020-U+007E]": ""},
+    "rules and literal keys": {":": "-", "\\p{P}": "_", "[U+0041-U+0043]": "x", "B": "b"},
+    "rules and multi-character keys": {"...": "…", "\\p{Po}": "", "[U+00E0-U+00FF]": "e", "é!": "E"},
+}
+ALPHABET = "abcAB :.-!?*é­​\x07Ж一😀"
+
+
+def backends_for(mapping):
+    """Every backend for a mapping, split into literal keys and rules as the compiled tables do."""
+    rules = [(key, value) for key, value in mapping.items() if is_rule(key)]
+    literal = {key: value for key, value in mapping.items() if not is_rule(key)}
+    return build_backends(literal, compile_rules(rules) if rules else None)
+
+
+def random_values(rng, mapping, count=300):
+    alphabet = ALPHABET + "".join(key for key in mapping if not is_rule(key))
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randrange(0, 30))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("name", MAPPINGS)
+@pytest.mark.parametrize("seed", range(5))
+def test_backends_agree(name, seed):
+    mapping = MAPPINGS[name]
+    candidates = backends_for(mapping)
+    assert len(candidates) > 1
+    values = random_values(random.Random(seed), mapping) + calibration_samples(mapping, None)
+    first = candidates[0]
+    for backend in candidates[1:]:
+        for value in values:
+            assert backend.replace(value) == first.replace(value), (backend.name, value)
+            assert backend.count(value) == first.count(value), (backend.name, value)
+
+
+def test_leftmost_longest():
+    for backend in backends_for(MAPPINGS["overlapping keys"]):
+        assert backend.replace("abcab") == "21", backend.name
+        assert backend.replace("cabc") == "5c", backend.name
+        assert backend.replace("xbca") == "x3a", backend.name
+        assert backend.count("abcab") == 2, backend.name
+
+
+def test_empty_mapping():
+    candidates = build_backends({}, None)
+    assert [backend.name for backend in candidates] == ["translate"]
+    assert candidates[0].replace("a:b") == "a:b"
+
+
+@pytest.fixture
+def remembered(monkeypatch):
+    choices = OrderedDict()
+    monkeypatch.setattr(backends, "_remembered", choices)
+    return choices
+
+
+def timer_of(seconds):
+    return lambda backend, samples: seconds[backend.name]
+
+
+def test_fastest_backend_is_chosen_and_remembered(remembered):
+    mapping = {":": "-", "?": ""}
+    chosen = select_backend(mapping, None, timer=timer_of({"translate": 3.0, "regex": 1.0, "dict": 2.0}))
+    assert chosen.name == "regex"
+    assert list(remembered.values()) == ["regex"]
+    # the remembered choice is used without measuring again
+    chosen = select_backend(mapping, None, timer=timer_of({"translate": 1.0, "regex": 3.0, "dict": 3.0}))
+    assert chosen.name == "regex"
+
+
+def test_close_timings_keep_the_first_backend(remembered):
+    chosen = select_backend({":": "-"}, None, timer=timer_of({"translate": 1.0, "regex": 0.9, "dict": 0.85}))
+    assert chosen.name == "translate"
+
+
+def test_disagreeing_backend_is_never_chosen(remembered, monkeypatch):
+    monkeypatch.setattr(backends.RegexBackend, "replace", lambda self, value: value)
+    chosen = select_backend({":": "-"}, None, timer=timer_of({"translate": 3.0, "regex": 1.0, "dict": 2.0}))
+    assert chosen.name == "dict"
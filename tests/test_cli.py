@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""Sanitizing audio files on disk, dry runs, checkpoints and the report of the command-line tool."""
+
+import json
+import struct
+import wave
+
+import pytest
+
+pytest.importorskip("mutagen")
+
+from mutagen.flac import FLAC  # noqa: E402
+from mutagen.id3 import TIT2, TPE1, TXXX  # noqa: E402
+from mutagen.wave import WAVE  # noqa: E402
+
+from replace_unwanted_characters.cli import (  # noqa: E402
+    compile_settings,
+    load_settings,
+    main,
+    read_checkpoint,
+    run,
+    sanitize_file,
+)
+
+
+def write_wav(path, **frames):
+    """A silent WAV file with an ID3 chunk holding ``frames`` (frame ID -> frame)."""
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(b"\0\0" * 8)
+    audio = WAVE(str(path))
+    audio.add_tags()
+    for frame in frames.values():
+        audio.tags.add(frame)
+    audio.save()
+    return str(path)
+
+
+def write_flac(path, **tags):
+    """A FLAC file without audio frames, with ``tags`` as Vorbis comments."""
+    # STREAMINFO: block sizes, unknown frame sizes, 44.1 kHz, 2 channels, 16 bits, no samples, no MD5
+    info = struct.pack(">HH", 4096, 4096) + bytes(6)
+    info += ((44100 << 44) | (1 << 41) | (15 << 36)).to_bytes(8, "big") + bytes(16)
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info)
+    audio = FLAC(str(path))
+    for name, values in tags.items():
+        audio[name] = values
+    audio.save()
+    return str(path)
+
+
+@pytest.fixture
+def library(tmp_path):
+    music = tmp_path / "music"
+    music.mkdir()
+    write_wav(music / "a.wav", TIT2=TIT2(encoding=3, text=["Live: Paris"]), TPE1=TPE1(encoding=3, text=["A/B"]),
+              TXXX=TXXX(encoding=3, desc="CATALOGNUMBER", text=["CAT:1"]))
+    write_flac(music / "b.flac", title=["What?"], comment=["Keep: this"])
+    write_flac(music / "c.flac", title=["Plain"])
+    return music
+
+
+def test_sanitize_wav_id3_tags(library):
+    path = str(library / "a.wav")
+    result = sanitize_file(path, compile_settings(load_settings()))
+    assert result["error"] is None
+    assert result["changes"] == {"title": ["Live∶ Paris"], "artist": ["A⁄B"]}
+    tags = WAVE(path).tags
+    assert tags["TIT2"].text == ["Live∶ Paris"]
+    assert tags["TPE1"].text == ["A⁄B"]
+    # not an affected tag
+    assert tags["TXXX:CATALOGNUMBER"].text == ["CAT:1"]
+
+
+def test_sanitize_flac_tags(library):
+    path = str(library / "b.flac")
+    result = sanitize_file(path, compile_settings(load_settings()))
+    assert result == {"path": path, "changes": {"title": ["What？"]}, "error": None}
+    assert FLAC(path)["title"] == ["What？"]
+    assert FLAC(path)["comment"] == ["Keep: this"]
+
+
+def test_unreadable_file_is_reported(tmp_path):
+    path = tmp_path / "broken.flac"
+    path.write_bytes(b"fLaC not really")
+    result = sanitize_file(str(path), compile_settings(load_settings()))
+    assert result["changes"] == {}
+    assert result["error"] is not None
+
+
+def test_dry_run_leaves_files_untouched(library, tmp_path):
+    before = {path: path.read_bytes() for path in library.iterdir()}
+    checkpoint = tmp_path / "done.txt"
+    report = run([str(library)], load_settings(), workers=1, dry_run=True, checkpoint=str(checkpoint))
+    assert (report.files, report.files_changed, report.tags_changed) == (3, 2, 3)
+    assert {path: path.read_bytes() for path in library.iterdir()} == before
+    # a dry run only reads the checkpoint
+    assert not checkpoint.exists()
+
+
+def test_resume_skips_files_already_done(library, tmp_path):
+    checkpoint = tmp_path / "done.txt"
+    checkpoint.write_text(str(library / "a.wav") + "\n", encoding="utf-8")
+    report = run([str(library)], load_settings(), workers=1, checkpoint=str(checkpoint), resume=True)
+    assert (report.files, report.skipped, report.files_changed) == (2, 1, 1)
+    assert WAVE(str(library / "a.wav")).tags["TIT2"].text == ["Live: Paris"]
+    assert read_checkpoint(str(checkpoint)) == {str(library / name) for name in ("a.wav", "b.flac", "c.flac")}
+
+    report = run([str(library)], load_settings(), workers=1, checkpoint=str(checkpoint), resume=True)
+    assert (report.files, report.skipped) == (0, 3)
+
+
+def test_missing_checkpoint_processes_everything(library, tmp_path):
+    checkpoint = tmp_path / "missing" / "done.txt"
+    assert read_checkpoint(str(checkpoint)) == set()
+    report = run([str(library)], load_settings(), workers=1, dry_run=True, checkpoint=str(checkpoint), resume=True)
+    assert (report.files, report.skipped) == (3, 0)
+
+
+def test_corrupt_checkpoint_only_skips_the_files_it_names(library, tmp_path):
+    checkpoint = tmp_path / "done.txt"
+    # a valid line, undecodable bytes and a line cut short by a crash
+    checkpoint.write_bytes(str(library / "c.flac").encode() + b"\n\xff\xfe\x00garbage\n" + str(library / "a.w").encode())
+    report = run([str(library)], load_settings(), workers=1, dry_run=True, checkpoint=str(checkpoint), resume=True)
+    assert (report.files, report.skipped, report.files_changed) == (2, 1, 2)
+
+
+def test_report(library, tmp_path, capsys):
+    (library / "broken.flac").write_bytes(b"fLaC not really")
+    report_path = tmp_path / "report.json"
+    assert main([str(library), "--workers", "1", "--report", str(report_path), "-v"]) == 1
+    output = capsys.readouterr().out
+    assert "changed 3 tags in 2 files, 1 errors, 0 skipped from checkpoint" in output
+    assert str(library / "broken.flac") in output
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert (report["files"], report["files_changed"], report["tags_changed"], report["errors"]) == (4, 2, 3, 1)
+    assert [error["path"] for error in report["error_details"]] == [str(library / "broken.flac")]
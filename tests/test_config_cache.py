@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""Snapshots of the compiled config swapped while worker threads process metadata."""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from replace_unwanted_characters.engine import (
+    AlbumContexts,
+    CompiledConfigCache,
+    InternPool,
+    SanitizeCache,
+    sanitize_metadata,
+)
+
+# two configurations differing in every setting, so any mix of them shows in the output
+CONFIGS = [
+    (["album", "artist", "title"], {":": "∶", "/": "⁄", "?": "？"}, {}),
+    (["album", "title", "label"], {":": "-", "/": "+", "?": "", "!": "."},
+     {"title": {"keys": [":", "!"], "active": True, "default": False, "profile": ""}}),
+]
+SAVES = 40
+RELEASES = [
+    ({"album": [f"Live: {n}/2?"], "artist": ["AC/DC?"], "label": ["Rec: ords!"]},
+     [{"title": [f"Track {n}: {t}/x?!"]} for t in range(4)])
+    for n in range(12)
+]
+
+
+class Metadata(dict):
+    """Just what the engine uses of Picard's ``Metadata``: tag name -> value list."""
+
+    def rawitems(self):
+        return list(self.items())
+
+
+class Album:
+    """Stands in for Picard's album object, which album contexts are keyed by."""
+
+
+def not_loaded():
+    raise AssertionError("the settings are published, never read back")
+
+
+def process_release(cache, contexts, release):
+    """Process an album and its tracks as the plugin's processors do, one snapshot per call."""
+    album_tags, tracks = release
+    album = Album()
+    compiled = cache.get(not_loaded)
+    context = contexts.start(album, compiled.version)
+    metadata = Metadata((name, list(values)) for name, values in album_tags.items())
+    sanitize_metadata(compiled.tag_tables, metadata, context)
+    outputs = [frozen(metadata)]
+    for tags in tracks:
+        compiled = cache.get(not_loaded)
+        track = Metadata((name, list(values)) for name, values in album_tags.items())
+        track.update((name, list(values)) for name, values in tags.items())
+        sanitize_metadata(compiled.tag_tables, track, contexts.get(album, compiled.version))
+        outputs.append(frozen(track))
+    return outputs
+
+
+def frozen(metadata):
+    return tuple(sorted((name, tuple(values)) for name, values in metadata.items()))
+
+
+def expected_outputs():
+    """The output of every album and track under each configuration alone."""
+    expected = [[set() for _ in range(len(tracks) + 1)] for _, tracks in RELEASES]
+    for settings in CONFIGS:
+        cache = CompiledConfigCache()
+        cache.publish(*settings)
+        for release, outputs in zip(RELEASES, expected):
+            for output, possible in zip(process_release(cache, AlbumContexts(), release), outputs):
+                possible.add(output)
+    return expected
+
+
+@pytest.fixture
+def frequent_switches():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize("threads", [2, 4])
+def test_every_output_matches_one_snapshot(frequent_switches, threads):
+    expected = expected_outputs()
+    assert all(len(possible) == 2 for outputs in expected for possible in outputs)
+
+    cache = CompiledConfigCache(SanitizeCache(64), InternPool(32))
+    cache.publish(*CONFIGS[0])
+    contexts = AlbumContexts(max_albums=8)
+    mismatches = []
+    processed = []
+    done = threading.Event()
+
+    def worker(offset):
+        step = 0
+        # at least one pass over the releases, then on until the publisher is done
+        while step < len(RELEASES) or not done.is_set():
+            index = (offset + step) % len(RELEASES)
+            for output, possible in zip(process_release(cache, contexts, RELEASES[index]), expected[index]):
+                if output not in possible:
+                    mismatches.append(output)
+            step += 1
+        processed.append(step)
+
+    workers = [threading.Thread(target=worker, args=(i * 5,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for save in range(1, SAVES + 1):
+        cache.publish(*CONFIGS[save % len(CONFIGS)])
+        time.sleep(0.0005)
+    done.set()
+    for thread in workers:
+        thread.join()
+
+    assert len(processed) == threads
+    assert mismatches == []
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""Equivalence of the compiled tables with the plugin's original per-character replacement."""
+
+import random
+
+import pytest
+
+from replace_unwanted_characters.backends import build_backends
+from replace_unwanted_characters.engine import CompiledTable, InternPool, SanitizeCache
+
+ALPHABET = "abcAB :/?*<>|\"\\.-_ äöüß–—…’“”\t ​😀"
+SEEDS = range(20)
+
+
+def legacy_replace(value, table):
+    """The original ``_replace_with_table``: one ``table.get(c, c)`` per character."""
+    return ["".join(table.get(c, c) for c in item) for item in value]
+
+
+def reference_replace(item, table):
+    """Leftmost-longest replacement of literal keys, reducing to the legacy join for single characters."""
+    keys = sorted((k for k in table if k), key=len, reverse=True)
+    pieces = []
+    pos = 0
+    while pos < len(item):
+        for key in keys:
+            if item.startswith(key, pos):
+                pieces.append(table[key])
+                pos += len(key)
+                break
+        else:
+            pieces.append(item[pos])
+            pos += 1
+    return "".join(pieces)
+
+
+def random_mapping(rng, multi_character_keys=False):
+    """Single-character keys, some deleted and some replaced by several characters."""
+    mapping = {}
+    for c in rng.sample(ALPHABET, rng.randint(1, 12)):
+        mapping[c] = rng.choice(["", "_", "-", "∶", "[x]", c.upper(), "".join(rng.sample(ALPHABET, 2))])
+    if multi_character_keys:
+        for _ in range(rng.randint(1, 4)):
+            mapping["".join(rng.choice(ALPHABET) for _ in range(rng.randint(2, 4)))] = rng.choice(["", "+", "…"])
+    return mapping
+
+
+def random_values(rng, count=50):
+    return ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sanitize_values_matches_legacy(seed):
+    rng = random.Random(seed)
+    mapping = random_mapping(rng)
+    values = random_values(rng)
+    assert CompiledTable(mapping).sanitize_values(values) == legacy_replace(values, mapping)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_cached_and_interned_tables_match_legacy(seed):
+    rng = random.Random(seed)
+    mapping = random_mapping(rng)
+    values = random_values(rng) * 2
+    table = CompiledTable(mapping, SanitizeCache(64), intern_pool=InternPool(32))
+    assert table.sanitize_values(values) == legacy_replace(values, mapping)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_every_backend_matches_legacy(seed):
+    rng = random.Random(seed)
+    mapping = random_mapping(rng)
+    values = random_values(rng)
+    for backend in build_backends(mapping, None):
+        assert [backend.replace(item) for item in values] == legacy_replace(values, mapping), backend.name
+
+
+def test_deletions():
+    mapping = {"?": "", "*": "", ":": "_"}
+    values = ["What? Yes: no*", "", "???", "plain"]
+    assert CompiledTable(mapping).sanitize_values(values) == legacy_replace(values, mapping)
+    assert CompiledTable(mapping).sanitize_values(values) == ["What Yes_ no", "", "", "plain"]
+
+
+def test_empty_key_is_ignored():
+    mapping = {"": "x", ":": "-"}
+    values = ["a:b", ""]
+    assert CompiledTable(mapping).sanitize_values(values) == legacy_replace(values, {":": "-"})
+
+
+def test_unmatched_multi_character_keys_are_ignored():
+    # the legacy lookup never matched keys longer than one character; without an occurrence they change nothing
+    mapping = {"...": "…", "ab": "", ":": "-"}
+    values = ["a:b", "a.b.c", "b a"]
+    assert CompiledTable(mapping).sanitize_values(values) == legacy_replace(values, mapping)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_multi_character_keys_match_leftmost_longest(seed):
+    rng = random.Random(seed)
+    mapping = random_mapping(rng, multi_character_keys=True)
+    values = random_values(rng)
+    # plant the multi-character keys so they are found
+    values += [rng.choice(values) + key + rng.choice(values) for key in mapping if len(key) > 1]
+    expected = [reference_replace(item, mapping) for item in values]
+    assert CompiledTable(mapping).sanitize_values(values) == expected
+    for backend in build_backends(mapping, None):
+        assert [backend.replace(item) for item in values] == expected, backend.name
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sanitize_changed(seed):
+    rng = random.Random(seed)
+    mapping = random_mapping(rng)
+    table = CompiledTable(mapping)
+    for item in random_values(rng):
+        expected = legacy_replace([item], mapping)
+        assert table.sanitize_changed([item]) == (None if expected == [item] else expected)
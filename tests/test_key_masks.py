@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""Per-tag selections stored as key masks, and the migration of the formats of earlier versions."""
+
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import replace_unwanted_characters as plugin
+from replace_unwanted_characters.constants import (
+    CONFIG_NAME_CHAR_TABLE,
+    CONFIG_NAME_KEY_INDEX,
+    CONFIG_NAME_PER_TAG_TABLES,
+)
+from replace_unwanted_characters.key_masks import (
+    KeyIndex,
+    decode_entries,
+    encode_entries,
+    is_encoded,
+)
+
+CHAR_TABLE = {":": "∶", "/": "⁄", "*": "∗", "?": "？", "|": "ǀ"}
+
+
+def test_encode_decode_round_trip():
+    index = KeyIndex(CHAR_TABLE)
+    for keys in ([], [":"], ["|"], [":", "?", "|"], list(CHAR_TABLE)):
+        assert index.decode(index.encode(keys)) == keys
+    assert index.encode([]) == "0"
+    assert index.decode(None) == []
+    # bit i selects index.keys[i]
+    assert index.encode([":", "*"]) == "5"
+    assert index.select("5", CHAR_TABLE) == {":": "∶", "*": "∗"}
+
+
+def test_unknown_keys_are_appended():
+    index = KeyIndex([":"])
+    mask = index.encode(["?", ":"])
+    assert index.keys == [":", "?"]
+    assert index.decode(mask) == [":", "?"]
+
+
+def test_legacy_and_current_entries_decode_alike():
+    entries, key_index = encode_entries({"title": {"keys": [":", "?"], "active": True, "default": False}},
+                                        CHAR_TABLE)
+    per_tag_tables = {
+        "album": [":", "?"],
+        "title": {"keys": [":", "?"], "active": False, "default": False, "profile": "ntfs"},
+        "artist": entries["title"],
+    }
+    decoded = decode_entries(per_tag_tables, key_index)
+    assert decoded == {
+        "album": {"active": True, "default": True, "profile": "", "keys": [":", "?"]},
+        "title": {"active": False, "default": False, "profile": "ntfs", "keys": [":", "?"]},
+        "artist": {"active": True, "default": False, "profile": "", "keys": [":", "?"]},
+    }
+
+
+def test_encode_entries_round_trip():
+    per_tag_tables = {
+        "album": {"keys": ["/", ":"], "active": True, "default": False, "profile": ""},
+        "title": {"keys": [], "active": False, "default": True, "profile": "fat32"},
+    }
+    entries, key_index = encode_entries(per_tag_tables, CHAR_TABLE)
+    assert is_encoded(entries)
+    assert key_index == list(CHAR_TABLE)
+    # keys come back in index order
+    assert decode_entries(entries, key_index) == {
+        "album": dict(per_tag_tables["album"], keys=[":", "/"]),
+        "title": per_tag_tables["title"],
+    }
+
+
+def test_keys_no_longer_in_the_default_table_are_dropped():
+    entries, key_index = encode_entries({"album": [":", "~", "?"]}, CHAR_TABLE)
+    assert "~" not in key_index
+    assert decode_entries(entries, key_index)["album"]["keys"] == [":", "?"]
+
+    # a key removed from the default table leaves the index and the selections
+    entries, key_index = encode_entries(entries, {":": "∶", "|": "ǀ"}, key_index)
+    assert key_index == [":", "|"]
+    assert decode_entries(entries, key_index)["album"]["keys"] == [":"]
+
+
+def test_changed_default_table_reuses_the_index():
+    entries, key_index = encode_entries({"album": [":", "?"], "title": ["|"]}, CHAR_TABLE)
+    table = dict(CHAR_TABLE, **{"<": "‹", ">": "›"})
+    changed, new_index = encode_entries(entries, table, key_index)
+    # existing keys keep their bits, new ones are appended
+    assert new_index == key_index + ["<", ">"]
+    assert changed == entries
+
+    # a table in another order keeps the saved order
+    changed, new_index = encode_entries(entries, reversed(list(CHAR_TABLE)), key_index)
+    assert (changed, new_index) == (entries, key_index)
+
+
+@pytest.mark.parametrize("per_tag_tables, expected", [
+    ({}, True),
+    ({"album": {"mask": "1", "active": True}}, True),
+    ({"album": {"mask": "1"}, "title": [":"]}, False),
+    ({"album": {"mask": "1"}, "title": {"keys": [":"]}}, False),
+    ({"album": [], "title": {"keys": []}}, False),
+])
+def test_is_encoded(per_tag_tables, expected):
+    assert is_encoded(per_tag_tables) is expected
+
+
+@pytest.fixture
+def setting(monkeypatch):
+    """The plugin's config as the migration sees it inside Picard."""
+    values = {CONFIG_NAME_CHAR_TABLE: dict(CHAR_TABLE), CONFIG_NAME_KEY_INDEX: [], CONFIG_NAME_PER_TAG_TABLES: {}}
+    monkeypatch.setattr(plugin, "config", SimpleNamespace(setting=values))
+    monkeypatch.setattr(plugin, "log", logging.getLogger(__name__), raising=False)
+    return values
+
+
+def test_migration_of_legacy_entries(setting):
+    setting[CONFIG_NAME_PER_TAG_TABLES] = {
+        "album": [":", "?"],
+        "title": {"keys": ["/", "~"], "active": False, "default": False},
+    }
+    plugin.migrate_per_tag_tables()
+    assert is_encoded(setting[CONFIG_NAME_PER_TAG_TABLES])
+    assert setting[CONFIG_NAME_KEY_INDEX] == list(CHAR_TABLE)
+    assert decode_entries(setting[CONFIG_NAME_PER_TAG_TABLES], setting[CONFIG_NAME_KEY_INDEX]) == {
+        "album": {"active": True, "default": True, "profile": "", "keys": [":", "?"]},
+        "title": {"active": False, "default": False, "profile": "", "keys": ["/"]},
+    }
+
+
+def test_migration_keeps_current_entries(setting):
+    entries, key_index = encode_entries({"album": {"keys": ["|"], "default": False}}, CHAR_TABLE)
+    setting[CONFIG_NAME_PER_TAG_TABLES] = entries
+    setting[CONFIG_NAME_KEY_INDEX] = key_index
+    plugin.migrate_per_tag_tables()
+    assert (setting[CONFIG_NAME_PER_TAG_TABLES], setting[CONFIG_NAME_KEY_INDEX]) == (entries, key_index)
+
+
+def test_migration_twice_changes_nothing(setting):
+    setting[CONFIG_NAME_PER_TAG_TABLES] = {"album": [":"], "title": {"mask": "2", "active": True}}
+    setting[CONFIG_NAME_KEY_INDEX] = ["?", "/"]
+    plugin.migrate_per_tag_tables()
+    migrated = dict(setting)
+    assert decode_entries(migrated[CONFIG_NAME_PER_TAG_TABLES], migrated[CONFIG_NAME_KEY_INDEX]) == {
+        "album": {"active": True, "default": True, "profile": "", "keys": [":"]},
+        "title": {"active": True, "default": True, "profile": "", "keys": ["/"]},
+    }
+    plugin.migrate_per_tag_tables()
+    assert setting == migrated
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""The live preview reports what saving would change in the loaded albums."""
+
+from replace_unwanted_characters.engine import (
+    CompiledConfig,
+    MetadataFingerprints,
+    sanitize_metadata,
+)
+from replace_unwanted_characters.preview import PreviewJob, snapshot
+from replace_unwanted_characters.resanitize import ResanitizeJob
+
+TAGS = ["album", "title"]
+
+
+class Metadata(dict):
+    """Just what the engine uses of Picard's ``Metadata``: tag name -> value list."""
+
+    def rawitems(self):
+        return list(self.items())
+
+    def copy(self):
+        return Metadata((name, list(values)) for name, values in self.items())
+
+
+def load_album(compiled, fingerprints):
+    """Process an album and one track as Picard does: the track starts as a copy of the album metadata."""
+    album = Metadata(album=["Live: Paris"])
+    sanitize_metadata(compiled.tag_tables, album, fingerprints=fingerprints)
+    track = album.copy()
+    track["title"] = ["A: b"]
+    sanitize_metadata(compiled.tag_tables, track, fingerprints=fingerprints)
+    return album, track
+
+
+def preview(items, settings):
+    updates = []
+    PreviewJob(items, settings, updates.append).run()
+    return updates[-1]
+
+
+def test_removed_mapping_previews_restored_values():
+    fingerprints = MetadataFingerprints()
+    old = CompiledConfig(TAGS, {":": "∶"}, {})
+    album, track = load_album(old, fingerprints)
+    assert album["album"] == ["Live∶ Paris"]
+    assert track["title"] == ["A∶ b"]
+
+    items = snapshot([("album", "album", album, None), ("track", "track", track, album)], fingerprints)
+    new_settings = (TAGS, {"?": ""}, {})
+    update = preview(items, new_settings)
+    assert (update.albums_affected, update.tracks_affected, update.tags_changed) == (1, 1, 3)
+    changes = {(change.label, change.tag): (change.before, change.after) for change in update.changes}
+    assert changes == {
+        ("album", "album"): ("Live∶ Paris", "Live: Paris"),
+        ("track", "album"): ("Live∶ Paris", "Live: Paris"),
+        ("track", "title"): ("A∶ b", "A: b"),
+    }
+
+    # saving applies exactly what was previewed
+    ResanitizeJob([old.tag_tables], CompiledConfig(*new_settings), [(track, album, None), (album, None, None)],
+                  fingerprints).run()
+    assert album["album"] == ["Live: Paris"]
+    assert track["album"] == ["Live: Paris"]
+    assert track["title"] == ["A: b"]
+
+
+def test_unchanged_settings_preview_nothing():
+    fingerprints = MetadataFingerprints()
+    settings = (TAGS, {":": "∶"}, {})
+    album, track = load_album(CompiledConfig(*settings), fingerprints)
+    items = snapshot([("album", "album", album, None), ("track", "track", track, album)], fingerprints)
+    update = preview(items, settings)
+    assert (update.albums_affected, update.tracks_affected, update.tags_changed) == (0, 0, 0)
+
+
+def test_values_edited_after_processing_are_their_own_originals():
+    fingerprints = MetadataFingerprints()
+    album, track = load_album(CompiledConfig(TAGS, {":": "∶"}, {}), fingerprints)
+    track["title"] = ["Edited: by hand"]
+    items = snapshot([("track", "track", track, album)], fingerprints)
+    update = preview(items, (TAGS, {":": "-"}, {}))
+    changes = {change.tag: (change.before, change.after) for change in update.changes}
+    assert changes == {
+        "album": ("Live∶ Paris", "Live- Paris"),
+        "title": ("Edited: by hand", "Edited- by hand"),
+    }
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""Filesystem profiles: forbidden characters, reserved names, trailing characters and name length limits."""
+
+import random
+
+import pytest
+
+from replace_unwanted_characters.profiles import PROFILES, get_profile, truncate_encoded
+
+ALPHABET = "ab .:/\\?*<>|\"\x00\x01ä€😀\ud800"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("CON", "CON_"),
+    ("con", "con_"),
+    ("con.txt", "con_.txt"),
+    ("Nul .mp3", "Nul_ .mp3"),
+    ("LPT9.flac", "LPT9_.flac"),
+    ("COM0", "COM0"),
+    ("CONSOLE", "CONSOLE"),
+])
+def test_windows_reserved_names(value, expected):
+    for name in ("fat", "ntfs"):
+        assert get_profile(name).apply(value) == expected
+
+
+def test_posix_reserved_names():
+    profile = get_profile("posix")
+    assert profile.apply(".") == "._"
+    assert profile.apply("..") == ".._"
+    assert profile.apply("...") == "..."
+    assert profile.apply("a/b\x00c") == "a⁄bc"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Album. ", "Album․"),
+    ("Album...", "Album..․"),
+    ("Album   ", "Album"),
+    ("Vol. 1", "Vol. 1"),
+])
+def test_windows_trailing_dots_and_spaces(value, expected):
+    assert get_profile("ntfs").apply(value) == expected
+
+
+def test_posix_keeps_trailing_dots_and_spaces():
+    assert get_profile("posix").apply("Album. ") == "Album. "
+
+
+def test_utf8_limit():
+    profile = get_profile("posix")
+    result = profile.apply("ä" * 200)
+    # two bytes each: a cut "ä" is dropped rather than half kept
+    assert result == "ä" * 127
+    assert len(profile.apply("€" * 100).encode("utf-8")) == 255
+    assert profile.apply("a" * 300) == "a" * 255
+
+
+def test_utf16_limit():
+    profile = get_profile("ntfs")
+    assert profile.apply("ä" * 300) == "ä" * 255
+    # characters outside the BMP take two UTF-16 code units
+    assert profile.apply("a" + "😀" * 200) == "a" + "😀" * 127
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-16-le"])
+def test_truncation_keeps_lone_surrogates(encoding):
+    value = "a\ud800" + "b" * 300
+    result = truncate_encoded(value, 255, encoding)
+    assert value.startswith(result)
+    assert result[:3] == "a\ud800b"
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-16-le"])
+@pytest.mark.parametrize("seed", range(10))
+def test_truncation_returns_the_longest_prefix(encoding, seed):
+    rng = random.Random(seed)
+    value = "".join(rng.choice(ALPHABET) for _ in range(200))
+    for max_bytes in range(0, 120, 7):
+        result = truncate_encoded(value, max_bytes, encoding)
+        assert value.startswith(result)
+        size = len(result.encode(encoding, "surrogatepass"))
+        assert size <= max_bytes
+        if result != value:
+            assert size + len(value[len(result)].encode(encoding, "surrogatepass")) > max_bytes
+
+
+@pytest.mark.parametrize("name", PROFILES)
+@pytest.mark.parametrize("seed", range(10))
+def test_apply_is_idempotent(name, seed):
+    rng = random.Random(seed)
+    profile = get_profile(name)
+    values = ["CON", "con.txt", "Album. ", "..", "a" * 300, "ä" * 300, "😀" * 300]
+    values += ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 400))) for _ in range(20)]
+    for value in values:
+        once = profile.apply(value)
+        assert profile.apply(once) == once, value
+
+
+def test_unknown_profile():
+    assert get_profile("") is None
+    assert get_profile("hfs") is None
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""Opt-in profiling of the entry points: how many calls are profiled, the statistics file and the summary."""
+
+import inspect
+import pstats
+from types import SimpleNamespace
+
+import pytest
+
+import replace_unwanted_characters as plugin
+from replace_unwanted_characters.constants import (
+    CONFIG_NAME_PROFILE_CALLS,
+    ENV_VAR_PROFILE_CALLS,
+)
+from replace_unwanted_characters.profiling import CallProfiler
+
+
+def sanitize(parser, value, name=""):
+    return value.replace(":", "-") + name
+
+
+def test_profiles_the_given_number_of_calls(tmp_path):
+    messages = []
+    profiler = CallProfiler(3, str(tmp_path), messages.append, top=5)
+    wrapped = profiler.wrap(sanitize)
+
+    for _ in range(2):
+        assert wrapped(None, "a:b") == "a-b"
+    assert profiler.active and profiler.path is None and not messages
+
+    assert wrapped(None, "c:d", name="x") == "c-dx"
+    assert not profiler.active
+    assert profiler.path is not None and profiler.path.startswith(str(tmp_path))
+    assert profiler.path.endswith(".pstats")
+    stats = pstats.Stats(profiler.path)
+    assert any(function == "sanitize" for _, _, function in stats.stats)
+
+    assert len(messages) == 1
+    assert messages[0].startswith(f"Profiled 3 calls, statistics written to {profiler.path}")
+    assert "cumulative" in messages[0]
+
+    # later calls run unprofiled
+    assert wrapped(None, "e:f") == "e-f"
+    assert len(messages) == 1
+    assert [str(path) for path in tmp_path.iterdir()] == [profiler.path]
+
+
+def test_wrapper_keeps_the_signature():
+    wrapped = CallProfiler(1, "", print).wrap(sanitize)
+    assert inspect.signature(wrapped) == inspect.signature(sanitize)
+    assert wrapped.__name__ == "sanitize"
+
+
+def test_exceptions_count_as_profiled_calls(tmp_path):
+    messages = []
+    profiler = CallProfiler(1, str(tmp_path), messages.append)
+
+    @profiler.wrap
+    def failing():
+        raise KeyError("tag")
+
+    with pytest.raises(KeyError):
+        failing()
+    assert not profiler.active
+    assert len(messages) == 1
+
+
+def test_unwritable_directory_is_logged(tmp_path):
+    blocked = tmp_path / "file"
+    blocked.write_text("")
+    messages = []
+    profiler = CallProfiler(1, str(blocked / "profiles"), messages.append)
+    profiler.wrap(sanitize)(None, "a")
+    assert profiler.path is None
+    assert "could not be written" in messages[0]
+
+
+@pytest.mark.parametrize("environment, setting, expected", [
+    (None, 0, 0),
+    (None, 100, 100),
+    ("5000", 100, 5000),
+    ("0", 100, 100),
+    ("-3", 0, 0),
+    ("lots", 7, 7),
+])
+def test_calls_to_profile(monkeypatch, environment, setting, expected):
+    monkeypatch.setattr(plugin, "config", SimpleNamespace(setting={CONFIG_NAME_PROFILE_CALLS: setting}))
+    if environment is None:
+        monkeypatch.delenv(ENV_VAR_PROFILE_CALLS, raising=False)
+    else:
+        monkeypatch.setenv(ENV_VAR_PROFILE_CALLS, environment)
+    assert plugin.profile_calls() == expected
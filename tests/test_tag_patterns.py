@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""Glob and regular expression entries of the affected tags list."""
+
+from replace_unwanted_characters.engine import (
+    CompiledConfig,
+    changed_tag_names,
+    sanitize_metadata,
+    table_lookup,
+)
+from replace_unwanted_characters.tag_patterns import (
+    MAX_CACHED_NAMES,
+    combination_error,
+    compile_patterns,
+    pattern_error,
+)
+
+
+def test_first_matching_pattern_wins():
+    match = compile_patterns(["performer:*", "re:perf.*", "musicbrainz_*"])
+    assert match("performer:guitar") == 0
+    assert match("performance") == 1
+    assert match("musicbrainz_albumid") == 2
+    assert match("title") is None
+
+
+def test_invalid_patterns_match_nothing():
+    assert pattern_error("re:(unclosed") is not None
+    match = compile_patterns(["re:(unclosed", "comment*"])
+    assert match("comment:x") == 1
+    assert match("(unclosed") is None
+
+
+def test_global_flags_fall_back_to_sequential_matching():
+    entries = ["title*", "re:(?i)comment.*", "perf*"]
+    assert pattern_error(entries[1]) is None
+    assert combination_error(entries[1]) is not None
+    match = compile_patterns(entries)
+    assert match("COMMENT:description") == 1
+    assert match("performer") == 2
+    assert match("album") is None
+
+    tag_tables = CompiledConfig(["album", "re:(?i)comment.*"], {":": "-"}, {}).tag_tables
+    assert tag_tables.table_for("Comment") is not None
+    assert tag_tables.table_for("album") is not None
+
+
+def test_table_for_resolves_patterns():
+    tag_tables = CompiledConfig(["album", "perf*", "title"], {":": "-"}, {"album": {"active": False}}).tag_tables
+    assert tag_tables.table_for("performer") is not None
+    assert tag_tables.table_for("performer") is tag_tables.table_for("performer:vocals")
+    assert tag_tables.table_for("title") is not None
+    # inactive and unaffected tags are not sanitized
+    assert tag_tables.table_for("album") is None
+    assert tag_tables.table_for("comment") is None
+
+
+def test_get_keeps_dict_semantics():
+    tag_tables = CompiledConfig(["album", "perf*", "title"], {":": "-"}, {"album": {"active": False}}).tag_tables
+    default = object()
+    for name in ("performer", "comment", "album", "title"):
+        tag_tables.table_for(name)
+    # the exact names only, an inactive one stored as None
+    assert dict(tag_tables) == {"album": None, "title": tag_tables["title"]}
+    assert tag_tables.get("album", default) is None
+    assert "album" in tag_tables
+    assert tag_tables.get("comment", default) is default
+    assert tag_tables.get("performer", default) is default
+    assert "performer" not in tag_tables
+
+
+def test_decided_names_are_bounded():
+    tag_tables = CompiledConfig(["perf*"], {":": "-"}, {}).tag_tables
+    for n in range(MAX_CACHED_NAMES + 10):
+        assert tag_tables.table_for(f"other{n}") is None
+    assert tag_tables.table_for("performer") is not None
+
+
+def test_table_lookup_without_patterns():
+    tag_tables = CompiledConfig(["album", "title"], {":": "-"}, {"album": {"active": False}}).tag_tables
+    table_for = table_lookup(tag_tables)
+    assert table_for("title") is not None
+    assert table_for("album") is None
+    assert table_for("comment") is None
+
+
+class Metadata(dict):
+    def rawitems(self):
+        return list(self.items())
+
+
+def test_processing_resolves_patterns():
+    settings = (["album", "performer:*"], {":": "-"}, {"album": {"active": False}})
+    metadata = Metadata({"album": ["a:b"], "performer:vocals": ["c:d"], "title": ["e:f"]})
+    sanitize_metadata(CompiledConfig(*settings).tag_tables, metadata)
+    assert metadata == {"album": ["a:b"], "performer:vocals": ["c-d"], "title": ["e:f"]}
+
+    # dropping the pattern changes the tags it matched, and only those
+    previous = CompiledConfig(*settings).tag_tables
+    is_changed = changed_tag_names([previous], CompiledConfig(["album"], {":": "-"}, {}).tag_tables)
+    assert is_changed("performer:vocals")
+    assert is_changed("album")
+    assert not is_changed("title")
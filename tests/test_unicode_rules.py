@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+"""Category and code point range rules, their range tables and translate maps."""
+
+import unicodedata
+
+import pytest
+
+from replace_unwanted_characters.backends import build_backends
+from replace_unwanted_characters.engine import CompiledTable, compile_rules
+from replace_unwanted_characters.unicode_rules import (
+    MAX_CODE_POINT,
+    RangeTable,
+    TranslationMap,
+    is_rule,
+    parse_rule,
+)
+
+SAMPLE = "a:b­​c‎\x07!\U0001f600"
+
+
+def backends_for(mapping):
+    """Every backend for a mapping, split into literal keys and rules as the compiled tables do."""
+    rules = [(key, value) for key, value in mapping.items() if is_rule(key)]
+    literal = {key: value for key, value in mapping.items() if not is_rule(key)}
+    return build_backends(literal, compile_rules(rules) if rules else None)
+
+
+def covered(ranges, codepoint):
+    return any(start <= codepoint <= end for start, end in ranges)
+
+
+def test_format_category():
+    ranges = parse_rule("\\p{Cf}")
+    for char in "­​‎﻿":
+        assert covered(ranges, ord(char))
+    assert not covered(ranges, ord("a"))
+    assert not covered(ranges, 0x07)
+    assert is_rule("\\p{Cf}")
+
+
+def test_major_class_joins_its_categories():
+    ranges = parse_rule("\\p{C}")
+    for codepoint in (0x07, 0xad, 0xe000, 0xd800, 0x0378):
+        assert unicodedata.category(chr(codepoint))[0] == "C"
+        assert covered(ranges, codepoint)
+    assert not covered(ranges, ord("a"))
+
+
+def test_negated_category_is_the_complement():
+    ranges = parse_rule("\\p{C}")
+    negated = parse_rule("\\P{C}")
+    for codepoint in (0, 0x07, 0x41, 0xad, 0xd7ff, 0xe000, MAX_CODE_POINT):
+        assert covered(ranges, codepoint) != covered(negated, codepoint)
+
+
+def test_code_point_ranges():
+    assert parse_rule("[U+0041-U+0043]") == ((0x41, 0x43),)
+    assert parse_rule("[U+00-U+1F,U+7F]") == ((0x00, 0x1f), (0x7f, 0x7f))
+    # adjacent and overlapping ranges are merged
+    assert parse_rule("[U+0041-U+0043,U+0044,U+0042-U+0045]") == ((0x41, 0x45),)
+    assert parse_rule("[U+10FFFF]") == ((MAX_CODE_POINT, MAX_CODE_POINT),)
+    assert parse_rule("[^U+0020-U+007E]") == ((0, 0x1f), (0x7f, MAX_CODE_POINT))
+
+
+@pytest.mark.parametrize("key", [
+    "[U+110000]",
+    "[U+0000-U+110000]",
+    "[U+0043-U+0041]",
+    "[U+0041-U+0043,U+0050-U+0045]",
+    "[U+]",
+    "[U+0041-]",
+    "\\p{Xx}",
+    "\\p{Cff}",
+    "\\p{}",
+    "p{L}",
+])
+def test_invalid_rules_stay_literal(key):
+    assert parse_rule(key) is None
+    assert not is_rule(key)
+    assert CompiledTable({key: "#"}).sanitize("x" + key + "yA") == "x#yA"
+    for backend in backends_for({key: "#"}):
+        assert backend.replace("x" + key + "yA") == "x#yA", backend.name
+
+
+def test_literal_keys_take_precedence_over_rules():
+    mapping = {":": "-", "\\p{P}": "_", "[U+0041-U+0043]": "x", "B": "b"}
+    table = CompiledTable(mapping)
+    assert table.sanitize("a:b!ABCD") == "a-b_xbxD"
+    for backend in backends_for(mapping) + backends_for(dict(mapping, **{"::": "="})):
+        assert backend.replace("a:b!ABCD") == "a-b_xbxD", backend.name
+
+
+def test_earlier_rules_win_overlaps():
+    table = CompiledTable({"[U+0041-U+0045]": "1", "[U+0043-U+0047]": "2", "\\p{Lu}": "3"})
+    assert table.sanitize("ABCDEFGHa") == "11111223a"
+
+
+def test_rules_and_deletions():
+    table = CompiledTable({"\\p{Cf}": "", "\\p{Cc}": "?"})
+    assert table.sanitize(SAMPLE) == "a:bc?!\U0001f600"
+
+
+def test_range_lookups_at_the_bisect_boundaries():
+    table = RangeTable([(((0x41, 0x43), (0x61, 0x61)), "x"), (((0x10fffe, MAX_CODE_POINT),), "y")])
+    assert list(table.ranges()) == [(0x41, 0x43), (0x61, 0x61), (0x10fffe, MAX_CODE_POINT)]
+    expected = {
+        0: None, 0x40: None, 0x41: "x", 0x42: "x", 0x43: "x", 0x44: None,
+        0x60: None, 0x61: "x", 0x62: None,
+        0x10fffd: None, 0x10fffe: "y", MAX_CODE_POINT: "y",
+    }
+    assert {codepoint: table.lookup(codepoint) for codepoint in expected} == expected
+
+
+def test_overlapping_rules_resolve_into_disjoint_segments():
+    table = RangeTable([(((0x10, 0x20),), "a"), (((0x00, 0x30),), "b"), (((0x18, 0x40),), "c")])
+    assert list(table.ranges()) == [(0x00, 0x0f), (0x10, 0x20), (0x21, 0x30), (0x31, 0x40)]
+    assert [table.lookup(cp) for cp in (0x00, 0x0f, 0x10, 0x20, 0x21, 0x30, 0x31, 0x40, 0x41)] == \
+        ["b", "b", "a", "a", "b", "b", "c", "c", None]
+
+
+def test_empty_table():
+    table = RangeTable([])
+    assert len(table) == 0
+    assert table.lookup(0x41) is None
+    assert table.character_class() == ""
+
+
+def test_translation_map_falls_back_to_the_ranges():
+    table = RangeTable([(parse_rule("\\p{Cf}"), ""), (parse_rule("[U+0041-U+0043]"), "x")])
+    translation = TranslationMap({ord("B"): "b"}, table)
+    assert "ABCD​".translate(translation) == "xbxD"
+    # lookups are memoized, keeping unmatched characters as they are
+    assert translation[ord("D")] == ord("D")
+    assert translation[ord("A")] == "x"
+    assert set(translation) == {ord(char) for char in "ABCD​"}